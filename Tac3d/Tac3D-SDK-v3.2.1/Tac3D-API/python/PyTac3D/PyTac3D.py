@@ -5,14 +5,21 @@ import queue
 import ruamel.yaml
 import socket
 import threading
+import sys
 import cv2
 
 
 PYTAC3D_VERSION = '3.2.1'
 
+# Linux下用于统计套接字接收队列溢出（丢包）数量的选项，Python未导出该常量
+SO_RXQ_OVFL = getattr(socket, 'SO_RXQ_OVFL', 40)
+
 class UDP_Manager:
-    def __init__(self, callback, isServer = False, ip = '', port = 8083, frequency = 50, inet = 4):
+    def __init__(self, callback, isServer = False, ip = '', port = 8083, frequency = 50, inet = 4, recvBufferSize = 212992):
         self.callback = callback
+        self.recvBufferSize = recvBufferSize
+        self.dropCount = 0
+        self._rxqOvfl = False
         
         self.isServer = isServer
         self.interval = 1.0 / frequency
@@ -43,7 +50,15 @@ class UDP_Manager:
             self.roleName = 'Client'
         
         self.sockUDP.bind((self.ip, self.port))
-        self.sockUDP.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 212992)
+        # 实际生效的接收缓冲区大小受系统 net.core.rmem_max 限制（Linux返回值为设置值的2倍）
+        self.sockUDP.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.recvBufferSize)
+        self.recvBufferSize = self.sockUDP.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF)
+        if sys.platform.startswith('linux'):
+            try:
+                self.sockUDP.setsockopt(socket.SOL_SOCKET, SO_RXQ_OVFL, 1)
+                self._rxqOvfl = True
+            except OSError:
+                self._rxqOvfl = False
         self.addr = self.sockUDP.getsockname()
         self.ip = self.addr[0]
         self.port = self.addr[1]
@@ -64,7 +79,13 @@ class UDP_Manager:
             time.sleep(self.interval)
             while self.running:
                 try:
-                    recvData, recvAddr = self.sockUDP.recvfrom(65535) #等待接受数据
+                    if self._rxqOvfl:
+                        recvData, ancData, _, recvAddr = self.sockUDP.recvmsg(65535, socket.CMSG_SPACE(4)) #等待接受数据
+                        for level, cmsgType, cmsgData in ancData:
+                            if level == socket.SOL_SOCKET and cmsgType == SO_RXQ_OVFL:
+                                self.dropCount = struct.unpack('=I', cmsgData[:4])[0]
+                    else:
+                        recvData, recvAddr = self.sockUDP.recvfrom(65535) #等待接受数据
                 except:
                     break
                 if not recvData:
@@ -83,7 +104,7 @@ class CallbackThread:
         pass
     
 class Sensor:
-    def __init__(self, recvCallback = None, port = 9988, maxQSize = 5, callbackParam = None):
+    def __init__(self, recvCallback = None, port = 9988, maxQSize = 5, callbackParam = None, recvBufferSize = 212992):
         '''
         Parameters
         ----------
@@ -99,8 +120,12 @@ class Sensor:
             最大接收队列长度。在使用Sensor.getFrame()获取触觉数据帧时，
             数据帧缓存队列的最大长度。（若使用recvCallback方法获取触觉
             数据帧，则不受此参数的影响）
+        recvBufferSize: 整形
+            UDP套接字接收缓冲区大小（字节）。高帧率下增大此值可避免内核
+            丢包。在Linux上实际大小受 net.core.rmem_max 限制，需要时可
+            通过 sysctl -w net.core.rmem_max=12582912 放宽。
         '''
-        self._UDP = UDP_Manager(self._recvCallback_UDP, isServer = True, port = port)
+        self._UDP = UDP_Manager(self._recvCallback_UDP, isServer = True, port = port, recvBufferSize = recvBufferSize)
         self._recvQueue = queue.Queue()
         self._recvBuffer = {}
         self._maxQSize = maxQSize
@@ -229,6 +254,19 @@ class Sensor:
         else:
             return None
     
+    def getRecvBufferSize(self):
+        '''
+        获取UDP套接字实际生效的接收缓冲区大小（字节）。
+        '''
+        return self._UDP.recvBufferSize
+
+    def getDropCount(self):
+        '''
+        获取因接收缓冲区溢出而被内核丢弃的UDP包数量（仅Linux支持，
+        其他平台始终返回0）。
+        '''
+        return self._UDP.dropCount
+
     def waitForFrame(self):
         '''
         阻塞等待接收数据帧，直到接收到第一帧数据帧为止。需注意，此函数的
@@ -10,37 +10,116 @@ import numpy as np
 import h5py
 from pathlib import Path
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+import queue
+import sys
 import threading
 
+try:
+    import blosc
+    import hdf5plugin
+    HAS_BLOSC = True
+except ImportError:
+    HAS_BLOSC = False
+
+try:
+    import zstandard
+    HAS_ZSTD = True
+except ImportError:
+    HAS_ZSTD = False
+
+
+# 数据帧字段名：回调中统一使用这些常量，字典查找时复用同一字符串对象及其缓存的哈希值
+_K_SN = sys.intern('SN')
+_K_INDEX = sys.intern('index')
+_K_SEND_TS = sys.intern('sendTimestamp')
+_K_RECV_TS = sys.intern('recvTimestamp')
+_K_DISP = sys.intern('3D_Displacements')
+_K_POS = sys.intern('3D_Positions')
+
+
+def _blosc_compress_chunk(block, chunk_frames):
+    """
+    将一个HDF5块的数据用Blosc(LZ4+shuffle)压缩，供 write_direct_chunk 使用
+
+    Args:
+        block: 块数据 [<=chunk_frames, N_points, 3]
+        chunk_frames: 块的帧数（不足一块时补零，超出数据集范围的部分读取时被忽略）
+    """
+    if len(block) < chunk_frames:
+        padded = np.zeros((chunk_frames,) + block.shape[1:], dtype=block.dtype)
+        padded[:len(block)] = block
+        block = padded
+    return blosc.compress(np.ascontiguousarray(block).tobytes(), typesize=block.itemsize,
+                          clevel=3, shuffle=blosc.SHUFFLE, cname='lz4')
+
 
 class Tac3DRecorder:
     """Tac3D位移数据录制器"""
 
-    def __init__(self, port=9988, output_dir='./tac3d_data'):
+    def __init__(self, port=9988, output_dir='./tac3d_data', capacity=6000,
+                 stream_hdf5=False, chunk_frames=64, recv_buffer_bytes=12 * 1024 * 1024,
+                 dtype='float32', npz_compression='deflate'):
         """
         初始化录制器
 
         Args:
             port: UDP接收端口
             output_dir: 数据保存目录
+            capacity: 预分配缓冲区的初始帧容量（不足时自动扩容；
+                流式写入时作为环形缓冲区的固定容量）
+            stream_hdf5: 是否在录制过程中分批追加写入HDF5文件
+            chunk_frames: 流式写入时每批（即HDF5块）的帧数
+            recv_buffer_bytes: UDP接收缓冲区大小（字节），过小会导致内核丢包；
+                Linux上需要 net.core.rmem_max 不小于该值才能完全生效
+            dtype: 位移/位置数据的存储类型。'float32'对于µm级分辨率无损；
+                'float16'体积再减半，但在约10mm量级时精度约为0.01mm，仅建议用于可视化
+            npz_compression: NPZ压缩方式。'deflate'（默认）为 np.savez_compressed
+                的单线程压缩，输出标准 .npz；'zstd'先写未压缩NPZ再用多线程Zstandard
+                压缩为 .npz.zst（需安装zstandard，否则保存时退回'deflate'）；'none'不压缩
         """
         self.port = port
+        self.recv_buffer_bytes = recv_buffer_bytes
+        self.dtype = np.dtype(dtype)
+        self.npz_compression = npz_compression
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(parents=True, exist_ok=True)
 
-        # 传感器信息
+        # 传感器信息（收到第一帧时置位连接事件）
         self.sensor_sn = ''
+        self._connected_evt = threading.Event()
 
         # 录制状态
         self.recording = False
-        self.record_lock = threading.Lock()
-
-        # 录制数据
-        self.displacements_list = []  # 位移数据列表
-        self.positions_list = []  # 位置数据列表（可选）
-        self.frame_indices = []  # 帧序号
-        self.send_timestamps = []  # 发送时间戳
-        self.recv_timestamps = []  # 接收时间戳
+        self._progress_thread = None
+
+        # 录制数据（预分配缓冲区，首帧到达后根据测量点数量分配）
+        # 回调线程是唯一写入者，写入位置由 recorded_frames 计数器决定；
+        # _state_lock 只保证开始/停止录制与回调中正在写入的帧互斥（录制中不会竞争）
+        self._state_lock = threading.Lock()
+        self.capacity = capacity
+        self._disp_buf = None  # 位移数据 [capacity, N_points, 3]
+        self._pos_buf = None  # 位置数据 [capacity, N_points, 3]（可选）
+        self._idx_buf = None  # 帧序号
+        self._send_ts_buf = None  # 发送时间戳
+        self._recv_ts_buf = None  # 接收时间戳
+        self._has_positions = False
+
+        # 流式HDF5写入（环形缓冲区容量对齐到整数个批次，保证每批数据连续）
+        # 回调线程每凑满一批就把批次终点放入有界队列，由独立IO线程压缩写入；
+        # 环形缓冲区至少容纳队列中积压的全部批次，队列满时回调阻塞等待而不覆盖未写入的数据
+        self.stream_hdf5 = stream_hdf5
+        self.chunk_frames = chunk_frames
+        self.io_queue_size = 8
+        if stream_hdf5:
+            capacity = max(capacity, (self.io_queue_size + 2) * chunk_frames)
+            self.capacity = -(-capacity // chunk_frames) * chunk_frames
+        self._io_queue = queue.Queue(maxsize=self.io_queue_size)
+        self._io_thread = None
+        self._stream_file = None
+        self._stream_path = None
+        self._stream_dsets = None
+        self._flushed_frames = 0
 
         # 统计
         self.total_frames = 0
@@ -56,52 +135,233 @@ class Tac3DRecorder:
             recvCallback=self._data_callback,
             port=self.port,
             maxQSize=100,  # 增大队列以防丢帧
-            callbackParam='Tac3D Recorder'
+            callbackParam='Tac3D Recorder',
+            recvBufferSize=self.recv_buffer_bytes  # 增大套接字缓冲区以防内核丢包
         )
 
         print('✓ 传感器对象创建成功')
+        print(f'  UDP接收缓冲区: {self.sensor.getRecvBufferSize() / 1024 / 1024:.1f} MB')
+        if self.sensor.getRecvBufferSize() < self.recv_buffer_bytes:
+            print(f'  ⚠ 接收缓冲区被系统限制，可执行: '
+                  f'sudo sysctl -w net.core.rmem_max={self.recv_buffer_bytes}')
 
     def _data_callback(self, frame, param):
         """数据接收回调函数"""
         # 更新传感器信息
-        self.sensor_sn = frame['SN']
+        self.sensor_sn = frame[_K_SN]
         self.total_frames += 1
+        if not self._connected_evt.is_set():
+            self._connected_evt.set()
 
         # 如果正在录制，保存数据
-        if self.recording:
-            with self.record_lock:
-                # 获取位移数据
-                displacements = frame.get('3D_Displacements')
-                positions = frame.get('3D_Positions')
+        if not self.recording:
+            return
+        with self._state_lock:
+            # 获取位移数据
+            displacements = frame.get(_K_DISP)
+
+            # 加锁后再次检查：停止录制后不再写入，开始录制时的计数器重置不会被覆盖
+            if self.recording and displacements is not None:
+                n = self.recorded_frames
+                disp_buf = self._disp_buf
+                if disp_buf is None or (not self.stream_hdf5 and n >= len(disp_buf)):
+                    self._grow_buffers(displacements.shape[0])
+                    disp_buf = self._disp_buf
+
+                # 流式写入时按环形缓冲区取模，否则 i == n
+                i = n % len(disp_buf)
+
+                # 直接拷贝到预分配缓冲区的对应行，不创建新的数组对象，
+                # 也不保留对PyTac3D帧数据的引用
+                np.copyto(disp_buf[i], displacements, casting='same_kind')
+
+                # 同时保存位置（用于后续分析）
+                positions = frame.get(_K_POS)
+                if positions is not None:
+                    np.copyto(self._pos_buf[i], positions, casting='same_kind')
+                    self._has_positions = True
+
+                # 保存元数据
+                self._idx_buf[i] = frame[_K_INDEX]
+                self._send_ts_buf[i] = frame[_K_SEND_TS]
+                self._recv_ts_buf[i] = frame[_K_RECV_TS]
+
+                self.recorded_frames = n + 1
+
+                # 每凑满一批就交给IO线程追加写入HDF5
+                if self._io_thread is not None and self.recorded_frames % self.chunk_frames == 0:
+                    self._io_queue.put(self.recorded_frames)
+
+    def _progress_loop(self, interval=0.5):
+        """进度显示线程：定期读取帧计数并打印，避免在数据回调中进行终端IO"""
+        while self.recording:
+            time.sleep(interval)
+            print(f"\r录制中... 已录制 {self.recorded_frames} 帧", end='', flush=True)
+
+    def _grow_buffers(self, n_points):
+        """
+        分配或扩容录制缓冲区
 
-                if displacements is not None:
-                    self.displacements_list.append(displacements.copy())
+        首次调用时按 capacity 分配；缓冲区写满时容量翻倍并保留已录制数据，
+        保证录制过程中不丢弃任何帧。
 
-                    # 同时保存位置（用于后续分析）
-                    if positions is not None:
-                        self.positions_list.append(positions.copy())
+        Args:
+            n_points: 每帧的测量点数量
+        """
+        if self._disp_buf is None:
+            capacity = self.capacity
+        else:
+            capacity = len(self._disp_buf) * 2
+
+        def grow(old, shape, dtype):
+            new = np.empty(shape, dtype=dtype)
+            if old is not None:
+                new[:len(old)] = old
+            return new
+
+        self._disp_buf = grow(self._disp_buf, (capacity, n_points, 3), self.dtype)
+        self._pos_buf = grow(self._pos_buf, (capacity, n_points, 3), self.dtype)
+        self._idx_buf = grow(self._idx_buf, capacity, np.int64)
+        self._send_ts_buf = grow(self._send_ts_buf, capacity, np.float64)
+        self._recv_ts_buf = grow(self._recv_ts_buf, capacity, np.float64)
+
+    def _open_stream(self):
+        """打开流式写入的HDF5文件（数据集在第一批数据写入时创建）"""
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        self._stream_path = self.output_dir / f'tac3d_{self.sensor_sn}_{timestamp}.h5'
+        self._stream_file = h5py.File(self._stream_path, 'w')
+        self._stream_dsets = None
+        self._flushed_frames = 0
+
+        self._io_queue = queue.Queue(maxsize=self.io_queue_size)
+        self._io_thread = threading.Thread(target=self._drain_io, daemon=True)
+        self._io_thread.start()
+
+    def _drain_io(self):
+        """IO线程：依次取出批次终点并追加写入HDF5，收到None时退出"""
+        while True:
+            end = self._io_queue.get()
+            if end is None:
+                break
+            try:
+                self._flush_stream(end)
+            except Exception as e:
+                print(f'\n⚠ HDF5写入失败: {e}')
+
+    def _stop_io_thread(self, end=None):
+        """
+        停止IO线程，等待队列中的批次全部写入
 
-                    # 保存元数据
-                    self.frame_indices.append(frame['index'])
-                    self.send_timestamps.append(frame['sendTimestamp'])
-                    self.recv_timestamps.append(frame['recvTimestamp'])
+        Args:
+            end: 退出前额外追加写入到的总帧数（用于写入最后不足一批的帧）
+        """
+        if self._io_thread is None:
+            return
+        if end is not None:
+            self._io_queue.put(end)
+        self._io_queue.put(None)
+        self._io_thread.join()
+        self._io_thread = None
+
+    def _array_compression(self):
+        """位移/位置数据集的压缩参数：有Blosc时使用Blosc过滤器（块数据自行压缩后直接写入）"""
+        if HAS_BLOSC:
+            return hdf5plugin.Blosc(cname='lz4', clevel=3, shuffle=hdf5plugin.Blosc.SHUFFLE)
+        # LZF压缩速度远快于gzip，适合录制过程中实时写入
+        return {'compression': 'lzf'}
+
+    def _write_direct_chunks(self, dset, data, start=0):
+        """
+        绕过HDF5过滤管线，将数据按块压缩后直接写入（各块并行压缩，Blosc压缩时释放GIL）
 
-                    self.recorded_frames += 1
+        Args:
+            dset: 分块数据集（块帧数取自 dset.chunks）
+            data: 待写入数据 [n, N_points, 3]
+            start: 写入起始帧（须对齐到块边界）
+        """
+        chunk = dset.chunks[0]
+        blocks = [data[i:i + chunk] for i in range(0, len(data), chunk)]
+        if len(blocks) == 1:
+            compressed = [_blosc_compress_chunk(blocks[0], chunk)]
+        else:
+            with ThreadPoolExecutor() as executor:
+                compressed = list(executor.map(lambda b: _blosc_compress_chunk(b, chunk), blocks))
+        for k, payload in enumerate(compressed):
+            dset.id.write_direct_chunk((start + k * chunk, 0, 0), payload)
+
+    def _create_stream_datasets(self, n_points):
+        """创建可扩展的分块数据集"""
+        f = self._stream_file
+        chunk = self.chunk_frames
+        compression = self._array_compression()
+        dsets = {
+            'frame_indices': f.create_dataset(
+                'frame_indices', shape=(0,), maxshape=(None,), chunks=(chunk,), dtype=np.int64),
+            'send_timestamps': f.create_dataset(
+                'send_timestamps', shape=(0,), maxshape=(None,), chunks=(chunk,), dtype=np.float64),
+            'recv_timestamps': f.create_dataset(
+                'recv_timestamps', shape=(0,), maxshape=(None,), chunks=(chunk,), dtype=np.float64),
+            'displacements': f.create_dataset(
+                'displacements', shape=(0, n_points, 3), maxshape=(None, n_points, 3),
+                chunks=(chunk, n_points, 3), dtype=self.dtype, **compression),
+        }
+        if self._has_positions:
+            dsets['positions'] = f.create_dataset(
+                'positions', shape=(0, n_points, 3), maxshape=(None, n_points, 3),
+                chunks=(chunk, n_points, 3), dtype=self.dtype, **compression)
+        self._stream_dsets = dsets
 
-                    # 每50帧打印一次进度
-                    if self.recorded_frames % 50 == 0:
-                        print(f"\r录制中... 已录制 {self.recorded_frames} 帧", end='', flush=True)
+    def _flush_stream(self, end):
+        """
+        将 [已写入帧数, end) 范围内的帧追加到HDF5文件
+
+        Args:
+            end: 追加后的总帧数
+        """
+        start = self._flushed_frames
+        if end <= start:
+            return
+
+        if self._stream_dsets is None:
+            self._create_stream_datasets(self._disp_buf.shape[1])
+
+        # 批次起点对齐到chunk_frames且容量为其整数倍，环形缓冲区中的数据连续
+        lo = start % len(self._disp_buf)
+        hi = lo + (end - start)
+        buffers = {
+            'frame_indices': self._idx_buf,
+            'send_timestamps': self._send_ts_buf,
+            'recv_timestamps': self._recv_ts_buf,
+            'displacements': self._disp_buf,
+            'positions': self._pos_buf,
+        }
+        for name, dset in self._stream_dsets.items():
+            dset.resize(end, axis=0)
+            if HAS_BLOSC and dset.ndim == 3:
+                self._write_direct_chunks(dset, buffers[name][lo:hi], start)
+            else:
+                dset[start:end] = buffers[name][lo:hi]
+
+        self._flushed_frames = end
+
+    def _close_stream(self):
+        """关闭流式写入的HDF5文件，返回文件路径"""
+        self._stop_io_thread()
+        filepath = self._stream_path
+        if self._stream_file is not None:
+            self._stream_file.close()
+        self._stream_file = None
+        self._stream_dsets = None
+        self._stream_path = None
+        return filepath
 
     def wait_for_connection(self, timeout=10):
         """等待传感器连接"""
         print('\n等待传感器连接...')
-        self.sensor.waitForFrame()
 
-        start_time = time.time()
-        while not self.sensor_sn:
-            time.sleep(0.1)
-            if time.time() - start_time > timeout:
-                raise TimeoutError(f'等待传感器连接超时 ({timeout}秒)')
+        # 由数据回调在收到第一帧时唤醒，无需轮询
+        if not self._connected_evt.wait(timeout):
+            raise TimeoutError(f'等待传感器连接超时 ({timeout}秒)')
 
         print(f'✓ 传感器已连接 (SN: {self.sensor_sn})')
         return True
@@ -129,18 +389,22 @@ class Tac3DRecorder:
             print('⚠ 已在录制中')
             return False
 
-        with self.record_lock:
-            # 清空之前的数据
-            self.displacements_list = []
-            self.positions_list = []
-            self.frame_indices = []
-            self.send_timestamps = []
-            self.recv_timestamps = []
+        with self._state_lock:
+            # 清空之前的数据（复用已分配的缓冲区）
             self.recorded_frames = 0
+            self._has_positions = False
+
+            # 流式写入：打开新的HDF5文件（关闭上一次未保存的文件）
+            if self.stream_hdf5:
+                self._close_stream()
+                self._open_stream()
 
             self.recording = True
 
         print('\n✓ 开始录制...')
+
+        self._progress_thread = threading.Thread(target=self._progress_loop, daemon=True)
+        self._progress_thread.start()
         return True
 
     def stop_recording(self):
@@ -149,9 +413,17 @@ class Tac3DRecorder:
             print('⚠ 未在录制中')
             return False
 
-        self.recording = False
+        # 加锁置位：返回时回调中不再有正在写入的帧
+        with self._state_lock:
+            self.recording = False
+        if self._progress_thread is not None:
+            self._progress_thread.join()
+            self._progress_thread = None
         print(f'\n✓ 停止录制')
         print(f'  已录制 {self.recorded_frames} 帧')
+        drop_count = self.sensor.getDropCount()
+        if drop_count > 0:
+            print(f'  ⚠ UDP接收缓冲区溢出丢包: {drop_count} 个')
 
         return True
 
@@ -162,6 +434,9 @@ class Tac3DRecorder:
         Args:
             filename: 输出文件名（不含扩展名）
         """
+        if self.stream_hdf5:
+            return self._finish_stream_hdf5(filename)
+
         if self.recorded_frames == 0:
             print('⚠ 没有录制数据，无法保存')
             return None
@@ -172,30 +447,26 @@ class Tac3DRecorder:
             filename = f'tac3d_{self.sensor_sn}_{timestamp}'
 
         filepath = self.output_dir / f'{filename}.h5'
+        n = self.recorded_frames
 
         print(f'\n保存数据到HDF5: {filepath}')
 
         with h5py.File(filepath, 'w') as f:
             # 创建元数据组
-            metadata = f.create_group('metadata')
-            metadata.attrs['sensor_sn'] = self.sensor_sn
-            metadata.attrs['total_frames'] = self.recorded_frames
-            metadata.attrs['recording_date'] = datetime.now().isoformat()
-            metadata.attrs['pytac3d_version'] = PyTac3D.PYTAC3D_VERSION
+            self._write_hdf5_metadata(f, n)
 
             # 保存时间戳
-            f.create_dataset('frame_indices', data=np.array(self.frame_indices))
-            f.create_dataset('send_timestamps', data=np.array(self.send_timestamps))
-            f.create_dataset('recv_timestamps', data=np.array(self.recv_timestamps))
+            f.create_dataset('frame_indices', data=self._idx_buf[:n])
+            f.create_dataset('send_timestamps', data=self._send_ts_buf[:n])
+            f.create_dataset('recv_timestamps', data=self._recv_ts_buf[:n])
 
-            # 保存位移数据 (shape: [N_frames, N_points, 3])
-            displacements_array = np.array(self.displacements_list)
-            f.create_dataset('displacements', data=displacements_array, compression='gzip')
+            # 保存位移数据 (shape: [N_frames, N_points, 3])，直接写入缓冲区切片
+            displacements_array = self._disp_buf[:n]
+            self._create_array_dataset(f, 'displacements', displacements_array)
 
             # 保存位置数据（如果有）
-            if len(self.positions_list) > 0:
-                positions_array = np.array(self.positions_list)
-                f.create_dataset('positions', data=positions_array, compression='gzip')
+            if self._has_positions:
+                self._create_array_dataset(f, 'positions', self._pos_buf[:n])
 
             print(f'  位移数据形状: {displacements_array.shape}')
             print(f'  数据点数量: {displacements_array.shape[1]}')
@@ -204,13 +475,75 @@ class Tac3DRecorder:
         print(f'✓ 保存成功: {filepath}')
         return filepath
 
+    def _create_array_dataset(self, f, name, data):
+        """写入 [N_frames, N_points, 3] 数据集：有Blosc时按块并行压缩后直接写入，否则使用gzip"""
+        if len(data) == 0:
+            # 空数据集无法分块
+            return f.create_dataset(name, shape=data.shape, dtype=data.dtype)
+        if not HAS_BLOSC:
+            return f.create_dataset(name, data=data, compression='gzip')
+
+        # 块帧数不能超过数据帧数（HDF5限制），录制不足 chunk_frames 帧时缩小为整段一块
+        chunk = min(self.chunk_frames, len(data))
+        dset = f.create_dataset(name, shape=data.shape, dtype=data.dtype,
+                                chunks=(chunk,) + data.shape[1:],
+                                **self._array_compression())
+        self._write_direct_chunks(dset, data)
+        return dset
+
+    def _write_hdf5_metadata(self, f, n):
+        """写入HDF5元数据组"""
+        metadata = f.create_group('metadata')
+        metadata.attrs['sensor_sn'] = self.sensor_sn
+        metadata.attrs['total_frames'] = n
+        metadata.attrs['recording_date'] = datetime.now().isoformat()
+        metadata.attrs['pytac3d_version'] = PyTac3D.PYTAC3D_VERSION
+
+    def _finish_stream_hdf5(self, filename=None):
+        """
+        完成流式HDF5写入：追加剩余帧、写入元数据并关闭文件
+
+        Args:
+            filename: 输出文件名（不含扩展名），None则保留录制开始时的文件名
+        """
+        if self._stream_file is None:
+            print('⚠ 没有录制数据，无法保存')
+            return None
+
+        n = self.recorded_frames
+        if n == 0:
+            self._close_stream().unlink()
+            print('⚠ 没有录制数据，无法保存')
+            return None
+
+        print(f'\n完成HDF5写入: {self._stream_path}')
+
+        # 录制期间的批次已在后台写入，这里只需等待剩余批次完成
+        self._stop_io_thread(end=n)
+        self._write_hdf5_metadata(self._stream_file, n)
+        shape = self._stream_dsets['displacements'].shape
+        filepath = self._close_stream()
+
+        if filename is not None:
+            filepath = filepath.replace(self.output_dir / f'{filename}.h5')
+
+        print(f'  位移数据形状: {shape}')
+        print(f'  数据点数量: {shape[1]}')
+        print(f'  录制帧数: {shape[0]}')
+        print(f'✓ 保存成功: {filepath}')
+        return filepath
+
     def save_npz(self, filename=None):
         """
-        保存为NPZ格式（NumPy压缩格式）
+        保存为NPZ格式（压缩方式由 npz_compression 决定，zstd时输出 .npz.zst）
 
         Args:
             filename: 输出文件名（不含扩展名）
         """
+        if self.stream_hdf5:
+            print('⚠ 流式HDF5模式下数据未保留在内存中，无法保存为NPZ')
+            return None
+
         if self.recorded_frames == 0:
             print('⚠ 没有录制数据，无法保存')
             return None
@@ -221,28 +554,39 @@ class Tac3DRecorder:
             filename = f'tac3d_{self.sensor_sn}_{timestamp}'
 
         filepath = self.output_dir / f'{filename}.npz'
+        n = self.recorded_frames
 
         print(f'\n保存数据到NPZ: {filepath}')
 
-        # 转换为numpy数组
-        displacements_array = np.array(self.displacements_list)
+        # 缓冲区切片（不产生额外拷贝）
+        displacements_array = self._disp_buf[:n]
 
         # 准备保存的数据
         save_dict = {
             'displacements': displacements_array,
-            'frame_indices': np.array(self.frame_indices),
-            'send_timestamps': np.array(self.send_timestamps),
-            'recv_timestamps': np.array(self.recv_timestamps),
+            'frame_indices': self._idx_buf[:n],
+            'send_timestamps': self._send_ts_buf[:n],
+            'recv_timestamps': self._recv_ts_buf[:n],
             'sensor_sn': np.array([self.sensor_sn], dtype='U'),  # 字符串
-            'total_frames': self.recorded_frames
+            'total_frames': n
         }
 
         # 添加位置数据（如果有）
-        if len(self.positions_list) > 0:
-            save_dict['positions'] = np.array(self.positions_list)
+        if self._has_positions:
+            save_dict['positions'] = self._pos_buf[:n]
 
         # 保存
-        np.savez_compressed(filepath, **save_dict)
+        compression = self.npz_compression
+        if compression == 'zstd' and not HAS_ZSTD:
+            print('  ⚠ 未安装zstandard，改用deflate压缩 (pip install zstandard)')
+            compression = 'deflate'
+
+        if compression == 'deflate':
+            np.savez_compressed(filepath, **save_dict)
+        else:
+            np.savez(filepath, **save_dict)
+            if compression == 'zstd':
+                filepath = self._zstd_compress_file(filepath)
 
         print(f'  位移数据形状: {displacements_array.shape}')
         print(f'  数据点数量: {displacements_array.shape[1]}')
@@ -251,6 +595,20 @@ class Tac3DRecorder:
 
         return filepath
 
+    def _zstd_compress_file(self, filepath, level=3):
+        """
+        用多线程Zstandard压缩文件，生成 <filepath>.zst 并删除原文件
+
+        Returns:
+            Path: 压缩后的文件路径
+        """
+        zst_path = filepath.with_name(filepath.name + '.zst')
+        cctx = zstandard.ZstdCompressor(level=level, threads=-1)
+        with open(filepath, 'rb') as src, open(zst_path, 'wb') as dst:
+            cctx.copy_stream(src, dst)
+        filepath.unlink()
+        return zst_path
+
     def interactive_record(self, duration=None, auto_save=True, save_format='hdf5'):
         """
         交互式录制
@@ -342,6 +700,9 @@ def main():
   # 指定输出目录
   python tac3d_record_displacement.py --output ./my_data
 
+  # 录制过程中流式写入HDF5（内存占用恒定，适合长时间录制）
+  python tac3d_record_displacement.py --stream
+
   # 远程连接
   python tac3d_record_displacement.py --port 9988
         """
@@ -360,14 +721,31 @@ def main():
                        help='连接后自动校准')
     parser.add_argument('--filename', type=str, default=None,
                        help='输出文件名（不含扩展名）')
+    parser.add_argument('--stream', action='store_true',
+                       help='录制过程中分批写入HDF5（仅支持hdf5格式）')
+    parser.add_argument('--recv-buffer', type=int, default=12 * 1024 * 1024,
+                       help='UDP接收缓冲区大小，单位字节 (默认: 12MB)')
+    parser.add_argument('--dtype', type=str, default='float32',
+                       choices=['float32', 'float16'],
+                       help='位移/位置数据存储精度 (默认: float32)')
+    parser.add_argument('--npz-compression', type=str, default='deflate',
+                       choices=['deflate', 'zstd', 'none'],
+                       help='NPZ压缩方式 (默认: deflate，输出标准.npz；zstd输出.npz.zst，需zstandard)')
 
     args = parser.parse_args()
 
+    if args.stream and args.format != 'hdf5':
+        parser.error('--stream 仅支持 --format hdf5')
+
     try:
         # 创建录制器
         recorder = Tac3DRecorder(
             port=args.port,
-            output_dir=args.output
+            output_dir=args.output,
+            stream_hdf5=args.stream,
+            recv_buffer_bytes=args.recv_buffer,
+            dtype=args.dtype,
+            npz_compression=args.npz_compression
         )
 
         # 等待连接
@@ -10,12 +10,164 @@ import cv2
 from pathlib import Path
 from datetime import datetime
 import argparse
+import math
+import shutil
+import subprocess
+
+try:
+    # 注册Blosc等HDF5压缩过滤器，用于读取录制脚本以Blosc压缩写入的文件
+    import hdf5plugin  # noqa: F401
+except ImportError:
+    pass
+
+try:
+    from numba import njit, prange
+    HAS_NUMBA = True
+except ImportError:
+    HAS_NUMBA = False
+
+try:
+    import cupy as cp
+    HAS_CUPY = True
+except ImportError:
+    HAS_CUPY = False
+
+
+if HAS_NUMBA:
+    @njit(parallel=True, fastmath=True, cache=True)
+    def _max_magnitude(disp):
+        """所有帧、所有测量点的最大位移幅值"""
+        n_frames = disp.shape[0]
+        frame_max = np.zeros(n_frames, dtype=np.float64)
+        for f in prange(n_frames):
+            m = 0.0
+            for p in range(disp.shape[1]):
+                x = disp[f, p, 0]
+                y = disp[f, p, 1]
+                z = disp[f, p, 2]
+                m = max(m, x * x + y * y + z * z)
+            frame_max[f] = m
+        return math.sqrt(frame_max.max()) if n_frames > 0 else 0.0
+
+    @njit(parallel=True, fastmath=True, cache=True)
+    def _magnitude_to_u8(disp, scale, point_of_cell, out):
+        """求模、归一化、量化并按网格顺序写入 [N, ny, nx] 网格，单次遍历无临时数组"""
+        nx = out.shape[2]
+        for f in prange(disp.shape[0]):
+            for c in range(point_of_cell.shape[0]):
+                p = point_of_cell[c]
+                x = disp[f, p, 0]
+                y = disp[f, p, 1]
+                z = disp[f, p, 2]
+                m = math.sqrt(x * x + y * y + z * z) * scale
+                out[f, c // nx, c % nx] = min(255, int(m))
+
+
+def open_video_writer(path, fps, frame_size):
+    """
+    创建视频写入器，优先使用硬件加速编码
+
+    先尝试FFmpeg后端的H.264编码并请求硬件加速（NVENC/VA-API等），
+    不可用时退回mp4v软件编码。
+
+    Args:
+        path: 输出视频路径
+        fps: 视频帧率
+        frame_size: (宽, 高)
+
+    Returns:
+        cv2.VideoWriter
+    """
+    if hasattr(cv2, 'VIDEOWRITER_PROP_HW_ACCELERATION'):
+        video_writer = cv2.VideoWriter(
+            str(path),
+            cv2.CAP_FFMPEG,
+            cv2.VideoWriter_fourcc(*'avc1'),
+            fps,
+            frame_size,
+            [cv2.VIDEOWRITER_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY,
+             cv2.VIDEOWRITER_PROP_HW_ACCELERATION_USE_OPENCL, 0]
+        )
+        if video_writer.isOpened():
+            return video_writer
+
+    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+    return cv2.VideoWriter(str(path), fourcc, fps, frame_size)
+
+
+class FFmpegPipeWriter:
+    """
+    通过管道将原始BGR帧写入单个ffmpeg子进程进行编码
+
+    接口与cv2.VideoWriter一致（write/isOpened/release）。ffmpeg在独立进程中
+    多线程编码和封装，与Python端逐帧着色并行进行。
+    """
+
+    # 按优先级尝试的编码器：NVENC硬件编码 > x264软件编码 > mpeg4
+    CODECS = ('h264_nvenc', 'libx264', 'mpeg4')
+
+    def __init__(self, path, fps, frame_size, codec=None):
+        """
+        Args:
+            path: 输出视频路径
+            fps: 视频帧率
+            frame_size: (宽, 高)
+            codec: ffmpeg编码器名称，None则自动选择
+        """
+        self.ffmpeg = shutil.which('ffmpeg')
+        self.proc = None
+        if self.ffmpeg is None:
+            return
+
+        self.codec = codec or self._select_codec()
+        width, height = frame_size
+        cmd = [
+            self.ffmpeg, '-y', '-loglevel', 'error',
+            '-f', 'rawvideo', '-pix_fmt', 'bgr24',
+            '-s', f'{width}x{height}', '-r', str(fps),
+            '-i', '-',
+            '-c:v', self.codec,
+        ]
+        if self.codec == 'h264_nvenc':
+            cmd += ['-preset', 'p1', '-tune', 'll']
+        cmd += ['-pix_fmt', 'yuv420p', str(path)]
+
+        # 较大的管道缓冲区作为Python与ffmpeg之间的生产者/消费者队列
+        self.proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, bufsize=10 * 1024 * 1024)
+
+    def _select_codec(self):
+        """从ffmpeg支持的编码器中选择第一个可用的"""
+        result = subprocess.run([self.ffmpeg, '-hide_banner', '-encoders'],
+                                capture_output=True, text=True)
+        encoders = {line.split()[1] for line in result.stdout.splitlines()
+                    if len(line.split()) > 1}
+        for codec in self.CODECS:
+            if codec in encoders:
+                return codec
+        return self.CODECS[-1]
+
+    def isOpened(self):
+        return self.proc is not None and self.proc.poll() is None
+
+    def write(self, image):
+        self.proc.stdin.write(image.tobytes())
+
+    def release(self):
+        if self.proc is None:
+            return
+        self.proc.stdin.close()
+        if self.proc.wait() != 0:
+            raise RuntimeError(f'ffmpeg编码失败 (返回码: {self.proc.returncode})')
 
 
 class Tac3DVideoVisualizer:
     """Tac3D位移数据视频可视化器"""
 
-    def __init__(self, data_file, output_path=None, fps=30, width=800, height=600):
+    # 分块计算位移幅值时每块的帧数（使工作集保持在缓存内）
+    BLOCK_FRAMES = 4096
+
+    def __init__(self, data_file, output_path=None, fps=30, width=800, height=600,
+                 encoder='opencv', use_gpu=False, point_order=None):
         """
         初始化可视化器
 
@@ -25,14 +177,40 @@ class Tac3DVideoVisualizer:
             fps: 输出视频帧率
             width: 视频宽度
             height: 视频高度
+            encoder: 视频编码方式，'opencv'（cv2.VideoWriter）或 'ffmpeg'（管道写入ffmpeg子进程）
+            use_gpu: 是否使用CuPy在GPU上计算位移幅值与归一化（需CUDA环境）
+            point_order: 20×20网格（按行优先）每个格子对应的测量点序号，长度400；
+                None表示测量点本身即按行优先排列
         """
+        if use_gpu and not HAS_CUPY:
+            print('⚠ 未安装cupy，改用CPU计算 (pip install cupy-cuda12x)')
+            use_gpu = False
+        self.use_gpu = use_gpu
+        self._gpu_magnitudes = None
+
+        # 网格格子 -> 测量点序号的映射表，只计算一次，逐帧按该表顺序读取
+        if point_order is None:
+            point_order = np.arange(20 * 20)
+        self._point_of_cell = np.ascontiguousarray(point_order, dtype=np.intp)
+        if self._point_of_cell.shape != (20 * 20,):
+            raise ValueError('point_order 必须包含400个测量点序号')
         self.data_file = Path(data_file)
         self.output_path = output_path
         self.fps = fps
         self.image_width = width
         self.image_height = height
+        self.encoder = encoder
         self.colormap = cv2.COLORMAP_JET
 
+        # 预计算色图查找表（256×3，BGR），逐帧只需对20×20网格查表
+        self.colormap_lut = cv2.applyColorMap(
+            np.arange(256, dtype=np.uint8).reshape(1, 256), self.colormap
+        ).reshape(256, 3)
+
+        # 逐帧复用的输出缓冲区（20×20着色网格与放大后的整帧图像）
+        self._small_bgr = np.empty((20, 20, 3), dtype=np.uint8)
+        self._frame_bgr = np.empty((height, width, 3), dtype=np.uint8)
+
         # 数据容器
         self.displacements = None
         self.positions = None
@@ -58,9 +236,15 @@ class Tac3DVideoVisualizer:
             self._load_hdf5()
         elif file_ext == '.npz':
             self._load_npz()
+        elif self.data_file.name.lower().endswith('.npz.zst'):
+            self._load_npz_zst()
         else:
             raise ValueError(f'不支持的文件格式: {file_ext}')
 
+        # 统一以float32计算位移幅值：旧文件为float64时内存减半，
+        # float16文件则避免低精度下的慢速运算（输出最终量化为uint8，精度足够）
+        self.displacements = np.asarray(self.displacements, dtype=np.float32)
+
         print(f'✓ 数据加载完成')
         print(f'  传感器SN: {self.sensor_sn}')
         print(f'  总帧数: {self.total_frames}')
@@ -69,8 +253,13 @@ class Tac3DVideoVisualizer:
 
     def _load_hdf5(self):
         """加载HDF5格式数据"""
-        with h5py.File(self.data_file, 'r') as f:
-            self.displacements = f['displacements'][:]
+        # 块缓存足够大，使整段数据集解压时每个块只读取、解压一次
+        with h5py.File(self.data_file, 'r', rdcc_nbytes=256 * 1024 * 1024, rdcc_nslots=1_000_003) as f:
+            # 直接读入预分配的float32数组（由HDF5完成类型转换），避免再拷贝一次
+            dset = f['displacements']
+            self.displacements = np.empty(dset.shape, dtype=np.float32)
+            if dset.size > 0:
+                dset.read_direct(self.displacements)
 
             # 尝试加载位置数据
             if 'positions' in f:
@@ -84,9 +273,18 @@ class Tac3DVideoVisualizer:
             self.sensor_sn = f['metadata'].attrs['sensor_sn']
             self.total_frames = f['metadata'].attrs['total_frames']
 
-    def _load_npz(self):
+    def _load_npz_zst(self):
+        """加载Zstandard压缩的NPZ数据（.npz.zst，需安装zstandard）"""
+        import io
+        import zstandard
+
+        with open(self.data_file, 'rb') as f:
+            raw = zstandard.ZstdDecompressor().stream_reader(f).read()
+        self._load_npz(io.BytesIO(raw))
+
+    def _load_npz(self, source=None):
         """加载NPZ格式数据"""
-        data = np.load(self.data_file)
+        data = np.load(self.data_file if source is None else source)
 
         self.displacements = data['displacements']
 
@@ -102,45 +300,101 @@ class Tac3DVideoVisualizer:
         self.sensor_sn = str(data['sensor_sn'][0])
         self.total_frames = int(data['total_frames'])
 
-    def create_displacement_image(self, frame_idx, global_max):
+    def _iter_blocks(self):
+        """按 BLOCK_FRAMES 帧分块遍历位移数据，返回 (起始帧, 块数据)"""
+        for start in range(0, len(self.displacements), self.BLOCK_FRAMES):
+            yield start, self.displacements[start:start + self.BLOCK_FRAMES]
+
+    def _compute_gpu_magnitudes(self):
+        """在GPU上一次性计算所有帧的位移幅值（结果保留在显存中供归一化复用）"""
+        if self._gpu_magnitudes is None:
+            disp = cp.asarray(self.displacements, dtype=cp.float32)
+            self._gpu_magnitudes = cp.sqrt(cp.einsum('fpc,fpc->fp', disp, disp))
+        return self._gpu_magnitudes
+
+    def compute_global_max(self):
         """
-        创建单帧位移热图（20×20网格，简洁版）
+        计算全局最大位移幅值
 
-        Args:
-            frame_idx: 帧索引
-            global_max: 全局最大位移值（用于归一化）
+        分块用einsum求各点位移的平方和（不生成平方后的中间数组），
+        只在最后对最大值开方。
 
         Returns:
-            numpy.ndarray: BGR格式图像
+            float: 全局最大位移值
+        """
+        if self.use_gpu:
+            magnitudes = self._compute_gpu_magnitudes()
+            return float(magnitudes.max()) if magnitudes.size > 0 else 0.0
+
+        if HAS_NUMBA:
+            return float(_max_magnitude(np.ascontiguousarray(self.displacements)))
+
+        max_sq = 0.0
+        for _, block in self._iter_blocks():
+            max_sq = max(max_sq, float(np.einsum('fpc,fpc->fp', block, block).max()))
+        return math.sqrt(max_sq)
+
+    def normalize_displacements(self, global_max):
         """
-        # 获取当前帧的位移数据
-        displacements = self.displacements[frame_idx]
+        一次性将所有帧的位移幅值归一化为20×20的uint8网格
 
-        # 计算位移幅值
-        disp_magnitude = np.linalg.norm(displacements, axis=1)
+        安装numba时使用融合内核一次遍历完成；否则按块计算，避免生成
+        整段录制的浮点幅值数组。
 
+        Args:
+            global_max: 全局最大位移值（用于归一化）
+
+        Returns:
+            numpy.ndarray: uint8网格 [N_frames, 20, 20]
+        """
         # 假设数据是20×20的网格（400个点）
         nx, ny = 20, 20
-        if len(disp_magnitude) != nx * ny:
-            raise ValueError(f'数据点数量({len(disp_magnitude)})不是20×20=400个点')
+        n_points = self.displacements.shape[1]
+        if n_points != nx * ny:
+            raise ValueError(f'数据点数量({n_points})不是20×20=400个点')
 
-        # Reshape为20×20网格
-        disp_grid = disp_magnitude.reshape(ny, nx)
+        disp_grids = np.empty((self.displacements.shape[0], ny, nx), dtype=np.uint8)
 
         # 使用全局最大值归一化到0-255
-        if global_max > 0:
-            disp_norm = (disp_grid / global_max * 255).astype(np.uint8)
-        else:
-            disp_norm = np.zeros_like(disp_grid, dtype=np.uint8)
+        scale = 255.0 / global_max if global_max > 0 else 0.0
+
+        if self.use_gpu:
+            magnitudes = self._compute_gpu_magnitudes() * scale
+            magnitudes = magnitudes[:, cp.asarray(self._point_of_cell)]
+            return cp.asnumpy(magnitudes.astype(cp.uint8).reshape(-1, ny, nx))
+
+        if HAS_NUMBA:
+            _magnitude_to_u8(np.ascontiguousarray(self.displacements), scale,
+                             self._point_of_cell, disp_grids)
+            return disp_grids
+
+        # 以 [N, 400] 视图写入输出网格，按映射表把测量点收集到对应格子
+        flat_grids = disp_grids.reshape(-1, ny * nx)
+        for start, block in self._iter_blocks():
+            magnitudes = np.sqrt(np.einsum('fpc,fpc->fp', block, block))
+            magnitudes *= scale
+            np.take(magnitudes.astype(np.uint8), self._point_of_cell, axis=1,
+                    out=flat_grids[start:start + len(block)])
+        return disp_grids
+
+    def create_displacement_image(self, disp_grid):
+        """
+        创建单帧位移热图（20×20网格，简洁版）
 
-        # 放大到目标分辨率（使用双线性插值使其平滑）
-        disp_resized = cv2.resize(disp_norm, (self.image_width, self.image_height),
-                                  interpolation=cv2.INTER_LINEAR)
+        Args:
+            disp_grid: 归一化后的uint8位移网格 [20, 20]
+
+        Returns:
+            numpy.ndarray: BGR格式图像（复用内部缓冲区，下次调用时会被覆盖）
+        """
+        # 先在20×20网格上查表着色（400个点而非整幅图像）
+        np.take(self.colormap_lut, disp_grid, axis=0, out=self._small_bgr)
 
-        # 应用色图
-        colored_image = cv2.applyColorMap(disp_resized, self.colormap)
+        # 再放大到目标分辨率（使用双线性插值使其平滑），直接写入预分配的帧缓冲区
+        cv2.resize(self._small_bgr, (self.image_width, self.image_height),
+                   dst=self._frame_bgr, interpolation=cv2.INTER_LINEAR)
 
-        return colored_image
+        return self._frame_bgr
 
     def generate_video(self):
         """生成视频"""
@@ -156,18 +410,24 @@ class Tac3DVideoVisualizer:
 
         # 计算全局最大位移值（整个视频）
         print(f'  计算全局最大位移值...')
-        all_magnitudes = np.linalg.norm(self.displacements, axis=2)  # Shape: (N_frames, N_points)
-        global_max = all_magnitudes.max()
+        global_max = self.compute_global_max()
         print(f'  ✓ 全局最大位移: {global_max:.6f} mm')
 
-        # 创建VideoWriter
-        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-        video_writer = cv2.VideoWriter(
-            str(self.output_path),
-            fourcc,
-            self.fps,
-            (self.image_width, self.image_height)
-        )
+        # 一次性完成所有帧的归一化
+        disp_grids = self.normalize_displacements(global_max)
+
+        # 创建VideoWriter（ffmpeg不可用时退回OpenCV）
+        frame_size = (self.image_width, self.image_height)
+        video_writer = None
+        if self.encoder == 'ffmpeg':
+            video_writer = FFmpegPipeWriter(self.output_path, self.fps, frame_size)
+            if video_writer.isOpened():
+                print(f'  编码器: ffmpeg ({video_writer.codec})')
+            else:
+                print('  ⚠ 未找到ffmpeg，改用OpenCV编码')
+                video_writer = None
+        if video_writer is None:
+            video_writer = open_video_writer(self.output_path, self.fps, frame_size)
 
         if not video_writer.isOpened():
             raise RuntimeError('无法创建视频写入器')
@@ -175,7 +435,7 @@ class Tac3DVideoVisualizer:
         # 生成每一帧
         for i in range(self.total_frames):
             try:
-                image = self.create_displacement_image(i, global_max)
+                image = self.create_displacement_image(disp_grids[i])
                 video_writer.write(image)
 
                 # 进度显示
@@ -218,13 +478,19 @@ def main():
   # 自定义分辨率
   python tac3d_visualize_video.py data.h5 --width 1280 --height 720
 
-  # 使用NPZ文件
+  # 使用NPZ文件（也支持录制脚本输出的 .npz.zst）
   python tac3d_visualize_video.py data.npz
+
+  # 通过管道交给ffmpeg编码（优先使用NVENC）
+  python tac3d_visualize_video.py data.h5 --encoder ffmpeg
+
+  # 长录制使用GPU计算位移幅值（需安装cupy）
+  python tac3d_visualize_video.py data.h5 --gpu
         """
     )
 
     parser.add_argument('input', type=str,
-                       help='输入数据文件 (HDF5或NPZ格式)')
+                       help='输入数据文件 (HDF5、NPZ或NPZ.ZST格式)')
     parser.add_argument('--output', type=str, default=None,
                        help='输出视频路径（默认自动生成）')
     parser.add_argument('--fps', type=int, default=30,
@@ -233,6 +499,11 @@ def main():
                        help='视频宽度 (默认: 800)')
     parser.add_argument('--height', type=int, default=600,
                        help='视频高度 (默认: 600)')
+    parser.add_argument('--encoder', type=str, default='opencv',
+                       choices=['opencv', 'ffmpeg'],
+                       help='视频编码方式 (默认: opencv)')
+    parser.add_argument('--gpu', action='store_true',
+                       help='使用CuPy在GPU上计算位移幅值（需CUDA环境）')
 
     args = parser.parse_args()
 
@@ -243,7 +514,9 @@ def main():
             output_path=args.output,
             fps=args.fps,
             width=args.width,
-            height=args.height
+            height=args.height,
+            encoder=args.encoder,
+            use_gpu=args.gpu
         )
 
         # 加载数据
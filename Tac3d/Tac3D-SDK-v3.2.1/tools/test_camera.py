@@ -3,6 +3,27 @@ import os
 import sys
 import time
 
+def OpenVideoWriter(name, fps, frameSize):
+    # 优先使用FFmpeg后端的H.264硬件编码（NVENC/VA-API等），不可用时退回mp4v软件编码
+    if hasattr(cv2, 'VIDEOWRITER_PROP_HW_ACCELERATION'):
+        videoWriter = cv2.VideoWriter(
+             name,
+             cv2.CAP_FFMPEG,
+             cv2.VideoWriter_fourcc(*'avc1'),
+             fps,
+             frameSize,
+             [cv2.VIDEOWRITER_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY,
+              cv2.VIDEOWRITER_PROP_HW_ACCELERATION_USE_OPENCL, 0]
+        )
+        if videoWriter.isOpened():
+            return videoWriter
+    return cv2.VideoWriter(
+         name,
+         cv2.VideoWriter_fourcc(*'mp4v'),  # 编码器
+         fps,
+         frameSize
+    )
+
 def TakePictures(device, fileName = '', dirPath='.'):
     framesSkip = 30
     FPS = 999
@@ -14,7 +35,13 @@ def TakePictures(device, fileName = '', dirPath='.'):
     if sys.platform.startswith('win'):
         cap = cv2.VideoCapture(int(inputSrc), cv2.CAP_DSHOW)
     elif sys.platform.startswith('linux'):
-        cap = cv2.VideoCapture(int(inputSrc), cv2.CAP_V4L2)
+        # 尝试请求硬件加速解码（VA-API等），后端不支持时退回普通方式打开
+        cap = None
+        if hasattr(cv2, 'CAP_PROP_HW_ACCELERATION'):
+            cap = cv2.VideoCapture(int(inputSrc), cv2.CAP_V4L2,
+                                   [cv2.CAP_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY])
+        if cap is None or not cap.isOpened():
+            cap = cv2.VideoCapture(int(inputSrc), cv2.CAP_V4L2)
     else:
         print('Unknow System')
         return
@@ -22,6 +49,8 @@ def TakePictures(device, fileName = '', dirPath='.'):
     cap.set(cv2.CAP_PROP_FRAME_WIDTH, 1920)
     cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 1080)
     cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc('M', 'J', 'P', 'G'))
+    # 只缓存最新一帧，避免显示滞后
+    cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
 
     # 打开自动曝光
     if sys.platform.startswith('win'):
@@ -51,6 +80,9 @@ def TakePictures(device, fileName = '', dirPath='.'):
     fnIdx = 1
     recordFlag = False
     n = 1
+    # 每隔displayEvery帧才解码并显示一次；录制时每帧都解码
+    displayEvery = 3
+    loopCount = 0
     goon, frame = cap.read()
     # print('size: %d x %d' % (frame.shape[1], frame.shape[0]))
     cv2.namedWindow(wname, 0)
@@ -60,16 +92,21 @@ def TakePictures(device, fileName = '', dirPath='.'):
     t0 = time.time()
     
     while goon:
+        showFrame = loopCount % displayEvery == 0
         if recordFlag:
             videoWriter.write(frame)
         if cv2.getWindowProperty(wname, cv2.WND_PROP_VISIBLE) < 1:
             break
-        cv2.imshow(wname, frame)
+        if showFrame:
+            cv2.imshow(wname, frame)
         key = cv2.waitKey(2)
         #print(key)
         if key == -1:
             pass
         elif key == 13: #ENTER
+            if not (recordFlag or showFrame):
+                # 本帧尚未解码
+                _, frame = cap.retrieve()
             if fileName == '':
                 saveFileName = os.path.join(dirPath, 'pic_%04d.png' % (n,))
                 cv2.imwrite(saveFileName, frame)
@@ -88,12 +125,7 @@ def TakePictures(device, fileName = '', dirPath='.'):
                     name = 'output_%d.mp4' % fnIdx
                 
                 print('recording', name)
-                videoWriter = cv2.VideoWriter(
-                     name,
-                     cv2.VideoWriter_fourcc(*'mp4v'),  # 编码器
-                     30,
-                     (1920, 1080)
-                )
+                videoWriter = OpenVideoWriter(name, 30, (1920, 1080))
                 recordFlag = True
 
         elif key == ord('f'):
@@ -104,7 +136,11 @@ def TakePictures(device, fileName = '', dirPath='.'):
         
         elif key == 27 or key == ord('q'): #ESC
             break
-        goon, frame = cap.read()
+        # grab()只取回数据，retrieve()才做JPEG解码，仅在需要显示或录制时解码
+        goon = cap.grab()
+        loopCount += 1
+        if goon and (recordFlag or loopCount % displayEvery == 0):
+            goon, frame = cap.retrieve()
         t1 = time.time()
         dt += (t1 - t0 - dt) * 0.1
         t0 = t1
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+ArUco距离批量计算
+对N帧的左右标记位置（tvec，单位米）一次性计算3D绝对距离和水平距离（单位毫米），
+以及忽略NaN的单次遍历统计
+"""
+
+import math
+import numpy as np
+
+# 尝试导入numba（JIT并行内核），没有则使用NumPy向量化实现
+try:
+    from numba import njit, prange
+    HAS_NUMBA = True
+except ImportError:
+    HAS_NUMBA = False
+
+
+if HAS_NUMBA:
+    # 不启用nnan/ninf：缺失帧以NaN表示，需要按IEEE规则传播
+    @njit(parallel=True, fastmath={'contract', 'afn', 'reassoc'}, cache=True)
+    def _batch_distances_kernel(left_tvec, right_tvec, out_abs, out_hor):
+        for i in prange(left_tvec.shape[0]):
+            dx = right_tvec[i, 0] - left_tvec[i, 0]
+            dy = right_tvec[i, 1] - left_tvec[i, 1]
+            dz = right_tvec[i, 2] - left_tvec[i, 2]
+            out_abs[i] = 1000.0 * math.sqrt(dx * dx + dy * dy + dz * dz)
+            out_hor[i] = 1000.0 * math.sqrt(dx * dx + dy * dy)
+
+
+def batch_distances(left_tvec, right_tvec):
+    """
+    批量计算左右标记间距离
+
+    Args:
+        left_tvec: (N, 3) 左标记位置（米），缺失帧为NaN
+        right_tvec: (N, 3) 右标记位置（米），缺失帧为NaN
+
+    Returns:
+        (distance_absolute, distance_horizontal)，均为 (N,) float64，单位毫米；
+        任一侧缺失的帧结果为NaN
+    """
+    left_tvec = np.ascontiguousarray(left_tvec, dtype=np.float64)
+    right_tvec = np.ascontiguousarray(right_tvec, dtype=np.float64)
+    n = left_tvec.shape[0]
+
+    if HAS_NUMBA:
+        out_abs = np.empty(n, dtype=np.float64)
+        out_hor = np.empty(n, dtype=np.float64)
+        _batch_distances_kernel(left_tvec, right_tvec, out_abs, out_hor)
+        return out_abs, out_hor
+
+    diff = (right_tvec - left_tvec) * 1000.0
+    return np.linalg.norm(diff, axis=1), np.hypot(diff[:, 0], diff[:, 1])
+
+
+if HAS_NUMBA:
+    @njit(fastmath={'contract', 'afn', 'reassoc'}, cache=True)
+    def _nan_stats_kernel(x):
+        count = 0
+        shift = 0.0
+        s = 0.0
+        ss = 0.0
+        lo = np.inf
+        hi = -np.inf
+        for i in range(x.shape[0]):
+            v = x[i]
+            if np.isnan(v):
+                continue
+            if count == 0:
+                shift = v  # 以首个有效值为偏移，减小平方和的抵消误差
+            d = v - shift
+            s += d
+            ss += d * d
+            if v < lo:
+                lo = v
+            if v > hi:
+                hi = v
+            count += 1
+        return count, shift, s, ss, lo, hi
+
+
+def nan_stats(x):
+    """
+    单次遍历计算忽略NaN的统计量
+
+    Args:
+        x: (N,) 数组，NaN表示缺失
+
+    Returns:
+        (count, mean, std, min, max)；std为总体标准差（与np.nanstd一致），
+        无有效值时 count 为0，其余为NaN
+    """
+    x = np.ascontiguousarray(x, dtype=np.float64)
+
+    if HAS_NUMBA:
+        count, shift, s, ss, lo, hi = _nan_stats_kernel(x)
+        if count == 0:
+            return 0, np.nan, np.nan, np.nan, np.nan
+        mean_d = s / count
+        var = max(ss / count - mean_d * mean_d, 0.0)
+        return count, shift + mean_d, math.sqrt(var), lo, hi
+
+    valid = x[~np.isnan(x)]
+    if valid.size == 0:
+        return 0, np.nan, np.nan, np.nan, np.nan
+    return valid.size, valid.mean(), valid.std(), valid.min(), valid.max()
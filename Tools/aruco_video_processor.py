@@ -11,10 +11,15 @@ import os
 from pathlib import Path
 import time
 
+from video_pipeline import FramePipeline
+
 
 class VideoArUcoProcessor:
     """Process video files to detect and annotate ArUco markers"""
 
+    # Thumbnail size for the cheap frame-difference check used by static-frame skipping
+    MOTION_THUMB_SIZE = (160, 90)
+
     def __init__(self, dictionary_type='DICT_6X6_250', marker_size=0.015, target_ids=[0, 1]):
         # Initialize ArUco detector
         self.dictionary = cv2.aruco.getPredefinedDictionary(getattr(cv2.aruco, dictionary_type))
@@ -24,10 +29,19 @@ class VideoArUcoProcessor:
         # Marker settings
         self.marker_size = marker_size
         self.target_ids = set(target_ids)  # Only detect these IDs
+        self._target_ids_np = np.asarray(sorted(self.target_ids), dtype=np.int32)
 
         # Setup ultra-sensitive parameters for small markers (15mm)
         self._setup_sensitive_parameters()
 
+        # Enhancement filters are fixed, so build them once
+        self.clahe = cv2.createCLAHE(clipLimit=3.0, tileGridSize=(4, 4))  # Smaller tiles for tiny markers
+        self.sharpen_kernel = np.array([[-1, -1, -1], [-1, 12, -1], [-1, -1, -1]], dtype=np.float32) / 4
+        self.morph_kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (2, 2))
+
+        # Frame-sized scratch buffers for enhancement, allocated on the first frame
+        self._buffers = None
+
         # Statistics
         self.stats = {
             'total_frames': 0,
@@ -86,35 +100,43 @@ class VideoArUcoProcessor:
 
         print("ArUco detector configured for ULTRA-SENSITIVE 15mm marker detection")
 
+    def _scratch_buffers(self, shape):
+        """Return the uint8 scratch buffers for a frame of this shape, reallocating only on size change"""
+        if self._buffers is None or self._buffers['gray'].shape != shape:
+            self._buffers = {name: np.empty(shape, dtype=np.uint8)
+                             for name in ('gray', 'denoised', 'enhanced', 'gaussian',
+                                          'unsharp', 'sharpened', 'cleaned')}
+        return self._buffers
+
     def _enhance_frame_for_detection(self, frame):
-        """Apply enhanced image processing specifically for 15mm ArUco detection"""
-        # Convert to grayscale
+        """Apply enhanced image processing specifically for 15mm ArUco detection
+
+        The result is written into a reused buffer and is overwritten by the next call.
+        """
+        buf = self._scratch_buffers(frame.shape[:2])
+
+        # Convert to grayscale (grayscale input is only read, so no copy is needed)
         if len(frame.shape) == 3:
-            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=buf['gray'])
         else:
-            gray = frame.copy()
+            gray = frame
 
         # 1. Noise reduction for better small marker detection
-        denoised = cv2.bilateralFilter(gray, 5, 50, 50)
+        denoised = cv2.bilateralFilter(gray, 5, 50, 50, dst=buf['denoised'])
 
         # 2. CLAHE with smaller tile size for 15mm markers
-        clahe = cv2.createCLAHE(clipLimit=3.0, tileGridSize=(4,4))  # Smaller tiles for tiny markers
-        enhanced = clahe.apply(denoised)
+        enhanced = self.clahe.apply(denoised, dst=buf['enhanced'])
 
         # 3. Enhanced sharpening specifically for small features
-        # Unsharp masking for better edge definition
-        gaussian = cv2.GaussianBlur(enhanced, (3, 3), 1.0)
-        unsharp_mask = cv2.addWeighted(enhanced, 1.5, gaussian, -0.5, 0)
-        unsharp_mask = np.clip(unsharp_mask, 0, 255).astype(np.uint8)
+        # Unsharp masking for better edge definition (uint8 output saturates, no clip needed)
+        gaussian = cv2.GaussianBlur(enhanced, (3, 3), 1.0, dst=buf['gaussian'])
+        unsharp_mask = cv2.addWeighted(enhanced, 1.5, gaussian, -0.5, 0, dst=buf['unsharp'])
 
         # 4. Additional sharpening kernel for tiny markers
-        kernel = np.array([[-1,-1,-1], [-1,12,-1], [-1,-1,-1]], dtype=np.float32) / 4
-        sharpened = cv2.filter2D(unsharp_mask, -1, kernel)
-        sharpened = np.clip(sharpened, 0, 255).astype(np.uint8)
+        sharpened = cv2.filter2D(unsharp_mask, -1, self.sharpen_kernel, dst=buf['sharpened'])
 
         # 5. Morphological operations to clean up small features
-        kernel_morph = cv2.getStructuringElement(cv2.MORPH_RECT, (2, 2))
-        cleaned = cv2.morphologyEx(sharpened, cv2.MORPH_CLOSE, kernel_morph)
+        cleaned = cv2.morphologyEx(sharpened, cv2.MORPH_CLOSE, self.morph_kernel, dst=buf['cleaned'])
 
         return cleaned
 
@@ -126,38 +148,46 @@ class VideoArUcoProcessor:
         # Detect markers
         corners, ids, rejected = self.detector.detectMarkers(enhanced_frame)
 
-        # Filter for target IDs only
-        filtered_corners = []
-        filtered_ids = []
+        # Filter for target IDs only (vectorized mask)
+        filtered_corners = None
+        filtered_ids = None
 
         if corners is not None and ids is not None and len(corners) > 0:
-            ids_flat = ids.flatten()
-            for i, marker_id in enumerate(ids_flat):
-                if marker_id in self.target_ids:
-                    filtered_corners.append(corners[i])
-                    filtered_ids.append(marker_id)
-
-        # Convert back to numpy arrays if we have results
-        if filtered_corners:
-            filtered_corners = np.array(filtered_corners)
-            filtered_ids = np.array(filtered_ids).reshape(-1, 1)
-        else:
-            filtered_corners = None
-            filtered_ids = None
+            ids_flat = ids.ravel()
+            idx = np.flatnonzero(np.isin(ids_flat, self._target_ids_np))
+            if idx.size:
+                filtered_ids = ids_flat[idx].reshape(-1, 1)
+                # Stack only the kept (1, 4, 2) corner arrays: one allocation, no list->array inference
+                filtered_corners = np.stack([corners[i] for i in idx])
 
         # Update statistics with filtered results only
+        self._record_detection(filtered_ids)
+
+        return filtered_corners, filtered_ids, rejected
+
+    def _record_detection(self, ids):
+        """Update statistics for one frame's target-marker ids"""
         self.stats['total_frames'] += 1
-        if filtered_ids is not None and len(filtered_ids) > 0:
+        if ids is not None and len(ids) > 0:
             self.stats['frames_with_markers'] += 1
-            self.stats['total_markers_detected'] += len(filtered_ids)
-            for marker_id in filtered_ids.flatten():
+            self.stats['total_markers_detected'] += len(ids)
+            for marker_id in ids.flatten():
                 self.stats['unique_marker_ids'].add(int(marker_id))
 
-        return filtered_corners, filtered_ids, rejected
+    def _motion_thumbnail(self, frame):
+        """Small grayscale thumbnail for the frame-difference check"""
+        small = cv2.resize(frame, self.MOTION_THUMB_SIZE, interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return small
 
-    def annotate_frame(self, frame, corners, ids, rejected=None, show_rejected=False):
-        """Annotate frame with detected target markers only"""
-        annotated = frame.copy()
+    def annotate_frame(self, frame, corners, ids, rejected=None, show_rejected=False, inplace=False):
+        """Annotate frame with detected target markers only
+
+        With inplace=True the annotations are drawn directly on `frame`
+        (for callers that discard the frame afterwards).
+        """
+        annotated = frame if inplace else frame.copy()
 
         # Draw detected target markers only
         if corners is not None and len(corners) > 0:
@@ -207,8 +237,19 @@ class VideoArUcoProcessor:
 
         return annotated
 
-    def process_video(self, input_path, output_path=None, show_rejected=False):
-        """Process entire video file"""
+    def process_video(self, input_path, output_path=None, show_rejected=False, prefetch=8,
+                      skip_static=1, motion_threshold=2.0):
+        """Process entire video file
+
+        Decoding and encoding run in their own threads (bounded queues of
+        `prefetch` frames) so codec work overlaps with detection.
+
+        With `skip_static` > 1, detection is forced only every `skip_static`
+        frames; in between it reruns only when the frame's mean absolute
+        difference from the last detected frame (on a small grayscale
+        thumbnail) exceeds `motion_threshold` gray levels, otherwise the last
+        detections are reused for annotation.
+        """
         input_path = Path(input_path)
         if not input_path.exists():
             raise FileNotFoundError(f"Input video not found: {input_path}")
@@ -250,24 +291,45 @@ class VideoArUcoProcessor:
             'unique_marker_ids': set()
         }
 
-        # Process frames
+        # Process frames: reader thread -> detection (this thread) -> writer thread
         frame_count = 0
+        detect_count = 0
         start_time = time.time()
 
+        # Last detected frame's thumbnail and detections, for static-frame skipping
+        detected_thumb = None
+        detection = None
+
+        pipeline = FramePipeline(cap, out, prefetch)
+
         try:
             while True:
-                ret, frame = cap.read()
-                if not ret:
+                frame = pipeline.read()
+                if frame is None:
                     break
 
-                # Detect markers
-                corners, ids, rejected = self.detect_markers_in_frame(frame)
+                # Detect markers (or reuse the last detections on an unchanged frame)
+                if skip_static > 1:
+                    thumb = self._motion_thumbnail(frame)
+                    if (detection is None or frame_count % skip_static == 0
+                            or cv2.absdiff(thumb, detected_thumb).mean() > motion_threshold):
+                        detection = self.detect_markers_in_frame(frame)
+                        detected_thumb = thumb
+                        detect_count += 1
+                    else:
+                        self._record_detection(detection[1])
+                else:
+                    detection = self.detect_markers_in_frame(frame)
+                    detect_count += 1
+                corners, ids, rejected = detection
 
                 # Annotate frame - rejected candidates only shown if explicitly requested
-                annotated_frame = self.annotate_frame(frame, corners, ids, rejected, show_rejected)
+                # (decoded frame is discarded after writing, so draw in place)
+                annotated_frame = self.annotate_frame(frame, corners, ids, rejected, show_rejected,
+                                                      inplace=True)
 
-                # Write frame
-                out.write(annotated_frame)
+                # Hand frame to the writer thread
+                pipeline.write(annotated_frame)
 
                 frame_count += 1
 
@@ -280,11 +342,16 @@ class VideoArUcoProcessor:
                           f"- Processing FPS: {fps_actual:.1f}")
 
         finally:
+            # Stop the reader, then flush the writer
+            pipeline.close()
             cap.release()
             out.release()
+        pipeline.raise_write_error()
 
         # Print final statistics
         self._print_statistics()
+        if skip_static > 1:
+            print(f"Detector runs: {detect_count}/{frame_count} frames (static frames reused)")
 
         print(f"\nProcessing complete!")
         print(f"Output saved to: {output_path}")
@@ -317,6 +384,12 @@ def main():
                        help='Show rejected marker candidates in red')
     parser.add_argument('--target-ids', nargs='+', type=int, default=[0, 1],
                        help='Target marker IDs to detect (default: 0 1)')
+    parser.add_argument('--skip-static', type=int, default=1, metavar='K',
+                       help='Force detection only every K frames and reuse the last '
+                            'detections on unchanged frames in between (default: 1, detect every frame)')
+    parser.add_argument('--motion-threshold', type=float, default=2.0,
+                       help='Mean gray-level difference that counts as a changed frame '
+                            'for --skip-static (default: 2.0)')
 
     args = parser.parse_args()
 
@@ -332,7 +405,9 @@ def main():
         output_path = processor.process_video(
             input_path=args.input_video,
             output_path=args.output,
-            show_rejected=args.show_rejected
+            show_rejected=args.show_rejected,
+            skip_static=args.skip_static,
+            motion_threshold=args.motion_threshold
         )
 
         print(f"\nSuccess! Processed video saved to: {output_path}")
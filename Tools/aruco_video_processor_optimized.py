@@ -7,15 +7,74 @@ High-performance detection for 15mm markers using DICT_4X4_250
 import cv2
 import numpy as np
 import argparse
+import collections
 import os
 from pathlib import Path
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+
+from video_pipeline import FramePipeline
+
+
+def open_video_capture(path):
+    """Open a video file, preferring FFmpeg hardware decode (NVDEC/VAAPI/...) when available"""
+    if hasattr(cv2, 'CAP_PROP_HW_ACCELERATION'):
+        cap = cv2.VideoCapture(str(path), cv2.CAP_FFMPEG,
+                               [cv2.CAP_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY,
+                                cv2.CAP_PROP_HW_DEVICE, 0])
+        if cap.isOpened():
+            return cap
+    return cv2.VideoCapture(str(path))
+
+
+# Output codecs: name -> (fourcc, default container suffix)
+# mjpg/ffv1 are much cheaper to encode (larger files) for intermediate/debug outputs
+OUTPUT_CODECS = {
+    'mp4v': ('mp4v', None),
+    'avc1': ('avc1', None),
+    'mjpg': ('MJPG', '.avi'),
+    'ffv1': ('FFV1', '.mkv'),
+}
+
+
+def open_video_writer(path, fps, frame_size, codec='auto'):
+    """Open a video writer
+
+    codec='auto' prefers hardware H.264 encode and falls back to mp4v on CPU;
+    otherwise the named codec from OUTPUT_CODECS is used.
+    """
+    if codec != 'auto':
+        fourcc = cv2.VideoWriter_fourcc(*OUTPUT_CODECS[codec][0])
+        if codec == 'avc1' and hasattr(cv2, 'VIDEOWRITER_PROP_HW_ACCELERATION'):
+            out = cv2.VideoWriter(str(path), cv2.CAP_FFMPEG, fourcc, fps, frame_size,
+                                  [cv2.VIDEOWRITER_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY])
+            if out.isOpened():
+                return out
+        return cv2.VideoWriter(str(path), fourcc, fps, frame_size)
+
+    if hasattr(cv2, 'VIDEOWRITER_PROP_HW_ACCELERATION'):
+        out = cv2.VideoWriter(str(path), cv2.CAP_FFMPEG, cv2.VideoWriter_fourcc(*'avc1'),
+                              fps, frame_size,
+                              [cv2.VIDEOWRITER_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY])
+        if out.isOpened():
+            return out
+    return cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*'mp4v'), fps, frame_size)
 
 
 class OptimizedVideoArUcoProcessor:
     """High-performance ArUco processor based on official DepthAI optimization patterns"""
 
-    def __init__(self, dictionary_type='DICT_4X4_250', marker_size=0.015, target_ids=[0, 1]):
+    # Frames between refreshes of the on-video FPS counter
+    FPS_TEXT_INTERVAL = 10
+
+    # CLAHE calibration: frames timed per branch, and the fraction of CLAHE-on
+    # detections the CLAHE-off branch must reach to be preferred
+    CLAHE_CALIBRATION_FRAMES = 100
+    CLAHE_MIN_DETECTION_RATIO = 0.95
+
+    def __init__(self, dictionary_type='DICT_4X4_250', marker_size=0.015, target_ids=[0, 1],
+                 clahe_mode='on', clahe_scale=1, quad_decimate=1, thresh_windows='multi'):
         # Initialize ArUco detector with optimized settings
         self.dictionary = cv2.aruco.getPredefinedDictionary(getattr(cv2.aruco, dictionary_type))
         self.detector_params = cv2.aruco.DetectorParameters()
@@ -23,20 +82,62 @@ class OptimizedVideoArUcoProcessor:
         # Target settings
         self.marker_size = marker_size
         self.target_ids = set(target_ids)
+        self._target_ids_np = np.asarray(sorted(self.target_ids), dtype=np.int32)
 
         # Setup optimized detection parameters (based on DepthAI AprilTag approach)
         self._setup_optimized_parameters()
 
-        # Create detector
-        self.detector = cv2.aruco.ArucoDetector(self.dictionary, self.detector_params)
+        # Create detector. Adaptive-threshold windows: 'multi' runs the configured
+        # window range, 'single' one 13px window (one threshold pass), 'auto' single
+        # while detection succeeds and multi after a missed frame.
+        if thresh_windows not in ('multi', 'single', 'auto'):
+            raise ValueError(f"Unknown threshold window mode: {thresh_windows}")
+        self.thresh_windows = thresh_windows
+        self._detector_multi = cv2.aruco.ArucoDetector(self.dictionary, self.detector_params)
+        if thresh_windows == 'multi':
+            self.detector = self._detector_multi
+        else:
+            # ArucoDetector copies its parameters, so adjusting them here is safe
+            self.detector_params.adaptiveThreshWinSizeMin = 13
+            self.detector_params.adaptiveThreshWinSizeMax = 13
+            self.detector_params.adaptiveThreshWinSizeStep = 1
+            self.detector = cv2.aruco.ArucoDetector(self.dictionary, self.detector_params)
+
+        # Reusable preprocessing state (avoid per-frame allocation).
+        # CLAHE objects and buffers are not thread-safe, so keep one set per thread.
+        self._local = threading.local()
+
+        # CLAHE mode: 'off' never, 'on' every frame, 'auto' only after a missed frame,
+        # 'calibrate' picks 'on' or 'off' by timing the start of each video
+        if clahe_mode not in ('off', 'on', 'auto', 'calibrate'):
+            raise ValueError(f"Unknown CLAHE mode: {clahe_mode}")
+        self.clahe_mode = clahe_mode
+        self.clahe_scale = max(1, int(clahe_scale))
+        self._last_success = False
+
+        # Detect on a downscaled image (AprilTag quadDecimate equivalent), refine at full res
+        self.quad_decimate = max(1, int(quad_decimate))
+        win = self.detector_params.cornerRefinementWinSize
+        self._subpix_win = (win, win)
+        self._subpix_criteria = (cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_MAX_ITER,
+                                 self.detector_params.cornerRefinementMaxIterations,
+                                 self.detector_params.cornerRefinementMinAccuracy)
+
+        # Label text / text-size cache for draw_markers, keyed by marker id
+        self._label_cache = {}
 
         # Performance tracking
+        self._reset_stats()
+
+    def _reset_stats(self):
+        """Reset detection statistics"""
         self.stats = {
             'total_frames': 0,
             'frames_with_markers': 0,
             'total_markers_detected': 0,
-            'unique_marker_ids': set()
         }
+        # Seen-ID bitset (only target IDs survive filtering, so max target ID bounds it)
+        self._seen_bitset = np.zeros(int(self._target_ids_np.max(initial=0)) + 1, dtype=bool)
 
     def _setup_optimized_parameters(self):
         """Setup detection parameters optimized like DepthAI AprilTag examples"""
@@ -75,91 +176,163 @@ class OptimizedVideoArUcoProcessor:
         self.detector_params.perspectiveRemovePixelPerCell = 8
         self.detector_params.perspectiveRemoveIgnoredMarginPerCell = 0.13
 
-        # Corner refinement - high precision
-        self.detector_params.cornerRefinementMethod = cv2.aruco.CORNER_REFINE_SUBPIX
+        # Corner refinement - high precision, but done by us with cv2.cornerSubPix
+        # on target markers only (see _refine_corners), so disable it in the detector
+        self.detector_params.cornerRefinementMethod = cv2.aruco.CORNER_REFINE_NONE
         self.detector_params.cornerRefinementWinSize = 5
         self.detector_params.cornerRefinementMaxIterations = 30
         self.detector_params.cornerRefinementMinAccuracy = 0.1
 
         print("Optimized parameters configured for high-performance detection")
 
+    def _thread_state(self):
+        """Per-thread cached CLAHE instance and grayscale buffer"""
+        state = self._local
+        if not hasattr(state, 'clahe'):
+            state.clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
+            state.gray_buf = None
+        return state
+
     def _preprocess_frame(self, frame):
-        """Minimal preprocessing optimized for performance"""
-        # Convert to grayscale efficiently
+        """Minimal preprocessing optimized for performance
+
+        Returns (gray, processed): the full-resolution grayscale frame and the
+        image to run detection on (decimated by quad_decimate, optionally CLAHE).
+        """
+        state = self._thread_state()
+
+        # Convert to grayscale efficiently (into a reused buffer)
         if len(frame.shape) == 3:
-            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            if state.gray_buf is None or state.gray_buf.shape != frame.shape[:2]:
+                state.gray_buf = np.empty(frame.shape[:2], dtype=np.uint8)
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=state.gray_buf)
         else:
-            gray = frame.copy()
+            gray = frame
+
+        # Decimate for detection; cost of threshold + contour stages is O(pixels)
+        if self.quad_decimate > 1:
+            h, w = gray.shape[:2]
+            small = cv2.resize(gray, (w // self.quad_decimate, h // self.quad_decimate),
+                               interpolation=cv2.INTER_AREA)
+        else:
+            small = gray
+
+        # Skip CLAHE when disabled, or in auto mode while detection keeps succeeding
+        if self.clahe_mode == 'off' or (self.clahe_mode == 'auto' and self._last_success):
+            return gray, small
 
         # Simple enhancement - similar to AprilTag approach
-        # Apply mild CLAHE for contrast enhancement
-        clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
-        enhanced = clahe.apply(gray)
+        # Apply mild CLAHE for contrast enhancement (cached instance)
+        if self.clahe_scale > 1:
+            # CLAHE cost scales with pixel count: equalize a downsampled copy, then upsample
+            h, w = small.shape[:2]
+            tiny = cv2.resize(small, (w // self.clahe_scale, h // self.clahe_scale),
+                              interpolation=cv2.INTER_AREA)
+            enhanced = cv2.resize(state.clahe.apply(tiny), (w, h),
+                                  interpolation=cv2.INTER_LINEAR)
+        else:
+            enhanced = state.clahe.apply(small)
 
-        return enhanced
+        return gray, enhanced
 
     def detect_markers_in_frame(self, frame):
         """High-performance marker detection"""
+        filtered_corners, filtered_ids = self._detect_target_markers(frame)
+        self._record_detection(filtered_ids)
+        return filtered_corners, filtered_ids
+
+    def _detect_target_markers(self, frame):
+        """Detect and filter markers without writing shared state
+
+        Safe in worker threads as long as the auto CLAHE / threshold modes, which
+        read the previous frame's outcome, are off (process_video ensures this).
+        """
         # Minimal preprocessing for speed
-        processed_frame = self._preprocess_frame(frame)
+        gray, processed_frame = self._preprocess_frame(frame)
 
         # Detect all markers first
-        corners, ids, rejected = self.detector.detectMarkers(processed_frame)
+        detector = self.detector
+        if self.thresh_windows == 'auto' and not self._last_success:
+            detector = self._detector_multi
+        corners, ids, rejected = detector.detectMarkers(processed_frame)
 
-        # Filter for target IDs only
-        filtered_corners = []
-        filtered_ids = []
+        # Filter for target IDs only (vectorized mask)
+        filtered_corners = None
+        filtered_ids = None
 
         if corners is not None and ids is not None and len(corners) > 0:
-            ids_flat = ids.flatten()
-            for i, marker_id in enumerate(ids_flat):
-                if marker_id in self.target_ids:
-                    filtered_corners.append(corners[i])
-                    filtered_ids.append(marker_id)
-
-        # Convert back to numpy arrays
-        if filtered_corners:
-            filtered_corners = np.array(filtered_corners)
-            filtered_ids = np.array(filtered_ids).reshape(-1, 1)
-        else:
-            filtered_corners = None
-            filtered_ids = None
-
-        # Update statistics
-        self.stats['total_frames'] += 1
-        if filtered_ids is not None and len(filtered_ids) > 0:
-            self.stats['frames_with_markers'] += 1
-            self.stats['total_markers_detected'] += len(filtered_ids)
-            for marker_id in filtered_ids.flatten():
-                self.stats['unique_marker_ids'].add(int(marker_id))
+            ids_flat = ids.ravel()
+            mask = np.isin(ids_flat, self._target_ids_np)
+            idx = np.flatnonzero(mask)
+            if idx.size:
+                filtered_ids = ids_flat[idx].reshape(-1, 1)
+                # Stack only the kept (1, 4, 2) corner arrays: one allocation, no list->array inference
+                filtered_corners = np.stack([corners[i] for i in idx])
+                filtered_corners = self._refine_corners(gray, filtered_corners)
 
         return filtered_corners, filtered_ids
 
-    def draw_markers(self, frame, corners, ids):
-        """Clean marker visualization like AprilTag examples"""
-        annotated = frame.copy()
+    def _refine_corners(self, gray, corners):
+        """Sub-pixel refine (N, 1, 4, 2) corners on the full-resolution gray image
+
+        All corners go through one cv2.cornerSubPix call; corners found on a
+        decimated image are first mapped back to full resolution.
+        """
+        pts = corners.reshape(-1, 1, 2).astype(np.float32)
+        if self.quad_decimate > 1:
+            # Pixel-centre convention: (x + 0.5) * d - 0.5
+            d = self.quad_decimate
+            pts += 0.5
+            pts *= d
+            pts -= 0.5
+        cv2.cornerSubPix(gray, pts, self._subpix_win, (-1, -1), self._subpix_criteria)
+        return pts.reshape(corners.shape)
+
+    def _record_detection(self, filtered_ids):
+        """Update statistics and CLAHE auto state for one frame (in frame order)"""
+        n = 0 if filtered_ids is None else filtered_ids.size
+
+        # Remember outcome for CLAHE / threshold auto modes
+        self._last_success = n > 0
+
+        # Update statistics in one block, no per-marker Python loop
+        stats = self.stats
+        stats['total_frames'] += 1
+        if n:
+            stats['frames_with_markers'] += 1
+            stats['total_markers_detected'] += n
+            self._seen_bitset[filtered_ids.ravel()] = True
+
+    def draw_markers(self, frame, corners, ids, inplace=False):
+        """Clean marker visualization like AprilTag examples
+
+        With inplace=True the annotations are drawn directly onto `frame`
+        (no full-frame copy); use it when the caller discards the frame anyway.
+        """
+        annotated = frame if inplace else frame.copy()
 
         if corners is not None and ids is not None and len(corners) > 0:
+            # Integer corner points and centers for all markers at once
+            all_pts = corners.reshape(-1, 4, 2).astype(np.int32)
+            centers = all_pts.mean(axis=1).astype(int).tolist()
+
             # Draw marker outlines - clean style like AprilTag
-            for i, (corner, marker_id) in enumerate(zip(corners, ids.flatten())):
-                # Get corner points
-                pts = corner[0].astype(int)
+            for pts, (cx, cy), marker_id in zip(all_pts, centers, ids.ravel().tolist()):
+                # Cached per-id label, color and label-box offsets
+                label, color, text_off, box_tl, box_br = self._marker_label(marker_id)
 
                 # Draw marker outline with clean lines
-                color = (0, 255, 0) if marker_id == 1 else (0, 0, 255)  # Green for 1, Red for 0
                 cv2.polylines(annotated, [pts], True, color, 2, cv2.LINE_AA)
 
                 # Calculate center
-                center = tuple(np.mean(pts, axis=0).astype(int))
+                center = (cx, cy)
 
                 # Draw clean ID label
-                label = f"LEFT (ID:{marker_id})" if marker_id == 1 else f"RIGHT (ID:{marker_id})"
-                text_size = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.6, 2)[0]
-                text_pos = (center[0] - text_size[0] // 2, center[1] - 10)
+                text_pos = (cx + text_off[0], cy + text_off[1])
 
                 # Background for text
-                cv2.rectangle(annotated, (text_pos[0] - 5, text_pos[1] - text_size[1] - 5),
-                             (text_pos[0] + text_size[0] + 5, text_pos[1] + 5), (255, 255, 255), -1)
+                cv2.rectangle(annotated, (cx + box_tl[0], cy + box_tl[1]),
+                             (cx + box_br[0], cy + box_br[1]), (255, 255, 255), -1)
                 cv2.putText(annotated, label, text_pos, cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
 
                 # Draw center point
@@ -167,15 +340,81 @@ class OptimizedVideoArUcoProcessor:
 
         return annotated
 
-    def process_video(self, input_path, output_path=None):
-        """Process video with optimized detection"""
+    def _marker_label(self, marker_id):
+        """Cached drawing data for a marker id
+
+        Returns (label, color, text_offset, box_top_left, box_bottom_right); the
+        offsets are relative to the marker center.
+        """
+        cached = self._label_cache.get(marker_id)
+        if cached is None:
+            label = f"LEFT (ID:{marker_id})" if marker_id == 1 else f"RIGHT (ID:{marker_id})"
+            color = (0, 255, 0) if marker_id == 1 else (0, 0, 255)  # Green for 1, Red for 0
+            tw, th = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.6, 2)[0]
+            tx, ty = -(tw // 2), -10
+            cached = self._label_cache[marker_id] = (
+                label, color, (tx, ty), (tx - 5, ty - th - 5), (tx + tw + 5, ty + 5))
+        return cached
+
+    def _calibrate_clahe(self, cap):
+        """Time detection with CLAHE on vs off on the first frames and return the winner
+
+        CLAHE off wins when it is faster and keeps at least
+        CLAHE_MIN_DETECTION_RATIO of the CLAHE-on detections. Leaves `cap`
+        positioned after the sampled frames; the caller rewinds.
+        """
+        frames = []
+        while len(frames) < self.CLAHE_CALIBRATION_FRAMES:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            frames.append(frame)
+        if not frames:
+            return 'on'
+
+        timings = {}
+        detections = {}
+        for mode in ('on', 'off'):
+            self.clahe_mode = mode
+            found = 0
+            start = time.perf_counter()
+            for frame in frames:
+                _, ids = self._detect_target_markers(frame)
+                if ids is not None:
+                    found += 1
+            timings[mode] = (time.perf_counter() - start) / len(frames)
+            detections[mode] = found
+
+        winner = 'on'
+        if (timings['off'] < timings['on']
+                and detections['off'] >= self.CLAHE_MIN_DETECTION_RATIO * detections['on']):
+            winner = 'off'
+
+        print(f"CLAHE calibration on {len(frames)} frames: "
+              f"on {timings['on'] * 1000:.2f}ms/{detections['on']} detections, "
+              f"off {timings['off'] * 1000:.2f}ms/{detections['off']} detections -> CLAHE {winner}")
+        return winner
+
+    def process_video(self, input_path, output_path=None, prefetch=8, workers=1,
+                      output_codec='auto'):
+        """Process video with optimized detection
+
+        Decoding and encoding run in their own threads (bounded queues of
+        `prefetch` frames) so codec work overlaps with detection. With
+        `workers` > 1, detection itself runs on a thread pool (OpenCV releases
+        the GIL) and results are consumed in frame order. The auto CLAHE and
+        threshold-window modes depend on the previous frame's result, which is
+        not known while several frames are in flight, so with `workers` > 1
+        they fall back to the fixed 'on' / 'multi' modes for this video.
+        """
         input_path = Path(input_path)
         if not input_path.exists():
             raise FileNotFoundError(f"Input video not found: {input_path}")
 
-        # Generate output path
+        # Generate output path (container follows the codec where it matters)
         if output_path is None:
-            output_path = input_path.parent / f"{input_path.stem}_optimized_aruco{input_path.suffix}"
+            suffix = OUTPUT_CODECS.get(output_codec, (None, None))[1] or input_path.suffix
+            output_path = input_path.parent / f"{input_path.stem}_optimized_aruco{suffix}"
         else:
             output_path = Path(output_path)
 
@@ -183,7 +422,7 @@ class OptimizedVideoArUcoProcessor:
         print(f"Output will be saved to: {output_path}")
 
         # Open input video
-        cap = cv2.VideoCapture(str(input_path))
+        cap = open_video_capture(input_path)
         if not cap.isOpened():
             raise ValueError(f"Cannot open video file: {input_path}")
 
@@ -195,48 +434,98 @@ class OptimizedVideoArUcoProcessor:
 
         print(f"Video info: {width}x{height} @ {fps}fps, {total_frames} frames")
 
+        # Specialize CLAHE to this video, then rewind (reopen if seeking is unsupported)
+        calibrating = self.clahe_mode == 'calibrate'
+        if calibrating:
+            self.clahe_mode = self._calibrate_clahe(cap)
+            if not cap.set(cv2.CAP_PROP_POS_FRAMES, 0):
+                cap.release()
+                cap = open_video_capture(input_path)
+
         # Setup output video writer
-        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-        out = cv2.VideoWriter(str(output_path), fourcc, fps, (width, height))
+        out = open_video_writer(output_path, fps, (width, height), codec=output_codec)
 
         if not out.isOpened():
             raise ValueError(f"Cannot create output video: {output_path}")
 
         # Reset statistics
-        self.stats = {
-            'total_frames': 0,
-            'frames_with_markers': 0,
-            'total_markers_detected': 0,
-            'unique_marker_ids': set()
-        }
+        self._reset_stats()
+
+        # FPS overlay: fixed origin, text refreshed every FPS_TEXT_INTERVAL frames
+        fps_pos = (10, height - 10)
+        fps_text = "Processing FPS: 0.0"
+        processing_fps = 0.0
 
-        # Process frames
+        # Process frames: reader thread -> detection (this thread or pool) -> writer thread
         frame_count = 0
         start_time = time.time()
 
+        pipeline = FramePipeline(cap, out, prefetch)
+
+        # Detection pool: one OpenCV thread per worker to avoid oversubscription
+        executor = None
+        pending = collections.deque()
+        prev_cv_threads = cv2.getNumThreads()
+        if workers > 1:
+            cv2.setNumThreads(1)
+            executor = ThreadPoolExecutor(max_workers=workers)
+
+        # Auto modes follow the previous frame, which is undefined with frames in flight
+        saved_modes = None
+        if executor is not None and 'auto' in (self.clahe_mode, self.thresh_windows):
+            saved_modes = (self.clahe_mode, self.thresh_windows, self.detector)
+            if self.clahe_mode == 'auto':
+                self.clahe_mode = 'on'
+            if self.thresh_windows == 'auto':
+                self.thresh_windows = 'multi'
+                self.detector = self._detector_multi
+            print(f"Note: auto modes need sequential detection; using CLAHE {self.clahe_mode}, "
+                  f"{self.thresh_windows} threshold windows with {workers} workers")
+
+        def next_result():
+            """Next (frame, corners, ids) in frame order, or None at end of stream"""
+            if executor is None:
+                frame = pipeline.read()
+                if frame is None:
+                    return None
+                return (frame,) + self._detect_target_markers(frame)
+
+            # Keep the pool fed with up to 2*workers frames in flight
+            while len(pending) < 2 * workers:
+                frame = pipeline.read()
+                if frame is None:
+                    break
+                pending.append((frame, executor.submit(self._detect_target_markers, frame)))
+            if not pending:
+                return None
+            frame, future = pending.popleft()
+            return (frame,) + future.result()
+
         try:
             while True:
-                ret, frame = cap.read()
-                if not ret:
+                item = next_result()
+                if item is None:
                     break
 
-                # High-performance detection
-                corners, ids = self.detect_markers_in_frame(frame)
+                # High-performance detection (stats updated in frame order)
+                frame, corners, ids = item
+                self._record_detection(ids)
 
                 # Clean visualization
-                annotated_frame = self.draw_markers(frame, corners, ids)
+                # (decoded frame is discarded after writing, so draw in place)
+                annotated_frame = self.draw_markers(frame, corners, ids, inplace=True)
 
                 # Add performance info
-                current_time = time.time()
-                elapsed_time = current_time - start_time
-                processing_fps = frame_count / elapsed_time if elapsed_time > 0 else 0
+                if frame_count % self.FPS_TEXT_INTERVAL == 0:
+                    elapsed_time = time.time() - start_time
+                    processing_fps = frame_count / elapsed_time if elapsed_time > 0 else 0
+                    fps_text = f"Processing FPS: {processing_fps:.1f}"
 
-                fps_text = f"Processing FPS: {processing_fps:.1f}"
-                cv2.putText(annotated_frame, fps_text, (10, annotated_frame.shape[0] - 10),
+                cv2.putText(annotated_frame, fps_text, fps_pos,
                            cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
 
-                # Write frame
-                out.write(annotated_frame)
+                # Hand frame to the writer thread
+                pipeline.write(annotated_frame)
 
                 frame_count += 1
 
@@ -247,8 +536,19 @@ class OptimizedVideoArUcoProcessor:
                           f"- Processing FPS: {processing_fps:.1f}")
 
         finally:
+            # Stop the detection pool, the reader, then flush the writer
+            if executor is not None:
+                executor.shutdown(wait=True)
+                cv2.setNumThreads(prev_cv_threads)
+            pipeline.close()
             cap.release()
             out.release()
+            if saved_modes is not None:
+                self.clahe_mode, self.thresh_windows, self.detector = saved_modes
+            if calibrating:
+                self.clahe_mode = 'calibrate'
+
+        pipeline.raise_write_error()
 
         # Print final statistics
         self._print_statistics()
@@ -268,7 +568,7 @@ class OptimizedVideoArUcoProcessor:
         if self.stats['total_frames'] > 0:
             print(f"Detection rate: {(self.stats['frames_with_markers']/self.stats['total_frames']*100):.1f}%")
         print(f"Total markers detected: {self.stats['total_markers_detected']}")
-        print(f"Unique marker IDs found: {sorted(list(self.stats['unique_marker_ids']))}")
+        print(f"Unique marker IDs found: {np.flatnonzero(self._seen_bitset).tolist()}")
         if self.stats['total_frames'] > 0:
             print(f"Average markers per frame: {(self.stats['total_markers_detected']/self.stats['total_frames']):.2f}")
         print("="*50)
@@ -284,6 +584,28 @@ def main():
                        help='Marker size in meters (default: 0.015 for 15mm)')
     parser.add_argument('--target-ids', nargs='+', type=int, default=[0, 1],
                        help='Target marker IDs to detect (default: 0 1)')
+    parser.add_argument('--prefetch', type=int, default=8,
+                       help='Frames buffered between decode/detect/encode threads (default: 8)')
+    parser.add_argument('-j', '--workers', type=int, default=1,
+                       help='Detection worker threads; with more than 1, auto CLAHE / '
+                            'threshold modes fall back to on / multi (default: 1)')
+    parser.add_argument('--quad-decimate', type=int, default=1,
+                       help='Detect on an image downscaled by this factor, then refine '
+                            'corners at full resolution (default: 1)')
+    parser.add_argument('--output-codec', choices=['auto'] + list(OUTPUT_CODECS), default='auto',
+                       help='Output codec: auto (hardware H.264, else mp4v), mp4v, avc1, '
+                            'or the cheaper-to-encode mjpg/ffv1 for intermediate output '
+                            '(default: auto)')
+    parser.add_argument('--thresh-windows', choices=['multi', 'single', 'auto'], default='multi',
+                       help='Adaptive threshold windows: multi (configured range), single '
+                            '(one pass, fastest), or auto (single, multi after a missed frame) '
+                            '(default: multi)')
+    parser.add_argument('--clahe', choices=['off', 'on', 'auto', 'calibrate'], default='on',
+                       help='CLAHE contrast enhancement: off, on, auto (only after a frame '
+                            'without detections), or calibrate (time on/off on the first '
+                            '100 frames and keep the faster one) (default: on)')
+    parser.add_argument('--clahe-scale', type=int, default=1,
+                       help='Downsample factor applied before CLAHE (default: 1)')
 
     args = parser.parse_args()
 
@@ -292,13 +614,20 @@ def main():
         processor = OptimizedVideoArUcoProcessor(
             dictionary_type=args.dictionary,
             marker_size=args.marker_size,
-            target_ids=args.target_ids
+            target_ids=args.target_ids,
+            clahe_mode=args.clahe,
+            clahe_scale=args.clahe_scale,
+            quad_decimate=args.quad_decimate,
+            thresh_windows=args.thresh_windows
         )
 
         # Process video
         output_path = processor.process_video(
             input_path=args.input_video,
-            output_path=args.output
+            output_path=args.output,
+            prefetch=args.prefetch,
+            workers=args.workers,
+            output_codec=args.output_codec
         )
 
         print(f"\nSuccess! Optimized video saved to: {output_path}")
@@ -4,6 +4,7 @@
 遍历data目录及其子目录，批量处理所有session的ArUco数据
 """
 
+import os
 import sys
 import argparse
 from pathlib import Path
@@ -25,13 +26,64 @@ except ImportError:
     HAS_TQDM = False
     print("提示: 安装tqdm可获得更好的进度显示 (pip install tqdm)")
 
+# 尝试导入orjson（更快的JSON序列化，没有则使用标准库json）
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+
+# OAK相机标定缓存文件（按设备MxID校验）
+CALIB_CACHE_PATH = Path.home() / '.cache' / 'potac' / 'oak_calib.npz'
+
+# OfflineArUcoProcessor 类缓存（每个进程只导入一次）
+_OfflineArUcoProcessor = None
+
+# 工作进程内的批处理器实例（由 _worker_init 创建）
+_worker_processor = None
+
+
+def _get_offline_processor_class():
+    """延迟导入 OfflineArUcoProcessor，并在进程内缓存"""
+    global _OfflineArUcoProcessor
+    if _OfflineArUcoProcessor is None:
+        tools_dir = str(project_root / 'Tools')
+        if tools_dir not in sys.path:
+            sys.path.insert(0, tools_dir)
+        from process_aruco_offline import OfflineArUcoProcessor
+        _OfflineArUcoProcessor = OfflineArUcoProcessor
+    return _OfflineArUcoProcessor
+
+
+def _worker_init(force_reprocess, skip_update_pkl, camera_matrix, dist_coeffs):
+    """进程池初始化：导入处理模块并注入已加载的相机标定（每个工作进程只执行一次）"""
+    global _worker_processor
+    _get_offline_processor_class()
+    _worker_processor = SimpleBatchProcessor(
+        force_reprocess=force_reprocess,
+        skip_update_pkl=skip_update_pkl,
+        load_calibration=False
+    )
+    if camera_matrix is not None:
+        _worker_processor.camera_matrix = camera_matrix
+        _worker_processor.dist_coeffs = dist_coeffs
+        _worker_processor.calibration_loaded = True
+
+
+def _process_session_in_worker(session_dir: Path) -> Dict[str, Any]:
+    """工作进程任务入口（只传递session路径，避免每个任务重复序列化处理器）"""
+    return _worker_processor.process_single_session(session_dir)
+
 
 class SimpleBatchProcessor:
     """简化的批量ArUco处理器"""
 
-    def __init__(self, force_reprocess=False, skip_update_pkl=False):
+    def __init__(self, force_reprocess=False, skip_update_pkl=False, load_calibration=True,
+                 refresh_calib=False):
         self.force_reprocess = force_reprocess
         self.skip_update_pkl = skip_update_pkl
+        self.refresh_calib = refresh_calib
         self.results = []
 
         # 全局相机标定数据（只加载一次）
@@ -39,11 +91,47 @@ class SimpleBatchProcessor:
         self.dist_coeffs = None
         self.calibration_loaded = False
 
-        # 在初始化时加载相机标定
-        self._load_camera_calibration_once()
+        # 在初始化时加载相机标定（工作进程中由 _worker_init 注入，不重复打开设备）
+        if load_calibration:
+            self._load_camera_calibration_once()
+
+    def _read_calibration_cache(self):
+        """读取磁盘上的标定缓存，返回 (camera_matrix, dist_coeffs, mxid) 或 None"""
+        if self.refresh_calib or not CALIB_CACHE_PATH.exists():
+            return None
+        try:
+            import numpy as np
+            with np.load(CALIB_CACHE_PATH) as cache:
+                return cache['K'], cache['D'], str(cache['mxid'])
+        except Exception as e:
+            print(f"⚠ 读取标定缓存失败: {e}")
+            return None
+
+    def _write_calibration_cache(self, mxid):
+        """保存标定到磁盘缓存，下次无需打开设备"""
+        try:
+            import numpy as np
+            CALIB_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+            np.savez(CALIB_CACHE_PATH, K=self.camera_matrix, D=self.dist_coeffs,
+                     mxid=str(mxid or ''))
+        except Exception as e:
+            print(f"⚠ 保存标定缓存失败: {e}")
+
+    def _apply_calibration_cache(self, cached):
+        """使用缓存的标定"""
+        self.camera_matrix, self.dist_coeffs, mxid = cached
+        self.calibration_loaded = True
+        print(f"✓ 使用缓存的相机标定 (MxID: {mxid or '未知'}, {CALIB_CACHE_PATH})")
+        print(f"  fx={self.camera_matrix[0, 0]:.2f}, fy={self.camera_matrix[1, 1]:.2f}")
+        print(f"  cx={self.camera_matrix[0, 2]:.2f}, cy={self.camera_matrix[1, 2]:.2f}")
 
     def _load_camera_calibration_once(self):
-        """批量处理前只加载一次相机标定（性能优化）"""
+        """批量处理前只加载一次相机标定（性能优化）
+
+        优先使用磁盘缓存（与当前连接设备的MxID一致时），
+        仅在缓存缺失、设备不匹配或 --refresh-calib 时才打开设备读取。
+        """
+        cached = self._read_calibration_cache()
         try:
             import depthai as dai
             import cv2
@@ -51,6 +139,13 @@ class SimpleBatchProcessor:
 
             devices = dai.Device.getAllAvailableDevices()
             if devices:
+                info = devices[0]
+                get_id = getattr(info, 'getMxId', None) or getattr(info, 'getDeviceId', None)
+                mxid = get_id() if get_id is not None else None
+                if cached is not None and (mxid is None or cached[2] == mxid):
+                    self._apply_calibration_cache(cached)
+                    return
+
                 print("✓ 检测到OAK设备，加载出厂标定（全局加载，仅一次）...")
                 device = dai.Device()
                 calib_data = device.readCalibration()
@@ -75,36 +170,41 @@ class SimpleBatchProcessor:
                 device.close()
 
                 self.calibration_loaded = True
+                self._write_calibration_cache(mxid)
                 print(f"  相机标定已加载 ({width}x{height})")
                 print(f"  fx={intrinsics[0][0]:.2f}, fy={intrinsics[1][1]:.2f}")
                 print(f"  cx={intrinsics[0][2]:.2f}, cy={intrinsics[1][2]:.2f}")
+            elif cached is not None:
+                print("⚠ 未检测到OAK设备")
+                self._apply_calibration_cache(cached)
             else:
                 print("⚠ 未检测到OAK设备，将使用默认标定")
                 self.calibration_loaded = False
 
         except Exception as e:
+            if cached is not None:
+                print(f"⚠ 无法访问OAK设备: {e}")
+                self._apply_calibration_cache(cached)
+                return
             print(f"⚠ 加载相机标定失败: {e}")
             print("  将使用默认标定")
             self.calibration_loaded = False
 
-    def is_valid_session(self, session_dir: Path) -> bool:
+    def is_valid_session(self, session_dir) -> bool:
         """判断是否是有效的session目录"""
-        # 检查是否有aligned_data.pkl
-        pkl_file = session_dir / 'aligned_data.pkl'
-        if not pkl_file.exists():
+        # 一次scandir取得子项名称集合，代替逐个exists()
+        try:
+            with os.scandir(session_dir) as it:
+                names = {entry.name for entry in it}
+        except OSError:
             return False
 
-        # 检查是否有oak_camera目录
-        oak_dir = session_dir / 'oak_camera'
-        if not oak_dir.exists():
+        # 检查是否有aligned_data.pkl 和 oak_camera目录
+        if 'aligned_data.pkl' not in names or 'oak_camera' not in names:
             return False
 
         # 检查是否有frames_metadata.json
-        metadata_file = oak_dir / 'frames_metadata.json'
-        if not metadata_file.exists():
-            return False
-
-        return True
+        return os.path.exists(os.path.join(session_dir, 'oak_camera', 'frames_metadata.json'))
 
     def should_skip_session(self, session_dir: Path) -> tuple:
         """判断是否应该跳过此session"""
@@ -122,10 +222,20 @@ class SimpleBatchProcessor:
 
         print(f"\n搜索session目录: {data_dir}")
 
-        # 递归查找所有可能的session目录
-        for path in data_dir.rglob('session_*'):
-            if path.is_dir() and self.is_valid_session(path):
-                sessions.append(path)
+        # 递归查找所有可能的session目录（os.scandir 自带类型信息，少一次stat）
+        pending = [str(data_dir)]
+        while pending:
+            current = pending.pop()
+            try:
+                with os.scandir(current) as it:
+                    subdirs = [entry for entry in it if entry.is_dir(follow_symlinks=False)]
+            except OSError:
+                continue
+
+            for entry in subdirs:
+                pending.append(entry.path)
+                if entry.name.startswith('session_') and self.is_valid_session(entry.path):
+                    sessions.append(Path(entry.path))
 
         # 按名称排序
         sessions.sort()
@@ -152,9 +262,8 @@ class SimpleBatchProcessor:
                 result['message'] = skip_reason
                 return result
 
-            # 导入处理器（延迟导入避免启动慢）
-            sys.path.insert(0, str(project_root / 'Tools'))
-            from process_aruco_offline import OfflineArUcoProcessor
+            # 导入处理器（延迟导入避免启动慢，进程内只导入一次）
+            OfflineArUcoProcessor = _get_offline_processor_class()
 
             # 创建处理器
             processor = OfflineArUcoProcessor(session_dir)
@@ -202,24 +311,47 @@ class SimpleBatchProcessor:
 
         return result
 
+    @staticmethod
+    def _session_workload(session_dir: Path) -> int:
+        """估计session工作量：frames_metadata.json 每帧一条记录，文件大小与帧数成正比"""
+        try:
+            return (session_dir / 'oak_camera' / 'frames_metadata.json').stat().st_size
+        except OSError:
+            return 0
+
     def process_batch_parallel(self, sessions: List[Path], num_workers: int) -> List[Dict]:
-        """并行批量处理"""
+        """并行批量处理
+
+        大session优先调度，结果无序返回（imap_unordered + chunksize），
+        最后按原session顺序重新排列结果。
+        """
         print(f"\n使用 {num_workers} 个进程并行处理...")
 
-        with mp.Pool(num_workers) as pool:
+        # 大的先开始，减少尾部等待
+        scheduled = sorted(sessions, key=self._session_workload, reverse=True)
+        chunksize = max(1, len(sessions) // (num_workers * 4))
+
+        initargs = (self.force_reprocess, self.skip_update_pkl,
+                    self.camera_matrix if self.calibration_loaded else None,
+                    self.dist_coeffs if self.calibration_loaded else None)
+
+        with mp.Pool(num_workers, initializer=_worker_init, initargs=initargs) as pool:
             if HAS_TQDM:
                 results = list(tqdm(
-                    pool.imap(self.process_single_session, sessions),
+                    pool.imap_unordered(_process_session_in_worker, scheduled, chunksize=chunksize),
                     total=len(sessions),
                     desc="处理进度"
                 ))
             else:
                 results = []
-                for i, result in enumerate(pool.imap(self.process_single_session, sessions)):
+                for i, result in enumerate(pool.imap_unordered(_process_session_in_worker, scheduled,
+                                                               chunksize=chunksize)):
                     results.append(result)
                     print(f"进度: {i+1}/{len(sessions)} ({(i+1)/len(sessions)*100:.1f}%)")
 
-        return results
+        # 按原session顺序还原（每个结果带有 full_path）
+        by_path = {r['full_path']: r for r in results}
+        return [by_path[str(session)] for session in sessions]
 
     def process_batch_serial(self, sessions: List[Path]) -> List[Dict]:
         """串行批量处理"""
@@ -251,13 +383,21 @@ class SimpleBatchProcessor:
     def generate_summary(self, results: List[Dict]) -> Dict[str, Any]:
         """生成统计摘要"""
         total = len(results)
-        successful = sum(1 for r in results if r['success'] and not r['skipped'])
-        skipped = sum(1 for r in results if r['skipped'])
-        failed = sum(1 for r in results if not r['success'])
-
-        total_frames = sum(r['stats'].get('total_frames', 0) for r in results if r['success'])
-        total_valid_distances = sum(r['stats'].get('valid_distances', 0)
-                                   for r in results if r['success'])
+        successful = skipped = failed = 0
+        total_frames = total_valid_distances = 0
+
+        # 单次遍历统计所有计数
+        for r in results:
+            if r['skipped']:
+                skipped += 1
+            if not r['success']:
+                failed += 1
+                continue
+            if not r['skipped']:
+                successful += 1
+            stats = r['stats']
+            total_frames += stats.get('total_frames', 0)
+            total_valid_distances += stats.get('valid_distances', 0)
 
         return {
             'total_sessions': total,
@@ -337,6 +477,17 @@ class SimpleBatchProcessor:
             'results': results
         }
 
+        if HAS_ORJSON:
+            try:
+                data = orjson.dumps(report_data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS
+                                    | orjson.OPT_SERIALIZE_NUMPY)
+                with open(output_file, 'wb') as f:
+                    f.write(data)
+                print(f"JSON报告已保存: {output_file}")
+                return
+            except TypeError:
+                pass  # 含orjson不支持的类型，退回标准库
+
         with open(output_file, 'w', encoding='utf-8') as f:
             json.dump(report_data, f, indent=2, ensure_ascii=False)
 
@@ -393,6 +544,9 @@ def main():
     parser.add_argument('--skip-update-pkl', action='store_true',
                        help='仅检测ArUco，不更新PKL文件')
 
+    parser.add_argument('--refresh-calib', action='store_true',
+                       help='忽略标定缓存，重新从OAK设备读取相机标定')
+
     parser.add_argument('--dry-run', action='store_true',
                        help='仅列出将要处理的session，不实际处理')
 
@@ -434,7 +588,8 @@ def main():
     # 创建处理器
     processor = SimpleBatchProcessor(
         force_reprocess=args.force,
-        skip_update_pkl=args.skip_update_pkl
+        skip_update_pkl=args.skip_update_pkl,
+        refresh_calib=args.refresh_calib
     )
 
     # 查找所有sessions
@@ -5,9 +5,26 @@
 """
 
 import json
+import os
 import sys
 from pathlib import Path
 
+from session_utils import find_latest_session
+
+# 尝试导入orjson（更快的JSON解析），没有则使用标准库json
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+# 尝试导入pysimdjson（按需访问，只读total_frames和帧数，不构建每帧对象）
+try:
+    import simdjson
+    HAS_SIMDJSON = True
+except ImportError:
+    HAS_SIMDJSON = False
+
 
 def check_sensor_integrity(sensor_dir):
     """
@@ -35,11 +52,14 @@ def check_sensor_integrity(sensor_dir):
         result['issues'].append(f"目录不存在: {sensor_dir}")
         return result
 
-    # 统计图片文件数量
-    jpg_files = list(sensor_dir.glob("frame_*.jpg"))
-    png_files = list(sensor_dir.glob("frame_*.png"))
-    image_files = jpg_files + png_files
-    result['image_count'] = len(image_files)
+    # 统计图片文件数量（单次scandir，按文件名字符串匹配，不创建Path对象）
+    count = 0
+    with os.scandir(sensor_dir) as it:
+        for entry in it:
+            name = entry.name
+            if name.startswith('frame_') and (name.endswith('.jpg') or name.endswith('.png')):
+                count += 1
+    result['image_count'] = count
 
     # 读取metadata文件
     metadata_file = sensor_dir / "frames_metadata.json"
@@ -48,12 +68,22 @@ def check_sensor_integrity(sensor_dir):
         return result
 
     try:
-        with open(metadata_file, 'r') as f:
-            metadata = json.load(f)
+        if HAS_SIMDJSON:
+            with open(metadata_file, 'rb') as f:
+                doc = simdjson.Parser().parse(f.read())
+            result['metadata_total_frames'] = doc['total_frames'] if 'total_frames' in doc else 0
+            result['metadata_count'] = len(doc['frames']) if 'frames' in doc else 0
+        else:
+            if HAS_ORJSON:
+                with open(metadata_file, 'rb') as f:
+                    metadata = orjson.loads(f.read())
+            else:
+                with open(metadata_file, 'r') as f:
+                    metadata = json.load(f)
 
-        result['metadata_total_frames'] = metadata.get('total_frames', 0)
-        frames_list = metadata.get('frames', [])
-        result['metadata_count'] = len(frames_list)
+            result['metadata_total_frames'] = metadata.get('total_frames', 0)
+            frames_list = metadata.get('frames', [])
+            result['metadata_count'] = len(frames_list)
 
         # 检查一致性
         if result['image_count'] == result['metadata_count'] == result['metadata_total_frames']:
@@ -98,9 +128,10 @@ def check_session(session_dir):
 
     # 查找所有传感器目录
     sensor_dirs = []
-    for item in session_dir.iterdir():
-        if item.is_dir() and (item / "frames_metadata.json").exists():
-            sensor_dirs.append(item)
+    with os.scandir(session_dir) as it:
+        for entry in it:
+            if entry.is_dir() and os.path.exists(os.path.join(entry.path, "frames_metadata.json")):
+                sensor_dirs.append(Path(entry.path))
 
     if not sensor_dirs:
         print("❌ 未找到任何传感器目录（包含frames_metadata.json的目录）")
@@ -164,12 +195,11 @@ def main():
             print("❌ data目录不存在")
             sys.exit(1)
 
-        sessions = sorted(data_dir.glob("session_*"), key=lambda x: x.stat().st_mtime, reverse=True)
-        if not sessions:
+        session_path = find_latest_session(data_dir)
+        if session_path is None:
             print("❌ 未找到任何session")
             sys.exit(1)
 
-        session_path = sessions[0]
         print(f"使用最新的session: {session_path.name}")
 
     check_session(session_path)
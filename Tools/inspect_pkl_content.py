@@ -2,21 +2,28 @@
 """
 查看PKL文件的完整内容
 """
-import pickle
 import numpy as np
 import json
 from pathlib import Path
 import sys
 
+from pkl_header import load_pkl_header
+from pkl_io import load_pkl
 
-def inspect_pkl(pkl_path):
-    """详细检查PKL文件内容"""
+
+def inspect_pkl(pkl_path, header_only=False):
+    """详细检查PKL文件内容
+
+    header_only=True 时不构造numpy数组，只显示元数据和数组形状/类型
+    """
     print(f"PKL文件: {pkl_path}")
     print("=" * 80)
     
     # 加载PKL
-    with open(pkl_path, 'rb') as f:
-        data = pickle.load(f)
+    if header_only:
+        data = load_pkl_header(pkl_path)
+    else:
+        data = load_pkl(pkl_path)
     
     print("\n【顶层结构】")
     print(f"主要键: {list(data.keys())}")
@@ -44,6 +51,18 @@ def inspect_pkl(pkl_path):
     print("\n【数据部分 (data)】")
     data_section = data['data']
     print(f"主要数据键: {list(data_section.keys())}")
+
+    if header_only:
+        for key, value in data_section.items():
+            if isinstance(value, dict):
+                print(f"\n  {key}:")
+                for sub_key, sub_value in value.items():
+                    print(f"    {sub_key}: {sub_value}")
+            else:
+                print(f"\n  {key}: {value}")
+        print("\n" + "=" * 80)
+        print("✓ 检查完成（仅头信息）")
+        return
     
     # 时间戳
     if 'timestamps' in data_section:
@@ -92,6 +111,10 @@ def inspect_pkl(pkl_path):
                 print(f"      类型: {type(value)}")
                 print(f"      形状: {value.shape}")
                 print(f"      数据类型: {value.dtype}")
+
+                # 浮点数组可能以float32存储（dtype_version 2），统计前升为float64
+                if value.dtype.kind == 'f':
+                    value = value.astype(np.float64, copy=False)
                 
                 # 显示一些示例数据
                 if len(value.shape) == 1:
@@ -130,8 +153,11 @@ def inspect_pkl(pkl_path):
 
 
 if __name__ == "__main__":
-    if len(sys.argv) > 1:
-        pkl_path = sys.argv[1]
+    header_only = '--header-only' in sys.argv[1:]
+    args = [a for a in sys.argv[1:] if a != '--header-only']
+
+    if args:
+        pkl_path = args[0]
     else:
         # 使用测试数据
         pkl_path = "/home/kirdo/robo/PoTac/data/session_20251027_190540/aligned_data.pkl"
@@ -140,4 +166,4 @@ if __name__ == "__main__":
         print(f"错误: 文件不存在: {pkl_path}")
         sys.exit(1)
     
-    inspect_pkl(pkl_path)
+    inspect_pkl(pkl_path, header_only=header_only)
@@ -3,19 +3,28 @@
 Inspect PKL session data to diagnose distance calculation issues
 """
 import sys
-import pickle
 import numpy as np
 from pathlib import Path
 
+from aruco_math import batch_distances
+from pkl_header import load_pkl_header
+from pkl_io import load_pkl
 
-def inspect_pkl_data(pkl_path):
-    """Inspect PKL data and show detailed information"""
+
+def inspect_pkl_data(pkl_path, header_only=False):
+    """Inspect PKL data and show detailed information
+
+    With header_only, numpy arrays are not materialized: only metadata and
+    array shapes/dtypes are shown.
+    """
     print(f"Inspecting PKL file: {pkl_path}")
     print("=" * 80)
 
     try:
-        with open(pkl_path, 'rb') as f:
-            data = pickle.load(f)
+        if header_only:
+            data = load_pkl_header(pkl_path)
+        else:
+            data = load_pkl(pkl_path)
 
         # Show metadata
         metadata = data['metadata']
@@ -26,6 +35,7 @@ def inspect_pkl_data(pkl_path):
         print(f"  Marker IDs: {metadata['aruco']['marker_ids']}")
         print(f"  Marker size: {metadata['aruco']['marker_size']}m")
         print(f"  Calibrated: {metadata['aruco']['calibrated']}")
+        print(f"  Dtype version: {metadata['aruco'].get('dtype_version', 1)}")
 
         # Show data structure
         data_section = data['data']
@@ -35,6 +45,13 @@ def inspect_pkl_data(pkl_path):
         timestamps = data_section.get('timestamps', [])
         print(f"  Total frames: {len(timestamps)}")
 
+        if header_only:
+            for key, value in data_section.get('aruco', {}).items():
+                print(f"    aruco.{key}: {value}")
+            print("=" * 80)
+            print("✓ Inspection complete (header only)")
+            return
+
         # Inspect ArUco data in detail
         if 'aruco' in data_section:
             aruco_data = data_section['aruco']
@@ -43,9 +60,10 @@ def inspect_pkl_data(pkl_path):
 
             left_det = aruco_data['left_detected']
             right_det = aruco_data['right_detected']
-            dist_abs = aruco_data['distance_absolute']
-            dist_hor = aruco_data['distance_horizontal']
-            dist_pix = aruco_data['distance_pixel']
+            # Stored as float32 since dtype_version 2; upcast for printing/comparison
+            dist_abs = np.asarray(aruco_data['distance_absolute'], dtype=np.float64)
+            dist_hor = np.asarray(aruco_data['distance_horizontal'], dtype=np.float64)
+            dist_pix = np.asarray(aruco_data['distance_pixel'], dtype=np.float64)
             left_pos = aruco_data['left_positions']
             right_pos = aruco_data['right_positions']
 
@@ -70,32 +88,31 @@ def inspect_pkl_data(pkl_path):
             print(f"\n  [DETAILED FRAME INSPECTION]")
             print(f"  Showing first 10 frames where both markers detected:\n")
 
-            count = 0
-            for i in range(len(timestamps)):
-                if both_detected[i] and count < 10:
-                    left_p = left_pos[i]
-                    right_p = right_pos[i]
-
-                    # Manually calculate distance from positions
-                    manual_dist_3d = np.linalg.norm(np.array(right_p) - np.array(left_p)) * 1000.0
-                    manual_dist_hor = np.sqrt((right_p[0] - left_p[0])**2 + (right_p[1] - left_p[1])**2) * 1000.0
-
-                    print(f"  Frame {i} (t={timestamps[i]:.3f}s):")
-                    print(f"    Left pos:  [{left_p[0]:7.4f}, {left_p[1]:7.4f}, {left_p[2]:7.4f}] m")
-                    print(f"    Right pos: [{right_p[0]:7.4f}, {right_p[1]:7.4f}, {right_p[2]:7.4f}] m")
-                    print(f"    Stored abs distance:  {dist_abs[i]:7.2f} mm")
-                    print(f"    Manual abs distance:  {manual_dist_3d:7.2f} mm")
-                    print(f"    Stored hor distance:  {dist_hor[i]:7.2f} mm")
-                    print(f"    Manual hor distance:  {manual_dist_hor:7.2f} mm")
-
-                    # Check for discrepancy
-                    if abs(dist_abs[i] - manual_dist_3d) > 0.1:
-                        print(f"    ⚠️  MISMATCH in absolute distance: {abs(dist_abs[i] - manual_dist_3d):.2f} mm difference")
-                    if abs(dist_hor[i] - manual_dist_hor) > 0.1:
-                        print(f"    ⚠️  MISMATCH in horizontal distance: {abs(dist_hor[i] - manual_dist_hor):.2f} mm difference")
-                    print()
-
-                    count += 1
+            # Manually calculate distances from positions for all frames at once
+            lp = np.asarray(left_pos, dtype=np.float64)
+            rp = np.asarray(right_pos, dtype=np.float64)
+            manual_3d, manual_hor = batch_distances(lp, rp)
+
+            for i in np.flatnonzero(both_detected)[:10]:
+                left_p = lp[i]
+                right_p = rp[i]
+                manual_dist_3d = manual_3d[i]
+                manual_dist_hor = manual_hor[i]
+
+                print(f"  Frame {i} (t={timestamps[i]:.3f}s):")
+                print(f"    Left pos:  [{left_p[0]:7.4f}, {left_p[1]:7.4f}, {left_p[2]:7.4f}] m")
+                print(f"    Right pos: [{right_p[0]:7.4f}, {right_p[1]:7.4f}, {right_p[2]:7.4f}] m")
+                print(f"    Stored abs distance:  {dist_abs[i]:7.2f} mm")
+                print(f"    Manual abs distance:  {manual_dist_3d:7.2f} mm")
+                print(f"    Stored hor distance:  {dist_hor[i]:7.2f} mm")
+                print(f"    Manual hor distance:  {manual_dist_hor:7.2f} mm")
+
+                # Check for discrepancy
+                if abs(dist_abs[i] - manual_dist_3d) > 0.1:
+                    print(f"    ⚠️  MISMATCH in absolute distance: {abs(dist_abs[i] - manual_dist_3d):.2f} mm difference")
+                if abs(dist_hor[i] - manual_dist_hor) > 0.1:
+                    print(f"    ⚠️  MISMATCH in horizontal distance: {abs(dist_hor[i] - manual_dist_hor):.2f} mm difference")
+                print()
 
         print("=" * 80)
         print("✓ Inspection complete")
@@ -107,14 +124,17 @@ def inspect_pkl_data(pkl_path):
 
 
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("Usage: python inspect_pkl_data.py <pkl_file_or_session_dir>")
+    header_only = '--header-only' in sys.argv[1:]
+    args = [a for a in sys.argv[1:] if a != '--header-only']
+
+    if not args:
+        print("Usage: python inspect_pkl_data.py <pkl_file_or_session_dir> [--header-only]")
         print("\nExample:")
         print("  python inspect_pkl_data.py ./data/session_20241024_143052")
         print("  python inspect_pkl_data.py ./data/session_20241024_143052/session_20241024_143052_data.pkl")
         sys.exit(1)
 
-    path = Path(sys.argv[1])
+    path = Path(args[0])
 
     # If directory, find PKL file
     if path.is_dir():
@@ -130,4 +150,4 @@ if __name__ == "__main__":
         print(f"Error: File not found: {pkl_path}")
         sys.exit(1)
 
-    inspect_pkl_data(pkl_path)
+    inspect_pkl_data(pkl_path, header_only=header_only)
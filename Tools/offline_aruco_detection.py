@@ -6,13 +6,25 @@
 使用方法:
     python offline_aruco_detection.py <session_dir>
     python offline_aruco_detection.py data/session_20251027_192209
+
+    # 以1/2分辨率解码检测（更快，角点/像素距离会换算回原分辨率）
+    python offline_aruco_detection.py <session_dir> --decode-scale 2
+
+    # 多进程并行检测
+    python offline_aruco_detection.py <session_dir> -j 8
 """
 
+import os
 import sys
 import json
+import argparse
+import threading
+import collections
+import multiprocessing as mp
 import cv2
 import numpy as np
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 
 # 尝试导入tqdm，如果不存在则使用简单进度显示
 try:
@@ -22,23 +34,149 @@ except ImportError:
     HAS_TQDM = False
     print("提示: 安装tqdm可获得更好的进度显示 (pip install tqdm)")
 
+# 尝试导入orjson（更快的JSON解析/序列化），没有则使用标准库json
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+# 尝试导入pysimdjson（按需访问JSON字段，只提取用到的帧信息），没有则完整解析
+try:
+    import simdjson
+    HAS_SIMDJSON = True
+except ImportError:
+    HAS_SIMDJSON = False
+
+# frames_metadata.json 中每帧用到的字段
+FRAME_FIELDS = ('frame_num', 'filename', 'timestamp')
+
+# 单个标记的逐帧记录（结构化dtype，一帧一行；缺失的标记valid为False、id为-1、数值为NaN）
+MARKER_DTYPE = np.dtype([
+    ('valid', '?'),
+    ('id', 'i4'),
+    ('corners', 'f8', (4, 2)),  # 原分辨率像素坐标
+    ('tvec', 'f8', (3,)),
+    ('rvec', 'f8', (3,)),
+])
+
+# 尝试导入PyTurboJPEG（SIMD加速的JPEG缩放/灰度解码），没有则使用cv2.imread
+try:
+    from turbojpeg import TurboJPEG, TJPF_GRAY
+    HAS_TURBOJPEG = True
+except ImportError:
+    HAS_TURBOJPEG = False
+
+# 解码缩放倍数 -> cv2灰度（缩小）读取标志
+IMREAD_GRAY_FLAGS = {
+    1: cv2.IMREAD_GRAYSCALE,
+    2: cv2.IMREAD_REDUCED_GRAYSCALE_2,
+    4: cv2.IMREAD_REDUCED_GRAYSCALE_4,
+    8: cv2.IMREAD_REDUCED_GRAYSCALE_8,
+}
+
 # 添加项目路径
 sys.path.insert(0, str(Path(__file__).parent / 'src'))
 
 from vision.aruco_detector_optimized import ArUcoDetectorOptimized
+from aruco_math import batch_distances
+from session_utils import find_latest_session
+
+# 工作进程内的检测器实例（由 _worker_init 创建）
+_worker_detector = None
+
+
+def _worker_init(session_dir, config_file, decode_scale, use_opencl, rectify,
+                 camera_matrix, dist_coeffs, image_size):
+    """进程池初始化：每个工作进程创建一次检测器并注入主进程已加载的相机标定"""
+    global _worker_detector
+    _worker_detector = OfflineArUcoDetector(session_dir, config_file=config_file,
+                                            decode_scale=decode_scale, use_opencl=use_opencl,
+                                            rectify=rectify, load_calibration=False)
+    if camera_matrix is not None:
+        _worker_detector._apply_calibration(camera_matrix, dist_coeffs, image_size)
+
+
+def _detect_in_worker(task):
+    """工作进程任务入口：读取+检测一帧，只返回结果（不回传图像）
+
+    Args:
+        task: (frame_info, image_path)
+    """
+    return _worker_detector._detect_frame(*_worker_detector._decode_worker(*task))
+
+
+class DistanceStats:
+    """距离统计的在线累加器（Welford算法计算均值/标准差，单次遍历）
+
+    中位数需要全部数值，存放在预分配的float64数组中（容量不足时翻倍），
+    而不是Python float列表。
+    """
+
+    def __init__(self, capacity=1024):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = float('inf')
+        self.max = float('-inf')
+        self._values = np.empty(max(1, int(capacity)), dtype=np.float64)  # 仅用于中位数
+
+    def add(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        if self.count > len(self._values):
+            self._values = np.concatenate([self._values, np.empty_like(self._values)])
+        self._values[self.count - 1] = value
+
+    def summary(self):
+        """统计结果（std为总体标准差，与np.std一致）；无数据时返回空dict"""
+        if self.count == 0:
+            return {}
+        return {
+            'mean': float(self.mean),
+            'std': float(np.sqrt(self.m2 / self.count)),
+            'min': float(self.min),
+            'max': float(self.max),
+            'median': float(np.median(self._values[:self.count])),
+        }
 
 
 class OfflineArUcoDetector:
     """离线ArUco检测器"""
 
-    def __init__(self, session_dir, config_file=None):
+    def __init__(self, session_dir, config_file=None, decode_scale=1, use_opencl=False,
+                 rectify=False, load_calibration=True):
         """
         初始化离线检测器
 
         Args:
             session_dir: session目录路径
             config_file: 配置文件路径（可选）
+            decode_scale: 解码缩小倍数（1/2/4/8），直接解码为灰度图；
+                          >1 时检测在缩小图上进行，输出的角点和像素距离换算回原分辨率
+            use_opencl: 以cv2.UMat送入检测，由OpenCL执行阈值化等图像运算（不可用时退回CPU）
+            rectify: 有标定时先用预计算的定点映射表对整帧去畸变再检测
+                     （角点和像素距离为去畸变图像坐标）
+            load_calibration: 是否加载OAK相机标定（工作进程中由 _worker_init 注入，不重复打开设备）
         """
+        if decode_scale not in IMREAD_GRAY_FLAGS:
+            raise ValueError(f"不支持的解码缩放倍数: {decode_scale}（可选 1/2/4/8）")
+        self.decode_scale = decode_scale
+        self._tj_local = threading.local()  # 每个解码线程一个TurboJPEG实例
+
+        if use_opencl and not cv2.ocl.haveOpenCL():
+            print("⚠ OpenCL不可用，使用CPU检测")
+            use_opencl = False
+        if use_opencl:
+            cv2.ocl.setUseOpenCL(True)
+        self.use_opencl = use_opencl
+
         self.session_dir = Path(session_dir)
         self.oak_dir = self.session_dir / "oak_camera"
 
@@ -50,23 +188,100 @@ class OfflineArUcoDetector:
         if not self.metadata_file.exists():
             raise ValueError(f"Metadata文件不存在: {self.metadata_file}")
 
-        with open(self.metadata_file, 'r') as f:
-            self.metadata = json.load(f)
-
-        self.total_frames = self.metadata['total_frames']
-        self.frames = self.metadata['frames']
-
-        print(f"Session: {self.session_dir.name}")
-        print(f"总帧数: {self.total_frames}")
+        self.total_frames, self.frames = self._load_frames_metadata(self.metadata_file)
+        n = len(self.frames)
+
+        # 预先拼好图片路径（字符串拼接，避免每帧构造Path）和帧序号数组
+        self._oak_dir_str = str(self.oak_dir) + os.sep
+        self._paths = [self._oak_dir_str + f['filename'] for f in self.frames]
+        self.frame_seq_nums = np.fromiter((f['frame_seq_num'] for f in self.frames),
+                                          dtype=np.int64, count=n)
+
+        # 逐帧数值结果（SoA数组，检测过程中按帧写入，统计可直接向量化计算）
+        self.marker_distance = np.full(n, np.nan)
+        self.real_distance_3d = np.full(n, np.nan)
+        self.horizontal_distance = np.full(n, np.nan)
+
+        # 左右标记记录；各字段数组为记录的视图
+        self.left_markers = self._empty_marker_records(n)
+        self.right_markers = self._empty_marker_records(n)
+        self.left_detected = self.left_markers['valid']
+        self.right_detected = self.right_markers['valid']
+        self.left_tvec = self.left_markers['tvec']
+        self.right_tvec = self.right_markers['tvec']
+        self.left_corners = self.left_markers['corners']
+        self.right_corners = self.right_markers['corners']
 
         # 初始化ArUco检测器
         if config_file is None:
             config_file = "config/settings.json"
+        self.config_file = config_file
 
         self.aruco_detector = ArUcoDetectorOptimized(config_file)
 
-        # 尝试加载OAK相机标定
-        self._load_oak_calibration()
+        # corners / tvec,rvec 转为list的函数（首个标记出现时按类型绑定）
+        self._corners_to_list = None
+        self._pose_to_list = None
+
+        # 相机标定（加载成功后保存，用于注入工作进程）
+        self.camera_matrix = None
+        self.dist_coeffs = None
+        self.image_size = None  # (width, height)，检测分辨率
+
+        # 去畸变映射表（按检测分辨率在标定后计算一次）
+        self.rectify = rectify
+        self._rectify_maps = None
+        self._rectify_buf = None
+
+        if load_calibration:
+            print(f"Session: {self.session_dir.name}")
+            print(f"总帧数: {self.total_frames}")
+
+            # 尝试加载OAK相机标定
+            self._load_oak_calibration()
+            if self.rectify and self._rectify_maps is None:
+                print("⚠ 未加载相机标定，跳过去畸变")
+
+    @staticmethod
+    def _empty_marker_records(n):
+        """n帧未检测到标记的记录数组"""
+        records = np.zeros(n, dtype=MARKER_DTYPE)
+        records['id'] = -1
+        for field in ('corners', 'tvec', 'rvec'):
+            records[field] = np.nan
+        return records
+
+    @staticmethod
+    def _load_frames_metadata(metadata_file):
+        """
+        读取frames metadata
+
+        有pysimdjson时按需访问，只提取每帧用到的字段；否则用orjson/json完整解析。
+        每帧都补齐 frame_seq_num（缺失时为-1）。
+
+        Returns:
+            (total_frames, frames)
+        """
+        if HAS_SIMDJSON:
+            with open(metadata_file, 'rb') as f:
+                doc = simdjson.Parser().parse(f.read())
+            frames = []
+            for f in doc['frames']:
+                info = {key: f[key] for key in FRAME_FIELDS}
+                info['frame_seq_num'] = f['frame_seq_num'] if 'frame_seq_num' in f else -1
+                frames.append(info)
+            return doc['total_frames'], frames
+
+        if HAS_ORJSON:
+            with open(metadata_file, 'rb') as f:
+                metadata = orjson.loads(f.read())
+        else:
+            with open(metadata_file, 'r') as f:
+                metadata = json.load(f)
+        frames = metadata['frames']
+        for f in frames:
+            f.setdefault('frame_seq_num', -1)
+        return metadata['total_frames'], frames
 
     def _load_oak_calibration(self):
         """加载OAK相机的出厂标定参数"""
@@ -83,9 +298,8 @@ class OfflineArUcoDetector:
                 # 获取RGB相机标定
                 rgb_socket = dai.CameraBoardSocket.CAM_A
 
-                # 使用实际分辨率（从第一张图片读取）
-                first_image = self.oak_dir / self.frames[0]['filename']
-                img = cv2.imread(str(first_image))
+                # 使用实际检测分辨率（从第一张图片读取，按解码缩放倍数换算）
+                img = self._read_image(self._paths[0])
                 height, width = img.shape[:2]
 
                 intrinsics = calib_data.getCameraIntrinsics(rgb_socket, width, height)
@@ -99,8 +313,7 @@ class OfflineArUcoDetector:
 
                 dist_coeffs = np.array(distortion, dtype=np.float64)
 
-                self.aruco_detector.set_camera_calibration(camera_matrix, dist_coeffs)
-                self.aruco_detector.update_config({'estimate_pose': True})
+                self._apply_calibration(camera_matrix, dist_coeffs, (width, height))
 
                 device.close()
 
@@ -117,75 +330,206 @@ class OfflineArUcoDetector:
             print("  将使用默认标定（可能影响距离精度）")
             return False
 
-    def process_all_frames(self):
-        """处理所有帧"""
-        print(f"\n开始处理 {self.total_frames} 帧...")
-
-        results = []
+    def _apply_calibration(self, camera_matrix, dist_coeffs, image_size=None):
+        """
+        设置相机标定并启用位姿估计
 
-        # 使用tqdm或简单进度显示
-        if HAS_TQDM:
-            iterator = tqdm(self.frames, desc="检测进度")
+        rectify 模式下按 image_size 预计算 CV_16SC2 定点去畸变映射表，
+        检测器改用零畸变系数（输入图像已去畸变）。
+        """
+        self.camera_matrix = camera_matrix
+        self.dist_coeffs = dist_coeffs
+        self.image_size = image_size
+
+        if self.rectify and image_size is not None:
+            self._rectify_maps = cv2.initUndistortRectifyMap(
+                camera_matrix, dist_coeffs, None, camera_matrix, image_size, cv2.CV_16SC2)
+            self.aruco_detector.set_camera_calibration(camera_matrix, np.zeros(5))
         else:
-            iterator = self.frames
-            print("处理中...", end='', flush=True)
+            self.aruco_detector.set_camera_calibration(camera_matrix, dist_coeffs)
+        self.aruco_detector.update_config({'estimate_pose': True})
+
+    def _read_image(self, path):
+        """按解码缩放倍数读取灰度图（优先TurboJPEG，失败时退回cv2.imread）"""
+        if HAS_TURBOJPEG and path.lower().endswith(('.jpg', '.jpeg')):
+            tj = getattr(self._tj_local, 'tj', None)
+            if tj is None:
+                tj = self._tj_local.tj = TurboJPEG()
+            try:
+                with open(path, 'rb') as f:
+                    return tj.decode(f.read(), pixel_format=TJPF_GRAY,
+                                     scaling_factor=(1, self.decode_scale))
+            except Exception:
+                pass
+        return cv2.imread(path, IMREAD_GRAY_FLAGS[self.decode_scale])
 
-        for i, frame_info in enumerate(iterator):
-            # 简单进度显示（无tqdm时）
-            if not HAS_TQDM and i % 50 == 0:
-                print(f"\r处理中... {i}/{self.total_frames} ({i/self.total_frames*100:.1f}%)", end='', flush=True)
+    def _decode_worker(self, frame_info, image_path):
+        """解码线程：读取并解码一帧（cv2.imread 在libjpeg内释放GIL）
 
-            # 读取图片
-            image_path = self.oak_dir / frame_info['filename']
+        Args:
+            frame_info: 帧信息
+            image_path: 图片路径字符串
 
-            if not image_path.exists():
-                print(f"\n⚠ 图片不存在: {frame_info['filename']}")
-                # 添加空结果
-                results.append(self._create_empty_result(frame_info))
-                continue
+        Returns:
+            (frame_info, frame, error)，失败时 frame 为 None、error 为提示信息
+        """
+        frame = self._read_image(image_path)
+        if frame is None:
+            # 只在失败时区分原因，正常帧不额外stat
+            error = '无法读取图片' if os.path.exists(image_path) else '图片不存在'
+            return frame_info, None, error
+        return frame_info, frame, None
 
-            frame = cv2.imread(str(image_path))
-            if frame is None:
-                print(f"\n⚠ 无法读取图片: {frame_info['filename']}")
-                results.append(self._create_empty_result(frame_info))
-                continue
+    def _iter_decoded_frames(self, num_workers=None):
+        """按顺序产出解码后的帧，后台线程预取解码后续帧
 
-            # ArUco检测
-            try:
-                _, detection_results = self.aruco_detector.detect_markers(frame)
-                detection_info = self.aruco_detector.get_detection_info()
+        同时在途的帧数限制为 2*num_workers，控制内存占用。
+        """
+        if num_workers is None:
+            num_workers = os.cpu_count() or 4
+        max_pending = 2 * num_workers
 
-                # 添加帧信息
-                result = {
-                    'frame_num': frame_info['frame_num'],
-                    'filename': frame_info['filename'],
-                    'timestamp': frame_info['timestamp'],
-                    'frame_seq_num': frame_info.get('frame_seq_num', -1),
+        pending = collections.deque()
 
-                    # ArUco检测结果
-                    'left_detected': detection_info.get('left_marker') is not None,
-                    'right_detected': detection_info.get('right_marker') is not None,
+        with ThreadPoolExecutor(max_workers=num_workers) as executor:
+            for frame_info, image_path in zip(self.frames, self._paths):
+                pending.append(executor.submit(self._decode_worker, frame_info, image_path))
+                if len(pending) >= max_pending:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
 
-                    'marker_distance': detection_info.get('marker_distance'),  # 像素距离
-                    'real_distance_3d': detection_info.get('real_distance_3d'),  # 3D绝对距离 (mm)
-                    'horizontal_distance': detection_info.get('horizontal_distance'),  # 水平距离 (mm)
+    def _iter_frame_results(self, processes=1, chunksize=32):
+        """
+        按顺序产出 (result, error)
+
+        processes=1 时解码在线程池中预取、检测在当前线程；
+        processes>1 时读取+检测在进程池中进行（检测是CPU密集型，线程无法并行）。
+        """
+        if processes <= 1:
+            for frame_info, frame, error in self._iter_decoded_frames():
+                yield self._detect_frame(frame_info, frame, error)
+            return
 
-                    'left_marker': self._extract_marker_info(detection_info.get('left_marker')),
-                    'right_marker': self._extract_marker_info(detection_info.get('right_marker')),
+        initargs = (self.session_dir, self.config_file, self.decode_scale, self.use_opencl, self.rectify,
+                    self.camera_matrix, self.dist_coeffs, self.image_size)
+        with mp.Pool(processes, initializer=_worker_init, initargs=initargs) as pool:
+            yield from pool.imap(_detect_in_worker, zip(self.frames, self._paths), chunksize=chunksize)
 
-                    'calibrated': detection_info.get('calibrated', False),
-                }
+    def process_all_frames(self, processes=1):
+        """处理所有帧，返回完整结果列表"""
+        return list(self.iter_detections(processes))
 
-                results.append(result)
+    def iter_detections(self, processes=1):
+        """
+        逐帧产出检测结果
 
-            except Exception as e:
-                print(f"\n⚠ 检测失败 ({frame_info['filename']}): {e}")
-                results.append(self._create_empty_result(frame_info))
+        Args:
+            processes: 检测进程数（1为单进程，解码在线程池中预取）
+        """
+        print(f"\n开始处理 {self.total_frames} 帧...")
+
+        # 使用tqdm或简单进度显示
+        frame_results = self._iter_frame_results(processes)
+        if HAS_TQDM:
+            iterator = tqdm(frame_results, total=len(self.frames), desc="检测进度")
+        else:
+            iterator = frame_results
+            print("处理中...", end='', flush=True)
+
+        for i, (result, error) in enumerate(iterator):
+            # 简单进度显示（无tqdm时）
+            if not HAS_TQDM and i % 50 == 0:
+                print(f"\r处理中... {i}/{self.total_frames} ({i/self.total_frames*100:.1f}%)", end='', flush=True)
+
+            if error is not None:
+                print(f"\n⚠ {error}: {result['filename']}")
+
+            self._record_result(i, result)
+            yield result
 
         if not HAS_TQDM:
             print(f"\r处理中... {self.total_frames}/{self.total_frames} (100.0%)")
 
-        return results
+    def _detect_frame(self, frame_info, frame, error=None):
+        """
+        检测一帧（不写入SoA数组，可在工作进程中调用）
+
+        Returns:
+            (result, error)，解码或检测失败时 result 为空结果、error 为提示信息
+        """
+        if frame is None:
+            return self._create_empty_result(frame_info), error
+
+        # ArUco检测
+        try:
+            # 整帧去畸变（映射表固定，输出缓冲区复用；检测只在当前线程进行）
+            if self._rectify_maps is not None:
+                self._rectify_buf = cv2.remap(frame, *self._rectify_maps, cv2.INTER_LINEAR,
+                                              dst=self._rectify_buf)
+                frame = self._rectify_buf
+
+            # OpenCL模式下检测输入为UMat（标注图仍画在CPU帧上，结果不使用）
+            gray = cv2.UMat(frame) if self.use_opencl else None
+            self.aruco_detector.detect_markers(frame, gray=gray)
+            detection_info = self.aruco_detector.get_detection_info()
+
+            # 每个字段只查一次
+            left_marker = detection_info['left_marker']
+            right_marker = detection_info['right_marker']
+
+            # 添加帧信息
+            result = {
+                'frame_num': frame_info['frame_num'],
+                'filename': frame_info['filename'],
+                'timestamp': frame_info['timestamp'],
+                'frame_seq_num': frame_info['frame_seq_num'],
+
+                # ArUco检测结果
+                'left_detected': left_marker is not None,
+                'right_detected': right_marker is not None,
+
+                'marker_distance': self._to_full_res_distance(detection_info['marker_distance']),  # 像素距离
+                'real_distance_3d': detection_info['real_distance_3d'],  # 3D绝对距离 (mm)
+                'horizontal_distance': detection_info['horizontal_distance'],  # 水平距离 (mm)
+
+                'left_marker': self._extract_marker_info(left_marker),
+                'right_marker': self._extract_marker_info(right_marker),
+
+                'calibrated': detection_info['calibrated'],
+            }
+
+        except Exception as e:
+            return self._create_empty_result(frame_info), f"检测失败 ({e})"
+
+        return result, None
+
+    def _record_result(self, i, result):
+        """将第i帧的数值结果写入SoA数组和标记记录"""
+        if result['marker_distance'] is not None:
+            self.marker_distance[i] = result['marker_distance']
+        if result['real_distance_3d'] is not None:
+            self.real_distance_3d[i] = result['real_distance_3d']
+        if result['horizontal_distance'] is not None:
+            self.horizontal_distance[i] = result['horizontal_distance']
+
+        self._record_marker(self.left_markers[i], result['left_marker'])
+        self._record_marker(self.right_markers[i], result['right_marker'])
+
+    @staticmethod
+    def _record_marker(record, info):
+        """将标记信息写入一行记录（record为记录数组中该行的视图）"""
+        if info is None:
+            return
+        record['valid'] = True
+        if info['id'] is not None:
+            record['id'] = info['id']
+        if info['corners'] is not None:
+            record['corners'] = np.reshape(info['corners'], (4, 2))
+        if 'tvec' in info:
+            record['tvec'] = info['tvec']
+        if 'rvec' in info:
+            record['rvec'] = info['rvec']
 
     def _create_empty_result(self, frame_info):
         """创建空检测结果（未检测到标记）"""
@@ -193,7 +537,7 @@ class OfflineArUcoDetector:
             'frame_num': frame_info['frame_num'],
             'filename': frame_info['filename'],
             'timestamp': frame_info['timestamp'],
-            'frame_seq_num': frame_info.get('frame_seq_num', -1),
+            'frame_seq_num': frame_info['frame_seq_num'],
 
             'left_detected': False,
             'right_detected': False,
@@ -208,15 +552,27 @@ class OfflineArUcoDetector:
             'calibrated': False,
         }
 
+    def _to_full_res_distance(self, distance):
+        """缩小图上的像素距离换算回原分辨率"""
+        if distance is None or self.decode_scale == 1:
+            return distance
+        return distance * self.decode_scale
+
     def _extract_marker_info(self, marker):
         """提取标记信息"""
         if marker is None:
             return None
 
-        # 处理corners - 可能已经是list或numpy array
+        # 处理corners - 可能已经是list或numpy array（检测器返回类型固定，首次遇到时确定转换函数）
         corners = marker.get('corners')
         if corners is not None:
-            corners = corners.tolist() if isinstance(corners, np.ndarray) else corners
+            if self.decode_scale != 1:
+                # 像素中心对齐：x_full = (x + 0.5) * s - 0.5
+                corners = ((np.asarray(corners) + 0.5) * self.decode_scale - 0.5).tolist()
+            else:
+                if self._corners_to_list is None:
+                    self._corners_to_list = _list_converter(corners)
+                corners = self._corners_to_list(corners)
 
         info = {
             'id': marker.get('id'),
@@ -226,14 +582,90 @@ class OfflineArUcoDetector:
         # 如果有位姿估计
         if 'tvec' in marker and marker['tvec'] is not None:
             tvec = marker['tvec']
-            info['tvec'] = tvec.tolist() if isinstance(tvec, np.ndarray) else tvec
+            if self._pose_to_list is None:
+                self._pose_to_list = _list_converter(tvec)
+            info['tvec'] = self._pose_to_list(tvec)
 
             if 'rvec' in marker and marker['rvec'] is not None:
-                rvec = marker['rvec']
-                info['rvec'] = rvec.tolist() if isinstance(rvec, np.ndarray) else rvec
+                info['rvec'] = self._pose_to_list(marker['rvec'])
 
         return info
 
+    def _array_statistics(self):
+        """
+        从SoA数组向量化计算检测统计
+
+        Returns:
+            (left_count, right_count, both_count, valid_count, distance_summary)，
+            distance_summary 无有效距离时为空dict
+        """
+        left_detected = int(np.count_nonzero(self.left_detected))
+        right_detected = int(np.count_nonzero(self.right_detected))
+        both_detected = int(np.count_nonzero(self.left_detected & self.right_detected))
+        valid = self.real_distance_3d[~np.isnan(self.real_distance_3d)]
+        distance_summary = {}
+        if valid.size:
+            distance_summary = {
+                'mean': float(valid.mean()),
+                'std': float(valid.std()),
+                'min': float(valid.min()),
+                'max': float(valid.max()),
+                'median': float(np.median(valid)),
+            }
+        return left_detected, right_detected, both_detected, int(valid.size), distance_summary
+
+    def _build_summary(self, total, left_detected, right_detected, both_detected,
+                       valid_count, distance_summary, detections_file=None):
+        """
+        构建统计摘要dict（所有保存方式共用）
+
+        Args:
+            detections_file: 逐帧结果文件名，结果与摘要分文件保存时写入摘要
+        """
+        rate = (lambda n: n / total * 100) if total else (lambda n: 0.0)
+        summary = {
+            'session_name': self.session_dir.name,
+            'total_frames': total,
+            'oak_camera_dir': str(self.oak_dir.relative_to(self.session_dir)),
+        }
+        if detections_file is not None:
+            summary['detections_file'] = detections_file
+        summary['statistics'] = {
+            'left_detection_count': left_detected,
+            'left_detection_rate': rate(left_detected),
+            'right_detection_count': right_detected,
+            'right_detection_rate': rate(right_detected),
+            'both_detection_count': both_detected,
+            'both_detection_rate': rate(both_detected),
+            'valid_distance_measurements': valid_count,
+        }
+        # 距离统计
+        summary['distance_statistics'] = distance_summary
+        return summary
+
+    @staticmethod
+    def _print_summary(summary, output_path, summary_path=None):
+        """打印保存路径和统计摘要（所有保存方式共用）"""
+        total = summary['total_frames']
+        stats = summary['statistics']
+
+        print(f"\n✓ 检测结果已保存: {output_path}")
+        if summary_path is not None:
+            print(f"✓ 统计摘要已保存: {summary_path}")
+        print("\n统计信息:")
+        print(f"  总帧数: {total}")
+        for label, key in (('左标记', 'left'), ('右标记', 'right'), ('双标记', 'both')):
+            print(f"  {label}检测率: {stats[key + '_detection_count']}/{total} "
+                  f"({stats[key + '_detection_rate']:.1f}%)")
+        print(f"  有效距离测量: {stats['valid_distance_measurements']}")
+
+        dist_summary = summary['distance_statistics']
+        if dist_summary:
+            print("\n距离统计 (mm):")
+            print(f"  平均: {dist_summary['mean']:.2f}")
+            print(f"  标准差: {dist_summary['std']:.2f}")
+            print(f"  范围: {dist_summary['min']:.2f} - {dist_summary['max']:.2f}")
+
     def save_results(self, results, output_filename="aruco_detections_offline.json"):
         """
         保存检测结果
@@ -244,68 +676,192 @@ class OfflineArUcoDetector:
         """
         output_path = self.oak_dir / output_filename
 
-        # 计算统计信息
-        left_detected = sum(1 for r in results if r['left_detected'])
-        right_detected = sum(1 for r in results if r['right_detected'])
-        both_detected = sum(1 for r in results if r['left_detected'] and r['right_detected'])
+        # 计算统计信息（results由iter_detections产出，数值已记录在SoA数组中）
+        left_detected, right_detected, both_detected, valid_count, distance_summary = \
+            self._array_statistics()
 
-        # 计算有效距离测量
-        valid_distances = [r['real_distance_3d'] for r in results
-                          if r['real_distance_3d'] is not None]
+        summary = self._build_summary(len(results), left_detected, right_detected, both_detected,
+                                      valid_count, distance_summary)
+        output_data = dict(summary, detections=results)
 
-        output_data = {
-            'session_name': self.session_dir.name,
-            'total_frames': len(results),
-            'oak_camera_dir': str(self.oak_dir.relative_to(self.session_dir)),
+        # 保存JSON
+        data = None
+        if HAS_ORJSON:
+            try:
+                data = orjson.dumps(output_data, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY)
+            except TypeError:
+                data = None  # 含orjson不支持的类型，退回标准库
+        if data is not None:
+            with open(output_path, 'wb') as f:
+                f.write(data)
+        else:
+            with open(output_path, 'w') as f:
+                json.dump(output_data, f, indent=2)
 
-            'statistics': {
-                'left_detection_count': left_detected,
-                'left_detection_rate': left_detected / len(results) * 100,
-                'right_detection_count': right_detected,
-                'right_detection_rate': right_detected / len(results) * 100,
-                'both_detection_count': both_detected,
-                'both_detection_rate': both_detected / len(results) * 100,
-                'valid_distance_measurements': len(valid_distances),
-            },
+        self._print_summary(summary, output_path)
 
-            'distance_statistics': {},
+        return output_path
 
-            'detections': results
-        }
+    def verify_distances(self, tolerance_mm=0.1):
+        """
+        用批量内核从记录的tvec重新计算距离，与逐帧结果交叉核对
 
-        # 距离统计
-        if valid_distances:
-            output_data['distance_statistics'] = {
-                'mean': float(np.mean(valid_distances)),
-                'std': float(np.std(valid_distances)),
-                'min': float(np.min(valid_distances)),
-                'max': float(np.max(valid_distances)),
-                'median': float(np.median(valid_distances)),
-            }
+        Returns:
+            不一致的帧索引数组
+        """
+        dist_abs, dist_hor = batch_distances(self.left_tvec, self.right_tvec)
+        valid = ~np.isnan(self.real_distance_3d)
+        mismatch = valid & ((np.abs(dist_abs - self.real_distance_3d) > tolerance_mm) |
+                            (np.abs(dist_hor - self.horizontal_distance) > tolerance_mm))
+        return np.flatnonzero(mismatch)
 
-        # 保存JSON
-        with open(output_path, 'w') as f:
-            json.dump(output_data, f, indent=2)
+    def save_results_streaming(self, output_filename="aruco_detections_offline.ndjson", processes=1):
+        """
+        边检测边写出结果（NDJSON，每行一帧），不在内存中保留完整结果列表
 
-        print(f"\n✓ 检测结果已保存: {output_path}")
-        print(f"\n统计信息:")
-        print(f"  总帧数: {len(results)}")
-        print(f"  左标记检测率: {left_detected}/{len(results)} ({left_detected/len(results)*100:.1f}%)")
-        print(f"  右标记检测率: {right_detected}/{len(results)} ({right_detected/len(results)*100:.1f}%)")
-        print(f"  双标记检测率: {both_detected}/{len(results)} ({both_detected/len(results)*100:.1f}%)")
-        print(f"  有效距离测量: {len(valid_distances)}")
-
-        if valid_distances:
-            print(f"\n距离统计 (mm):")
-            print(f"  平均: {np.mean(valid_distances):.2f}")
-            print(f"  标准差: {np.std(valid_distances):.2f}")
-            print(f"  范围: {np.min(valid_distances):.2f} - {np.max(valid_distances):.2f}")
+        统计信息在检测过程中在线累加，最后写入 <文件名>_summary.json。
+
+        Args:
+            output_filename: 输出文件名
+            processes: 检测进程数
+
+        Returns:
+            输出文件路径
+        """
+        output_path = self.oak_dir / output_filename
+        summary_path = output_path.with_name(output_path.stem + '_summary.json')
+
+        total = left_detected = right_detected = both_detected = 0
+        dist_stats = DistanceStats(capacity=self.total_frames)
+
+        with open(output_path, 'wb') as f:
+            for r in self.iter_detections(processes):
+                f.write(_dump_json_bytes(r))
+                f.write(b'\n')
+
+                total += 1
+                left = r['left_detected']
+                right = r['right_detected']
+                left_detected += left
+                right_detected += right
+                both_detected += left and right
+                if r['real_distance_3d'] is not None:
+                    dist_stats.add(r['real_distance_3d'])
+
+        summary = self._build_summary(total, left_detected, right_detected, both_detected,
+                                      dist_stats.count, dist_stats.summary(),
+                                      detections_file=output_path.name)
+
+        with open(summary_path, 'wb') as f:
+            f.write(_dump_json_bytes(summary, indent=True))
+
+        self._print_summary(summary, output_path, summary_path)
 
         return output_path
 
+    def save_results_npz(self, output_filename="aruco_detections_offline.npz", processes=1):
+        """
+        检测并以列式npz保存结果（每列一个数组，一行一帧），不构建逐帧字典列表
+
+        缺失的检测用NaN表示；统计摘要写入 <文件名>_summary.json。
+        读取: np.load(path)['real_distance_3d'] 等。
+
+        Args:
+            output_filename: 输出文件名
+            processes: 检测进程数
+
+        Returns:
+            输出文件路径
+        """
+        output_path = self.oak_dir / output_filename
+        summary_path = output_path.with_name(output_path.stem + '_summary.json')
+
+        for _ in self.iter_detections(processes):
+            pass
+
+        np.savez_compressed(
+            output_path,
+            frame_num=np.array([f['frame_num'] for f in self.frames], dtype=np.int64),
+            timestamp=np.array([f['timestamp'] for f in self.frames], dtype=np.float64),
+            frame_seq_num=self.frame_seq_nums,
+            left_detected=self.left_detected,
+            right_detected=self.right_detected,
+            marker_distance=self.marker_distance,
+            real_distance_3d=self.real_distance_3d,
+            horizontal_distance=self.horizontal_distance,
+            left_id=self.left_markers['id'],
+            right_id=self.right_markers['id'],
+            left_tvec=self.left_tvec,
+            right_tvec=self.right_tvec,
+            left_rvec=self.left_markers['rvec'],
+            right_rvec=self.right_markers['rvec'],
+            left_corners=self.left_corners,
+            right_corners=self.right_corners,
+        )
+
+        total = len(self.frames)
+        left_detected, right_detected, both_detected, valid_count, distance_summary = \
+            self._array_statistics()
+
+        summary = self._build_summary(total, left_detected, right_detected, both_detected,
+                                      valid_count, distance_summary,
+                                      detections_file=output_path.name)
+
+        with open(summary_path, 'wb') as f:
+            f.write(_dump_json_bytes(summary, indent=True))
+
+        self._print_summary(summary, output_path, summary_path)
+
+        return output_path
+
+
+def _identity(value):
+    return value
+
+
+def _ndarray_to_list(value):
+    return value.tolist()
+
+
+def _list_converter(sample):
+    """按样本类型返回转为list的函数（ndarray用tolist，list原样返回）"""
+    return _ndarray_to_list if isinstance(sample, np.ndarray) else _identity
+
+
+def _dump_json_bytes(obj, indent=False):
+    """序列化为JSON字节（优先orjson）"""
+    if HAS_ORJSON:
+        try:
+            option = orjson.OPT_SERIALIZE_NUMPY | (orjson.OPT_INDENT_2 if indent else 0)
+            return orjson.dumps(obj, option=option)
+        except TypeError:
+            pass  # 含orjson不支持的类型，退回标准库
+    return json.dumps(obj, indent=2 if indent else None).encode('utf-8')
+
 
 def main():
-    if len(sys.argv) < 2:
+    parser = argparse.ArgumentParser(description='离线ArUco标记检测')
+    parser.add_argument('session_dir', nargs='?', default=None,
+                        help='session目录（默认使用data下最新的session）')
+    parser.add_argument('--stream', action='store_true',
+                        help='边检测边写出NDJSON结果（内存占用恒定），统计写入 *_summary.json')
+    parser.add_argument('--npz', action='store_true',
+                        help='以列式压缩npz保存结果（体积小、加载快），统计写入 *_summary.json')
+    parser.add_argument('-j', '--workers', type=int, default=1,
+                        help='检测进程数（默认: 1，单进程）')
+    parser.add_argument('--opencl', action='store_true',
+                        help='使用OpenCL（cv2.UMat）执行检测中的图像运算')
+    parser.add_argument('--rectify', action='store_true',
+                        help='有标定时先对整帧去畸变再检测（角点为去畸变图像坐标）')
+    parser.add_argument('--decode-scale', type=int, default=1, choices=sorted(IMREAD_GRAY_FLAGS),
+                        help='解码缩小倍数，>1 时更快（默认: 1）')
+    parser.add_argument('--verify-distances', action='store_true',
+                        help='检测后用批量内核从tvec重新计算距离，与逐帧结果交叉核对')
+    args = parser.parse_args()
+    if args.npz and args.stream:
+        parser.error('--npz 与 --stream 不能同时使用')
+
+    if args.session_dir is None:
         print("用法: python offline_aruco_detection.py <session_dir>")
         print("\n示例:")
         print("  python offline_aruco_detection.py data/session_20251027_192209")
@@ -314,10 +870,8 @@ def main():
         # 查找最新session
         data_dir = Path("./data")
         if data_dir.exists():
-            sessions = sorted(data_dir.glob("session_*"),
-                            key=lambda x: x.stat().st_mtime, reverse=True)
-            if sessions:
-                session_dir = sessions[0]
+            session_dir = find_latest_session(data_dir)
+            if session_dir is not None:
                 print(f"  使用最新session: {session_dir.name}")
             else:
                 print("  未找到任何session")
@@ -326,7 +880,7 @@ def main():
             print("  data目录不存在")
             sys.exit(1)
     else:
-        session_dir = sys.argv[1]
+        session_dir = args.session_dir
 
     session_dir = Path(session_dir)
 
@@ -340,13 +894,29 @@ def main():
 
     try:
         # 初始化检测器
-        detector = OfflineArUcoDetector(session_dir)
+        detector = OfflineArUcoDetector(session_dir, decode_scale=args.decode_scale,
+                                        use_opencl=args.opencl, rectify=args.rectify)
+
+        if args.npz:
+            # 列式npz保存
+            output_path = detector.save_results_npz(processes=args.workers)
+        elif args.stream:
+            # 边检测边保存
+            output_path = detector.save_results_streaming(processes=args.workers)
+        else:
+            # 处理所有帧
+            results = detector.process_all_frames(processes=args.workers)
 
-        # 处理所有帧
-        results = detector.process_all_frames()
+            # 保存结果
+            output_path = detector.save_results(results)
 
-        # 保存结果
-        output_path = detector.save_results(results)
+        # 用批量内核交叉核对逐帧距离（可选，仅用于排查）
+        if args.verify_distances:
+            mismatches = detector.verify_distances()
+            if mismatches.size:
+                print(f"\n⚠ {mismatches.size} 帧的距离与tvec重新计算结果不一致（首帧: {mismatches[0]}）")
+            else:
+                print("\n✓ 逐帧距离与tvec重新计算结果一致")
 
         print(f"\n{'='*80}")
         print("✓ 检测完成！")
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+PKL头信息读取
+只重建aligned_data.pkl中的元数据和数组形状/类型，不构造numpy数组，
+峰值内存为单个数组大小而不是整个数据集
+"""
+
+import pickle
+
+from pkl_io import open_pkl
+
+
+class ArrayStub:
+    """numpy数组的占位对象，只保留shape和dtype"""
+
+    def __init__(self, shape=(), dtype=None):
+        self.shape = tuple(shape)
+        self.dtype = dtype
+
+    def __setstate__(self, state):
+        # ndarray.__reduce__ 的状态: (version, shape, dtype, is_fortran, rawdata)
+        self.shape = tuple(state[1])
+        self.dtype = state[2]
+
+    def __len__(self):
+        return self.shape[0] if self.shape else 0
+
+    def __repr__(self):
+        return f"<array shape={self.shape} dtype={self.dtype}>"
+
+
+def _reconstruct_stub(cls, shape, dtype):
+    """替代 numpy multiarray._reconstruct（protocol <= 4）"""
+    return ArrayStub()
+
+
+def _frombuffer_stub(buf, dtype, shape, order):
+    """替代 numpy numeric._frombuffer（protocol 5），数据缓冲区直接丢弃"""
+    return ArrayStub(shape, dtype)
+
+
+# 数组重建函数 -> 占位实现（numpy 1.x 为 numpy.core，2.x 为 numpy._core）
+_ARRAY_STUBS = {
+    (module, name): stub
+    for core in ('numpy.core', 'numpy._core')
+    for module, name, stub in (
+        (f'{core}.multiarray', '_reconstruct', _reconstruct_stub),
+        (f'{core}.numeric', '_frombuffer', _frombuffer_stub),
+    )
+}
+
+
+class _HeaderUnpickler(pickle.Unpickler):
+    """把numpy数组重建替换为ArrayStub的Unpickler"""
+
+    def find_class(self, module, name):
+        stub = _ARRAY_STUBS.get((module, name))
+        if stub is not None:
+            return stub
+        return super().find_class(module, name)
+
+
+def load_pkl_header(pkl_path):
+    """
+    读取PKL，numpy数组以ArrayStub代替
+
+    文件仍需顺序读取一遍（pickle无法跳过），但每个数组的数据读出后立即丢弃。
+    Zstd压缩的PKL边读边解压。
+
+    Args:
+        pkl_path: PKL文件路径
+
+    Returns:
+        与 pickle.load 相同结构的对象，其中ndarray为ArrayStub
+    """
+    with open_pkl(pkl_path) as f:
+        return _HeaderUnpickler(f).load()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+aligned_data.pkl 读写
+可选Zstandard压缩（level 3，多线程）；读取时按文件头魔数自动识别，
+未压缩的文件照常读取
+"""
+
+import io
+import pickle
+from contextlib import contextmanager
+
+# 尝试导入zstandard（压缩PKL），没有则只能读写未压缩的PKL
+try:
+    import zstandard as zstd
+    HAS_ZSTD = True
+except ImportError:
+    HAS_ZSTD = False
+
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+ZSTD_LEVEL = 3
+
+# PKL中ArUco浮点数组的存储类型（numpy dtype名，可直接传给astype）；
+# dtype_version记录在metadata['aruco']中（旧文件无此字段，为float64）。
+# 录制端 src/data/pkl_saver.py 使用相同的取值，修改时需同步
+ARUCO_FLOAT_DTYPE = 'float32'
+ARUCO_DTYPE_VERSION = 2
+
+
+def is_compressed_pkl(pkl_path):
+    """PKL文件是否为Zstd压缩"""
+    with open(pkl_path, 'rb') as f:
+        return f.read(len(ZSTD_MAGIC)) == ZSTD_MAGIC
+
+
+@contextmanager
+def open_pkl(pkl_path):
+    """
+    以二进制流打开PKL（压缩文件边读边解压），可直接传给 pickle.load / Unpickler
+
+    Raises:
+        RuntimeError: 文件为Zstd压缩但未安装zstandard
+    """
+    with open(pkl_path, 'rb') as f:
+        if f.read(len(ZSTD_MAGIC)) != ZSTD_MAGIC:
+            f.seek(0)
+            yield f
+            return
+
+        if not HAS_ZSTD:
+            raise RuntimeError(f"{pkl_path} 为Zstd压缩，请安装zstandard: pip install zstandard")
+        f.seek(0)
+        with zstd.ZstdDecompressor().stream_reader(f) as reader:
+            yield io.BufferedReader(reader)
+
+
+def load_pkl(pkl_path):
+    """读取PKL（自动识别是否压缩）"""
+    with open_pkl(pkl_path) as f:
+        return pickle.load(f)
+
+
+def dump_pkl(data, pkl_path, compress=False):
+    """
+    写入PKL
+
+    Args:
+        data: 要保存的对象
+        pkl_path: PKL文件路径
+        compress: 是否使用Zstd压缩（需要zstandard）
+
+    Raises:
+        RuntimeError: compress=True 但未安装zstandard
+    """
+    if not compress:
+        with open(pkl_path, 'wb') as f:
+            pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+        return
+
+    if not HAS_ZSTD:
+        raise RuntimeError("压缩PKL需要zstandard: pip install zstandard")
+    cctx = zstd.ZstdCompressor(level=ZSTD_LEVEL, threads=-1)
+    with open(pkl_path, 'wb') as f:
+        with cctx.stream_writer(f, closefd=False) as writer:
+            pickle.dump(data, writer, protocol=pickle.HIGHEST_PROTOCOL)
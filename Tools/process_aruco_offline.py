@@ -14,7 +14,6 @@
 import os
 import sys
 import json
-import pickle
 import cv2
 import numpy as np
 from pathlib import Path
@@ -30,11 +29,19 @@ except ImportError:
     HAS_TQDM = False
     print("提示: 安装tqdm可获得更好的进度显示 (pip install tqdm)")
 
+# 尝试导入orjson（逐帧检测结果较大，序列化更快），没有则使用标准库json
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
 # 添加项目路径 - 脚本在Tools目录，需要向上一级到项目根目录
 project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root / 'src'))
 
 from vision.aruco_detector_optimized import ArUcoDetectorOptimized
+from pkl_io import load_pkl, dump_pkl, is_compressed_pkl, ARUCO_FLOAT_DTYPE, ARUCO_DTYPE_VERSION
 
 
 class OfflineArUcoProcessor:
@@ -153,7 +160,8 @@ class OfflineArUcoProcessor:
                 results.append(self._create_empty_result(frame_info))
                 continue
 
-            frame = cv2.imread(str(image_path))
+            # 直接解码为灰度图（检测只用灰度，省去检测器内部的cvtColor）
+            frame = cv2.imread(str(image_path), cv2.IMREAD_GRAYSCALE)
             if frame is None:
                 print(f"\n⚠ 无法读取图片: {frame_info['filename']}")
                 results.append(self._create_empty_result(frame_info))
@@ -296,8 +304,19 @@ class OfflineArUcoProcessor:
             }
 
         # 保存JSON
-        with open(output_path, 'w') as f:
-            json.dump(output_data, f, indent=2)
+        data = None
+        if HAS_ORJSON:
+            try:
+                data = orjson.dumps(output_data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS
+                                    | orjson.OPT_SERIALIZE_NUMPY)
+            except TypeError:
+                data = None  # 含orjson不支持的类型，退回标准库
+        if data is not None:
+            with open(output_path, 'wb') as f:
+                f.write(data)
+        else:
+            with open(output_path, 'w') as f:
+                json.dump(output_data, f, indent=2)
 
         print(f"\n✓ 检测结果已保存: {output_path}")
         print(f"\n检测统计:")
@@ -315,12 +334,13 @@ class OfflineArUcoProcessor:
 
         return output_path, output_data
 
-    def update_pkl(self, detection_results):
+    def update_pkl(self, detection_results, compress=None):
         """
         使用检测结果更新PKL文件
 
         Args:
             detection_results: 检测结果列表（来自detect_all_frames）
+            compress: 是否Zstd压缩保存；None表示沿用现有PKL的格式（新建时不压缩）
 
         Returns:
             是否更新成功
@@ -332,8 +352,9 @@ class OfflineArUcoProcessor:
         # 读取或创建PKL文件
         if pkl_path.exists():
             print(f"✓ 找到现有PKL文件")
-            with open(pkl_path, 'rb') as f:
-                pkl_data = pickle.load(f)
+            if compress is None:
+                compress = is_compressed_pkl(pkl_path)
+            pkl_data = load_pkl(pkl_path)
         else:
             print(f"✓ 创建新的PKL文件")
             # 创建基础结构
@@ -352,50 +373,36 @@ class OfflineArUcoProcessor:
                 'data': {}
             }
 
-        # 构建ArUco数据数组
-        timestamps = []
-        frame_seq_nums = []
-        left_detected = []
-        right_detected = []
-        distance_absolute = []
-        distance_horizontal = []
-        distance_pixel = []
-        left_positions = []
-        right_positions = []
-
-        for det in detection_results:
-            timestamps.append(det['timestamp'])
-            frame_seq_nums.append(det.get('frame_seq_num', -1))
-
-            left_detected.append(det['left_detected'])
-            right_detected.append(det['right_detected'])
-
-            # 距离数据（使用None/NaN表示缺失）
-            distance_absolute.append(det['real_distance_3d'] if det['real_distance_3d'] is not None else np.nan)
-            distance_horizontal.append(det['horizontal_distance'] if det['horizontal_distance'] is not None else np.nan)
-            distance_pixel.append(det['marker_distance'] if det['marker_distance'] is not None else np.nan)
-
-            # 3D位置
-            if det['left_marker'] and 'tvec' in det['left_marker']:
-                left_positions.append(det['left_marker']['tvec'])
-            else:
-                left_positions.append([np.nan, np.nan, np.nan])
-
-            if det['right_marker'] and 'tvec' in det['right_marker']:
-                right_positions.append(det['right_marker']['tvec'])
-            else:
-                right_positions.append([np.nan, np.nan, np.nan])
-
-        # 转换为numpy数组
-        timestamps = np.array(timestamps)
-        frame_seq_nums = np.array(frame_seq_nums)
-        left_detected = np.array(left_detected, dtype=bool)
-        right_detected = np.array(right_detected, dtype=bool)
-        distance_absolute = np.array(distance_absolute)
-        distance_horizontal = np.array(distance_horizontal)
-        distance_pixel = np.array(distance_pixel)
-        left_positions = np.array(left_positions)
-        right_positions = np.array(right_positions)
+        # 构建ArUco数据数组（直接写入预分配的数组，不经过中间list）
+        n = len(detection_results)
+        timestamps = np.fromiter((det['timestamp'] for det in detection_results),
+                                 dtype=np.float64, count=n)
+        frame_seq_nums = np.fromiter((det.get('frame_seq_num', -1) for det in detection_results),
+                                     dtype=np.int64, count=n)
+        left_detected = np.fromiter((det['left_detected'] for det in detection_results),
+                                    dtype=bool, count=n)
+        right_detected = np.fromiter((det['right_detected'] for det in detection_results),
+                                     dtype=bool, count=n)
+
+        # 距离数据（使用NaN表示缺失）
+        def distance_column(key):
+            return np.fromiter((np.nan if det[key] is None else det[key] for det in detection_results),
+                               dtype=np.float64, count=n)
+
+        distance_absolute = distance_column('real_distance_3d')
+        distance_horizontal = distance_column('horizontal_distance')
+        distance_pixel = distance_column('marker_distance')
+
+        # 3D位置：预填NaN，只写入检测到的帧
+        left_positions = np.full((n, 3), np.nan)
+        right_positions = np.full((n, 3), np.nan)
+        for i, det in enumerate(detection_results):
+            marker = det['left_marker']
+            if marker and 'tvec' in marker:
+                left_positions[i] = marker['tvec']
+            marker = det['right_marker']
+            if marker and 'tvec' in marker:
+                right_positions[i] = marker['tvec']
 
         # 计算统计信息
         valid_abs = ~np.isnan(distance_absolute)
@@ -411,6 +418,12 @@ class OfflineArUcoProcessor:
                 'max_distance': float(np.nanmax(distance_absolute))
             }
 
+        # 存储精度: 距离和位置用float32（位姿精度约1mm，float32足够），体积减半
+        float_arrays = (distance_absolute, distance_horizontal, distance_pixel, left_positions, right_positions)
+        (distance_absolute, distance_horizontal, distance_pixel,
+         left_positions, right_positions) = (a.astype(ARUCO_FLOAT_DTYPE) for a in float_arrays)
+        pkl_data['metadata'].setdefault('aruco', {})['dtype_version'] = ARUCO_DTYPE_VERSION
+
         # 更新PKL数据
         pkl_data['data']['timestamps'] = timestamps
         pkl_data['data']['frame_seq_nums'] = frame_seq_nums
@@ -433,8 +446,7 @@ class OfflineArUcoProcessor:
         }
 
         # 保存PKL
-        with open(pkl_path, 'wb') as f:
-            pickle.dump(pkl_data, f, protocol=pickle.HIGHEST_PROTOCOL)
+        dump_pkl(pkl_data, pkl_path, compress=bool(compress))
 
         print(f"✓ PKL文件已更新: {pkl_path}")
         print(f"\nPKL内容:")
@@ -476,6 +488,8 @@ def main():
                        help='仅进行检测，不更新PKL文件')
     parser.add_argument('--config', default=None,
                        help='ArUco配置文件路径 (默认: config/settings.json)')
+    parser.add_argument('--compress', action='store_true',
+                       help='使用Zstd压缩保存PKL（需要zstandard；默认沿用现有PKL的格式）')
 
     args = parser.parse_args()
 
@@ -524,7 +538,7 @@ def main():
             print(f"\n{'='*80}")
             print("步骤 2/2: 更新PKL文件")
             print(f"{'='*80}")
-            processor.update_pkl(detection_results)
+            processor.update_pkl(detection_results, compress=args.compress or None)
 
         # 完成
         print(f"\n{'='*80}")
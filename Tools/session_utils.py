@@ -0,0 +1,20 @@
+#!/usr/bin/env python3
+"""
+录制Session目录工具
+只依赖标准库，供检测、检查等脚本共用
+"""
+
+import os
+from pathlib import Path
+
+
+def find_latest_session(data_dir):
+    """返回data目录下最新（mtime最大）的session目录，没有则返回None
+
+    一次scandir遍历，DirEntry.stat()带缓存，只为选中的目录构造Path。
+    """
+    with os.scandir(data_dir) as it:
+        entries = [e for e in it if e.name.startswith('session_') and e.is_dir(follow_symlinks=False)]
+    if not entries:
+        return None
+    return Path(max(entries, key=lambda e: e.stat().st_mtime).path)
@@ -11,6 +11,9 @@ from pathlib import Path
 project_root = Path(__file__).parent.parent
 assets_dir = project_root / "Assets" / "Potac-Voice"
 
+# 相邻音频之间插入的静音间隔（秒）
+CLIP_GAP_SECONDS = 0.3
+
 def test_pygame():
     """使用pygame播放音频"""
     try:
@@ -26,19 +29,26 @@ def test_pygame():
         for i, audio_file in enumerate(audio_files, 1):
             print(f"  {i}. {audio_file.name}")
 
-        # 逐个播放
-        print("\n开始播放测试...")
-        for i, audio_file in enumerate(audio_files, 1):
-            print(f"\n[{i}/{len(audio_files)}] 正在播放: {audio_file.name}")
-
-            pygame.mixer.music.load(str(audio_file))
-            pygame.mixer.music.play()
-
-            # 等待播放完成
-            while pygame.mixer.music.get_busy():
-                pygame.time.Clock().tick(10)
+        # 预先解码全部音频，在同一个声道上排队连续播放，音频之间没有加载间隙
+        sounds = [pygame.mixer.Sound(str(audio_file)) for audio_file in audio_files]
+        channel = pygame.mixer.Channel(0)
+        clock = pygame.time.Clock()
 
-            print("  ✓ 播放完成")
+        print("\n开始播放测试...")
+        for i, (audio_file, sound) in enumerate(zip(audio_files, sounds), 1):
+            if i == 1:
+                channel.play(sound)
+            else:
+                # 等上一段开始播放（队列空出）后再排入下一段
+                while channel.get_queue() is not None:
+                    clock.tick(100)
+                channel.queue(sound)
+            print(f"\n[{i}/{len(audio_files)}] 已加入播放: {audio_file.name}")
+
+        # 等待全部播放完成
+        while channel.get_busy():
+            clock.tick(10)
+        print("  ✓ 播放完成")
 
         pygame.mixer.quit()
         print("\n✓ 所有音频测试完成！")
@@ -55,6 +65,7 @@ def test_pygame():
 def test_sounddevice():
     """使用sounddevice播放音频"""
     try:
+        import numpy as np
         import sounddevice as sd
         import soundfile as sf
 
@@ -67,20 +78,45 @@ def test_sounddevice():
         for i, audio_file in enumerate(audio_files, 1):
             print(f"  {i}. {audio_file.name}")
 
-        # 逐个播放
-        print("\n开始播放测试...")
-        for i, audio_file in enumerate(audio_files, 1):
-            print(f"\n[{i}/{len(audio_files)}] 正在播放: {audio_file.name}")
-
-            # 读取音频文件
-            data, samplerate = sf.read(str(audio_file))
-
-            # 播放
-            sd.play(data, samplerate)
-            sd.wait()  # 等待播放完成
-
-            print("  ✓ 播放完成")
+        # 预先解码全部音频（语音素材很小），播放循环中不再有文件I/O
+        clips = [sf.read(str(audio_file), dtype='float32', always_2d=True)
+                 for audio_file in audio_files]
 
+        # 逐个播放，复用同一个输出流，避免每次播放都重新打开音频设备；
+        # 音频之间写入静音而不是等待，整个测试耗时即音频总时长
+        print("\n开始播放测试...")
+        stream = None
+        underflows = 0
+        try:
+            for i, (audio_file, (data, samplerate)) in enumerate(zip(audio_files, clips), 1):
+                print(f"\n[{i}/{len(audio_files)}] 正在播放: {audio_file.name}")
+
+                channels = data.shape[1]
+                if stream is None or stream.samplerate != samplerate or stream.channels != channels:
+                    # 采样率或声道数变化时才重新打开
+                    if stream is not None:
+                        stream.close()
+                    stream = sd.OutputStream(samplerate=samplerate, channels=channels,
+                                             dtype='float32', blocksize=1024)
+                    stream.start()
+
+                # 阻塞写入，直到数据全部送入设备缓冲区；返回值表示是否发生欠载
+                underflowed = stream.write(data)
+                underflowed |= stream.write(
+                    np.zeros((int(samplerate * CLIP_GAP_SECONDS), channels), dtype=np.float32))
+
+                if underflowed:
+                    underflows += 1
+                    print("  ⚠ 播放完成，但输出发生欠载（underflow）")
+                else:
+                    print("  ✓ 播放完成")
+        finally:
+            if stream is not None:
+                stream.stop()  # 等待缓冲区中剩余音频播放完
+                stream.close()
+
+        if underflows:
+            print(f"\n⚠ {underflows}/{len(audio_files)} 个音频播放时发生欠载")
         print("\n✓ 所有音频测试完成！")
         return True
 
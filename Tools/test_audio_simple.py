@@ -6,6 +6,7 @@
 
 import subprocess
 import sys
+import wave
 from pathlib import Path
 
 # 音频目录
@@ -64,6 +65,64 @@ def play_audio_ffplay(audio_file):
         return False
 
 
+# 原始PCM播放命令（从stdin读取），按采样位宽选择格式
+RAW_PCM_FORMATS = {
+    'aplay': {1: 'U8', 2: 'S16_LE', 3: 'S24_3LE', 4: 'S32_LE'},
+    'paplay': {1: 'u8', 2: 's16le', 3: 's24le', 4: 's32le'},
+}
+
+
+def raw_player_command(player, channels, sample_width, rate):
+    """构造从stdin播放原始PCM的命令"""
+    fmt = RAW_PCM_FORMATS[player][sample_width]
+    if player == 'aplay':
+        return ['aplay', '-q', '-t', 'raw', '-f', fmt, '-r', str(rate), '-c', str(channels)]
+    return ['paplay', '--raw', f'--format={fmt}', f'--rate={rate}', f'--channels={channels}']
+
+
+def read_wav_pcm(audio_file):
+    """读取wav文件的PCM数据，返回 ((channels, sample_width, rate), pcm_bytes)"""
+    with wave.open(str(audio_file), 'rb') as wf:
+        params = (wf.getnchannels(), wf.getsampwidth(), wf.getframerate())
+        return params, wf.readframes(wf.getnframes())
+
+
+class PcmStreamPlayer:
+    """
+    常驻的aplay/paplay进程，多个文件的PCM数据依次写入同一个stdin
+
+    避免每个文件都创建一次进程并重新连接音频服务；
+    音频参数（声道/位宽/采样率）变化时才重启进程。
+    """
+
+    def __init__(self, player):
+        self.player = player
+        self.proc = None
+        self.params = None
+
+    def write(self, params, pcm):
+        if params != self.params:
+            self.close()
+            channels, sample_width, rate = params
+            self.proc = subprocess.Popen(
+                raw_player_command(self.player, channels, sample_width, rate),
+                stdin=subprocess.PIPE
+            )
+            self.params = params
+        self.proc.stdin.write(pcm)
+
+    def close(self):
+        """关闭stdin并等待剩余音频播放完成"""
+        if self.proc is not None:
+            try:
+                self.proc.stdin.close()
+            except OSError:
+                pass  # 播放进程已退出
+            self.proc.wait()
+            self.proc = None
+            self.params = None
+
+
 def main():
     print("="*70)
     print("语音素材播放测试（使用系统工具）")
@@ -126,13 +185,41 @@ def main():
     print("开始播放测试...")
     print("="*70)
 
-    for i, audio_file in enumerate(audio_files, 1):
-        print(f"\n[{i}/{len(audio_files)}] 正在播放: {audio_file.name}")
+    # aplay/paplay: 所有文件的PCM写入同一个播放进程
+    stream_player = None
+    if play_func is play_audio_aplay:
+        stream_player = PcmStreamPlayer('aplay')
+    elif play_func is play_audio_paplay:
+        stream_player = PcmStreamPlayer('paplay')
 
-        if play_func(audio_file):
-            print("  ✓ 播放完成")
-        else:
-            print("  ✗ 播放失败")
+    try:
+        for i, audio_file in enumerate(audio_files, 1):
+            print(f"\n[{i}/{len(audio_files)}] 正在播放: {audio_file.name}")
+
+            if stream_player is not None:
+                try:
+                    params, pcm = read_wav_pcm(audio_file)
+                except (wave.Error, EOFError):
+                    params = None  # 非PCM编码的wav，单独播放
+                if params is not None and params[1] in RAW_PCM_FORMATS[stream_player.player]:
+                    try:
+                        stream_player.write(params, pcm)
+                        print("  ✓ 已送入播放器")
+                    except OSError as e:
+                        print(f"  ✗ 播放失败: {e}")
+                        stream_player.close()
+                    continue
+
+                # 单独播放前先等待已送入的音频播放完，避免重叠
+                stream_player.close()
+
+            if play_func(audio_file):
+                print("  ✓ 播放完成")
+            else:
+                print("  ✗ 播放失败")
+    finally:
+        if stream_player is not None:
+            stream_player.close()
 
     print("\n" + "="*70)
     print("✓ 所有音频测试完成！")
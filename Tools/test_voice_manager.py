@@ -123,18 +123,80 @@ def test_individual_prompts():
         time.sleep(0.5)
 
 
+def test_playback_latency():
+    """
+    对比播放开销：VoiceManager（每次播放启动playsound） vs 预加载PCM + 常驻sounddevice输出流
+
+    开销 = 阻塞播放总耗时 - 音频时长
+    """
+    try:
+        import sounddevice as sd
+        import soundfile as sf
+    except ImportError:
+        print("sounddevice或soundfile未安装，无法进行对比测试")
+        print("  pip install sounddevice soundfile")
+        return
+
+    voice_manager = VoiceManager()
+
+    if not voice_manager.enabled:
+        print("VoiceManager未启用")
+        return
+
+    # 预加载全部语音提示: key -> (data, samplerate)
+    cache = {}
+    for key, filename in voice_manager.voice_files.items():
+        audio_file = voice_manager.assets_dir / filename
+        if audio_file.exists():
+            cache[key] = sf.read(str(audio_file), dtype='float32', always_2d=True)
+
+    if not cache:
+        print("没有可用的语音文件")
+        return
+
+    samplerate = next(iter(cache.values()))[1]
+    channels = max(data.shape[1] for data, _ in cache.values())
+    if any(sr != samplerate for _, sr in cache.values()):
+        print(f"警告: 语音文件采样率不一致，常驻流统一使用 {samplerate} Hz")
+
+    print("\n播放开销对比（总耗时 - 音频时长）：\n")
+    print(f"{'语音提示':<20}{'时长(s)':>10}{'playsound(ms)':>16}{'OutputStream(ms)':>20}")
+
+    with sd.OutputStream(samplerate=samplerate, channels=channels, dtype='float32') as stream:
+        for key, (data, sr) in cache.items():
+            duration = len(data) / sr
+            if data.shape[1] < channels:
+                data = data.repeat(channels // data.shape[1], axis=1)
+
+            t0 = time.perf_counter()
+            voice_manager.play(key, blocking=True)
+            playsound_ms = (time.perf_counter() - t0 - duration) * 1000
+            time.sleep(0.5)
+
+            t0 = time.perf_counter()
+            stream.write(data)  # 阻塞写入，直到数据送入设备缓冲区
+            stream_ms = (time.perf_counter() - t0 - duration) * 1000
+            time.sleep(0.5)
+
+            print(f"{key:<20}{duration:>10.2f}{playsound_ms:>16.1f}{stream_ms:>20.1f}")
+
+    voice_manager.shutdown()
+
+
 def main():
     import argparse
 
     parser = argparse.ArgumentParser(description='测试VoiceManager语音提示功能')
-    parser.add_argument('--mode', choices=['full', 'individual'], default='full',
-                      help='测试模式: full=完整流程, individual=单个提示')
+    parser.add_argument('--mode', choices=['full', 'individual', 'latency'], default='full',
+                      help='测试模式: full=完整流程, individual=单个提示, latency=播放开销对比')
 
     args = parser.parse_args()
 
     try:
         if args.mode == 'full':
             test_voice_manager()
+        elif args.mode == 'latency':
+            test_playback_latency()
         else:
             test_individual_prompts()
 
@@ -6,24 +6,91 @@
 
 import sys
 import json
-import pickle
 import numpy as np
 from pathlib import Path
 
+from aruco_math import nan_stats
+from pkl_io import load_pkl, dump_pkl, is_compressed_pkl, ARUCO_FLOAT_DTYPE, ARUCO_DTYPE_VERSION
+
+# 尝试导入orjson（更快的JSON解析），没有则使用标准库json
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+# 逐帧检测结果的结构化记录（字段名与 offline_aruco_detection --npz 输出的列一致）
+DETECTION_DTYPE = np.dtype([
+    ('timestamp', 'f8'),
+    ('frame_seq_num', 'i8'),
+    ('left_detected', '?'),
+    ('right_detected', '?'),
+    ('real_distance_3d', 'f8'),
+    ('horizontal_distance', 'f8'),
+    ('marker_distance', 'f8'),
+    ('left_tvec', 'f8', (3,)),
+    ('right_tvec', 'f8', (3,)),
+])
+
+
+_NAN3 = (np.nan, np.nan, np.nan)
+
+
+def _detection_row(det):
+    """单帧检测结果 -> DETECTION_DTYPE 字段顺序的元组（缺失的距离/位置为NaN）"""
+    d3 = det['real_distance_3d']
+    dh = det['horizontal_distance']
+    dm = det['marker_distance']
+    left_marker = det['left_marker']
+    right_marker = det['right_marker']
+    return (
+        det['timestamp'],
+        det.get('frame_seq_num', -1),
+        det['left_detected'],
+        det['right_detected'],
+        np.nan if d3 is None else d3,
+        np.nan if dh is None else dh,
+        np.nan if dm is None else dm,
+        left_marker['tvec'] if left_marker and 'tvec' in left_marker else _NAN3,
+        right_marker['tvec'] if right_marker and 'tvec' in right_marker else _NAN3,
+    )
+
+
+def detections_to_columns(detections):
+    """
+    将逐帧检测结果（dict列表）转换为列数组
+
+    每帧只生成一个元组，由 np.array 在C层一次性转置为结构化数组，
+    返回各字段的视图。缺失的距离/位置为NaN。
+
+    Returns:
+        {字段名: np.ndarray}
+    """
+    records = np.array([_detection_row(det) for det in detections], dtype=DETECTION_DTYPE)
+    return {name: records[name] for name in DETECTION_DTYPE.names}
+
 
-def update_pkl_with_offline_detections(session_dir, offline_json_path=None):
+def update_pkl_with_offline_detections(session_dir, offline_json_path=None, compress=None):
     """
     使用离线检测结果更新PKL文件
 
     Args:
         session_dir: session目录
         offline_json_path: 离线检测结果JSON路径（默认自动查找）
+        compress: 是否Zstd压缩保存；None表示沿用现有PKL的格式（新建时不压缩）
     """
     session_dir = Path(session_dir)
 
-    # 查找离线检测结果
+    # 查找离线检测结果（JSON，或 --stream 模式输出的NDJSON / --npz 模式输出的npz）
     if offline_json_path is None:
         offline_json_path = session_dir / "oak_camera" / "aruco_detections_offline.json"
+        if not offline_json_path.exists():
+            for suffix in ('.npz', '.ndjson'):
+                alt_path = offline_json_path.with_suffix(suffix)
+                if alt_path.exists():
+                    offline_json_path = alt_path
+                    break
+    offline_json_path = Path(offline_json_path)
 
     if not offline_json_path.exists():
         print(f"错误: 离线检测结果不存在: {offline_json_path}")
@@ -31,11 +98,27 @@ def update_pkl_with_offline_detections(session_dir, offline_json_path=None):
         return False
 
     # 读取离线检测结果
-    with open(offline_json_path, 'r') as f:
-        offline_data = json.load(f)
+    columns = None
+    if offline_json_path.suffix == '.npz':
+        # 列式结果，直接使用数组
+        with np.load(offline_json_path) as npz:
+            columns = {key: npz[key] for key in npz.files}
+        detections = []
+        total_frames = len(columns['timestamp'])
+    elif offline_json_path.suffix == '.ndjson':
+        loads = orjson.loads if HAS_ORJSON else json.loads
+        with open(offline_json_path, 'rb') as f:
+            detections = [loads(line) for line in f if line.strip()]
+        total_frames = len(detections)
+    else:
+        if HAS_ORJSON:
+            offline_data = orjson.loads(offline_json_path.read_bytes())
+        else:
+            with open(offline_json_path, 'r') as f:
+                offline_data = json.load(f)
 
-    detections = offline_data['detections']
-    total_frames = offline_data['total_frames']
+        detections = offline_data['detections']
+        total_frames = offline_data['total_frames']
 
     print(f"Session: {session_dir.name}")
     print(f"离线检测帧数: {total_frames}")
@@ -45,8 +128,9 @@ def update_pkl_with_offline_detections(session_dir, offline_json_path=None):
 
     if pkl_path.exists():
         print(f"✓ 找到现有PKL文件，将更新ArUco数据")
-        with open(pkl_path, 'rb') as f:
-            pkl_data = pickle.load(f)
+        if compress is None:
+            compress = is_compressed_pkl(pkl_path)
+        pkl_data = load_pkl(pkl_path)
     else:
         print(f"✓ 创建新的PKL文件")
         # 创建基础结构
@@ -58,72 +142,48 @@ def update_pkl_with_offline_detections(session_dir, offline_json_path=None):
                     'enabled': True,
                     'marker_ids': [0, 1],
                     'marker_size': 0.015,
-                    'calibrated': detections[0].get('calibrated', False) if detections else False,
+                    'calibrated': (bool(np.any(~np.isnan(columns['left_tvec']))) if columns is not None else
+                                   detections[0].get('calibrated', False) if detections else False),
                     'dictionary': 'DICT_4X4_250'
                 }
             },
             'data': {}
         }
 
-    # 构建ArUco数据数组
-    timestamps = []
-    frame_seq_nums = []
-    left_detected = []
-    right_detected = []
-    distance_absolute = []
-    distance_horizontal = []
-    distance_pixel = []
-    left_positions = []
-    right_positions = []
-
-    for det in detections:
-        timestamps.append(det['timestamp'])
-        frame_seq_nums.append(det.get('frame_seq_num', -1))
-
-        left_detected.append(det['left_detected'])
-        right_detected.append(det['right_detected'])
-
-        # 距离数据（使用None/NaN表示缺失）
-        distance_absolute.append(det['real_distance_3d'] if det['real_distance_3d'] is not None else np.nan)
-        distance_horizontal.append(det['horizontal_distance'] if det['horizontal_distance'] is not None else np.nan)
-        distance_pixel.append(det['marker_distance'] if det['marker_distance'] is not None else np.nan)
-
-        # 3D位置
-        if det['left_marker'] and 'tvec' in det['left_marker']:
-            left_positions.append(det['left_marker']['tvec'])
-        else:
-            left_positions.append([np.nan, np.nan, np.nan])
-
-        if det['right_marker'] and 'tvec' in det['right_marker']:
-            right_positions.append(det['right_marker']['tvec'])
-        else:
-            right_positions.append([np.nan, np.nan, np.nan])
-
-    # 转换为numpy数组
-    timestamps = np.array(timestamps)
-    frame_seq_nums = np.array(frame_seq_nums)
-    left_detected = np.array(left_detected, dtype=bool)
-    right_detected = np.array(right_detected, dtype=bool)
-    distance_absolute = np.array(distance_absolute)
-    distance_horizontal = np.array(distance_horizontal)
-    distance_pixel = np.array(distance_pixel)
-    left_positions = np.array(left_positions)
-    right_positions = np.array(right_positions)
-
-    # 计算统计信息
-    valid_abs = ~np.isnan(distance_absolute)
+    # 构建ArUco数据数组（npz结果直接使用，JSON结果一次转换为列）
+    if columns is None:
+        columns = detections_to_columns(detections)
+
+    timestamps = columns['timestamp']
+    frame_seq_nums = columns['frame_seq_num']
+    left_detected = columns['left_detected']
+    right_detected = columns['right_detected']
+    distance_absolute = columns['real_distance_3d']
+    distance_horizontal = columns['horizontal_distance']
+    distance_pixel = columns['marker_distance']
+    left_positions = columns['left_tvec']
+    right_positions = columns['right_tvec']
+
+    # 计算统计信息（每个距离数组单次遍历）
+    valid_count, mean_abs, std_abs, min_abs, max_abs = nan_stats(distance_absolute)
     statistics = {}
-    if np.any(valid_abs):
+    if valid_count:
         statistics = {
-            'detection_rate_left': float(np.mean(left_detected)),
-            'detection_rate_right': float(np.mean(right_detected)),
-            'mean_distance_absolute': float(np.nanmean(distance_absolute)),
-            'mean_distance_horizontal': float(np.nanmean(distance_horizontal)),
-            'std_distance_absolute': float(np.nanstd(distance_absolute)),
-            'min_distance': float(np.nanmin(distance_absolute)),
-            'max_distance': float(np.nanmax(distance_absolute))
+            'detection_rate_left': float(np.count_nonzero(left_detected) / len(left_detected)),
+            'detection_rate_right': float(np.count_nonzero(right_detected) / len(right_detected)),
+            'mean_distance_absolute': float(mean_abs),
+            'mean_distance_horizontal': float(nan_stats(distance_horizontal)[1]),
+            'std_distance_absolute': float(std_abs),
+            'min_distance': float(min_abs),
+            'max_distance': float(max_abs)
         }
 
+    # 存储精度: 距离和位置用float32（位姿精度约1mm，float32足够），体积减半
+    float_arrays = (distance_absolute, distance_horizontal, distance_pixel, left_positions, right_positions)
+    (distance_absolute, distance_horizontal, distance_pixel,
+     left_positions, right_positions) = (a.astype(ARUCO_FLOAT_DTYPE) for a in float_arrays)
+    pkl_data['metadata'].setdefault('aruco', {})['dtype_version'] = ARUCO_DTYPE_VERSION
+
     # 更新PKL数据
     pkl_data['data']['timestamps'] = timestamps
     pkl_data['data']['frame_seq_nums'] = frame_seq_nums
@@ -146,14 +206,13 @@ def update_pkl_with_offline_detections(session_dir, offline_json_path=None):
     }
 
     # 保存PKL
-    with open(pkl_path, 'wb') as f:
-        pickle.dump(pkl_data, f, protocol=pickle.HIGHEST_PROTOCOL)
+    dump_pkl(pkl_data, pkl_path, compress=bool(compress))
 
     print(f"\n✓ PKL文件已更新: {pkl_path}")
     print(f"\n更新内容:")
     print(f"  时间戳数量: {len(timestamps)}")
     print(f"  ArUco数据点: {len(distance_absolute)}")
-    print(f"  有效距离测量: {np.sum(valid_abs)}")
+    print(f"  有效距离测量: {valid_count}")
 
     if statistics:
         print(f"\n统计信息:")
@@ -166,13 +225,17 @@ def update_pkl_with_offline_detections(session_dir, offline_json_path=None):
 
 
 def main():
-    if len(sys.argv) < 2:
-        print("用法: python update_pkl_with_offline.py <session_dir>")
+    args = [arg for arg in sys.argv[1:] if arg != '--compress']
+    compress = True if len(args) < len(sys.argv) - 1 else None
+
+    if not args:
+        print("用法: python update_pkl_with_offline.py <session_dir> [--compress]")
+        print("\n  --compress  使用Zstd压缩保存PKL（需要zstandard；默认沿用现有PKL的格式）")
         print("\n示例:")
         print("  python update_pkl_with_offline.py data/session_20251027_192209")
         sys.exit(1)
 
-    session_dir = Path(sys.argv[1])
+    session_dir = Path(args[0])
 
     if not session_dir.exists():
         print(f"错误: Session目录不存在: {session_dir}")
@@ -183,7 +246,7 @@ def main():
     print(f"{'='*80}\n")
 
     try:
-        success = update_pkl_with_offline_detections(session_dir)
+        success = update_pkl_with_offline_detections(session_dir, compress=compress)
 
         if success:
             print(f"\n{'='*80}")
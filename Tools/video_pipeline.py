@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Threaded decode/encode stages shared by the ArUco video processors
+Frames are decoded and encoded in their own threads so codec work overlaps with detection
+"""
+
+import queue
+import threading
+
+
+class FramePipeline:
+    """Reader and writer threads around a detection loop
+
+    The reader decodes frames from `cap` into a bounded queue and the writer
+    encodes frames handed to `write`. An error in either thread ends that
+    thread and is re-raised on the calling thread, which never blocks on a
+    queue whose other end has died.
+
+    Usage:
+        pipeline = FramePipeline(cap, out, prefetch)
+        try:
+            while True:
+                frame = pipeline.read()
+                if frame is None:
+                    break
+                pipeline.write(process(frame))
+        finally:
+            pipeline.close()
+        pipeline.raise_write_error()
+    """
+
+    def __init__(self, cap, out, prefetch=8):
+        self._read_q = queue.Queue(maxsize=prefetch)
+        self._write_q = queue.Queue(maxsize=prefetch)
+        self._stop_event = threading.Event()
+        self._read_error = None
+        self._write_error = None
+        self._end_of_stream = False
+
+        self._reader = threading.Thread(target=self._read_frames, args=(cap,), daemon=True)
+        self._writer = threading.Thread(target=self._write_frames, args=(out,), daemon=True)
+        self._reader.start()
+        self._writer.start()
+
+    def _read_frames(self, cap):
+        """Reader stage: decode frames into the read queue, then push a None sentinel"""
+        try:
+            while not self._stop_event.is_set():
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                while not self._stop_event.is_set():
+                    try:
+                        self._read_q.put(frame, timeout=0.1)
+                        break
+                    except queue.Full:
+                        continue
+        except Exception as e:
+            self._read_error = e
+        finally:
+            self._read_q.put(None)
+
+    def _write_frames(self, out):
+        """Writer stage: encode frames from the write queue until a None sentinel"""
+        try:
+            while True:
+                frame = self._write_q.get()
+                if frame is None:
+                    break
+                out.write(frame)
+        except Exception as e:
+            self._write_error = e
+
+    def read(self):
+        """Next decoded frame, or None at end of stream (re-raises a decode error)"""
+        if self._end_of_stream:
+            return None
+        frame = self._read_q.get()
+        if frame is None:
+            self._end_of_stream = True
+            if self._read_error is not None:
+                raise self._read_error
+        return frame
+
+    def write(self, frame):
+        """Hand a frame to the writer thread (re-raises its error if it has died)"""
+        while True:
+            try:
+                self._write_q.put(frame, timeout=0.1)
+                return
+            except queue.Full:
+                if not self._writer.is_alive():
+                    self.raise_write_error()
+
+    def raise_write_error(self):
+        """Re-raise the writer thread's error, if any"""
+        if self._write_error is not None:
+            raise self._write_error
+
+    def close(self):
+        """Stop the reader (draining so it can post its sentinel), then flush the writer"""
+        self._stop_event.set()
+        while self._reader.is_alive():
+            try:
+                self._read_q.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        self._reader.join()
+        while self._writer.is_alive():
+            try:
+                self._write_q.put(None, timeout=0.1)
+                break
+            except queue.Full:
+                pass
+        self._writer.join()
@@ -4,20 +4,78 @@ Rerun可视化 - 支持离线ArUco处理后的数据
 显示传感器图像 + ArUco距离曲线（跳过检测失败的数据）
 """
 
+import os
+import queue
+import threading
 import rerun as rr
 import rerun.blueprint as rrb
 import cv2
 import numpy as np
-import pickle
 import json
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 import argparse
 import sys
 
+from pkl_io import load_pkl
+
+# 尝试导入tqdm（限频刷新的进度条），没有则使用简单进度显示
+try:
+    from tqdm import tqdm
+    HAS_TQDM = True
+except ImportError:
+    HAS_TQDM = False
+
+# 尝试导入orjson（更快的JSON解析），没有则使用标准库json
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+# 尝试导入PyTurboJPEG（libjpeg-turbo SIMD解码），没有则使用cv2.imread
+try:
+    from turbojpeg import TurboJPEG
+    HAS_TURBOJPEG = True
+except ImportError:
+    HAS_TURBOJPEG = False
+
+_tj_local = threading.local()  # 每个解码线程一个TurboJPEG实例
+
+
+def _read_bgr(path):
+    """读取BGR图像，失败返回None（优先TurboJPEG；两者都在解码时释放GIL，可在线程池中并行）"""
+    if HAS_TURBOJPEG and path.lower().endswith(('.jpg', '.jpeg')):
+        tj = getattr(_tj_local, 'tj', None)
+        if tj is None:
+            tj = _tj_local.tj = TurboJPEG()
+        try:
+            with open(path, 'rb') as f:
+                return tj.decode(f.read())  # 默认输出BGR
+        except Exception:
+            pass
+    return cv2.imread(path)
+
+
+def _load_image(path):
+    """
+    读取图像并构建rr.Image，失败返回None
+
+    在线程池中同时完成解码和Rerun的数组转换，主线程只需rr.log。
+    直接使用BGR数据，由Rerun在显示时处理通道顺序，省去cvtColor。
+    """
+    image = _read_bgr(path)
+    if image is None:
+        return None
+    return rr.Image(image, color_model="BGR")
+
 
 class SessionVisualizerWithAruco:
     """Session可视化器 - 支持ArUco距离显示"""
 
+    # 预取的时间戳数（图像读取与Rerun记录重叠）
+    PREFETCH_FRAMES = 4
+
     def __init__(self, session_dir):
         self.session_dir = Path(session_dir)
         if not self.session_dir.exists():
@@ -30,8 +88,7 @@ class SessionVisualizerWithAruco:
         if not pkl_path.exists():
             raise ValueError(f"PKL文件不存在: {pkl_path}")
 
-        with open(pkl_path, 'rb') as f:
-            data = pickle.load(f)
+        data = load_pkl(pkl_path)
 
         self.metadata = data.get('metadata', {})
         self.aligned_data = data.get('data', {})
@@ -56,6 +113,15 @@ class SessionVisualizerWithAruco:
         else:
             self.use_relative_timestamps = True
 
+        # 相对/绝对时间戳数组只计算一次：Rerun时间轴用相对时间，传感器帧匹配用绝对时间
+        ts = np.asarray(self.timestamps, dtype=np.float64)
+        if self.use_relative_timestamps:
+            self._ts_relative = ts
+            self._ts_absolute = ts + self.start_timestamp
+        else:
+            self._ts_relative = ts - self.start_timestamp
+            self._ts_absolute = ts
+
         # 传感器信息
         self.sensors = self.metadata.get('sensors', {})
 
@@ -63,29 +129,51 @@ class SessionVisualizerWithAruco:
         self.aruco_data = self.aligned_data.get('aruco', {})
         self.has_aruco = bool(self.aruco_data)
 
-        # 加载传感器metadata
-        self.sensor_metadata = {}
+        # ArUco数组只取一次（PKL中可能为float32，统一为float64）
+        self._dist_abs = np.asarray(self.aruco_data.get('distance_absolute', []), dtype=np.float64)
+        self._dist_h = np.asarray(self.aruco_data.get('distance_horizontal', []), dtype=np.float64)
+        self._left_det = np.asarray(self.aruco_data.get('left_detected', []), dtype=bool)
+        self._right_det = np.asarray(self.aruco_data.get('right_detected', []), dtype=bool)
+        self._valid_dist_count = int(np.count_nonzero(~np.isnan(self._dist_abs)))
+
+        # 加载传感器metadata，只保留时间戳数组和文件名，逐帧dict解析后即丢弃
+        self.sensor_timestamps = {}
+        self.sensor_filenames = {}
         for sensor_id, sensor_info in self.sensors.items():
             frames_dir = sensor_info.get('frames_dir', sensor_id)
             metadata_file = self.session_dir / frames_dir / 'frames_metadata.json'
 
             if metadata_file.exists():
-                with open(metadata_file, 'r') as f:
-                    self.sensor_metadata[sensor_id] = json.load(f)
-                    frame_count = len(self.sensor_metadata[sensor_id].get('frames', []))
-                    print(f"  ✓ {sensor_id}: {frame_count} 帧")
+                frames = self._load_frames(metadata_file)
+                self.sensor_timestamps[sensor_id] = np.fromiter(
+                    (f['timestamp'] for f in frames), dtype=np.float64, count=len(frames))
+                self.sensor_filenames[sensor_id] = [f['filename'] for f in frames]
+                del frames
+                print(f"  ✓ {sensor_id}: {len(self.sensor_filenames[sensor_id])} 帧")
             else:
                 print(f"  ⚠ {sensor_id}: metadata文件不存在")
-                self.sensor_metadata[sensor_id] = {'frames': []}
+                self.sensor_timestamps[sensor_id] = np.empty(0, dtype=np.float64)
+                self.sensor_filenames[sensor_id] = []
+
+        # 预先为每个时间戳匹配各传感器最接近的帧
+        self._match_sensor_frames()
 
         print(f"\n✓ 加载完成")
         print(f"  时间戳数量: {len(self.timestamps)}")
         print(f"  传感器数量: {len(self.sensors)}")
 
         if self.has_aruco:
-            dist_abs = self.aruco_data.get('distance_absolute', [])
-            valid_count = np.sum(~np.isnan(dist_abs))
-            print(f"  ArUco数据: {valid_count}/{len(dist_abs)} 有效")
+            print(f"  ArUco数据: {self._valid_dist_count}/{len(self._dist_abs)} 有效")
+
+    @staticmethod
+    def _load_frames(metadata_file):
+        """解析frames_metadata.json，返回帧信息列表（优先orjson）"""
+        if HAS_ORJSON:
+            metadata = orjson.loads(metadata_file.read_bytes())
+        else:
+            with open(metadata_file, 'r') as f:
+                metadata = json.load(f)
+        return metadata.get('frames', [])
 
     def visualize(self):
         """运行可视化"""
@@ -99,31 +187,55 @@ class SessionVisualizerWithAruco:
         # 记录session信息
         self._log_session_info()
 
-        print(f"\n开始可视化...")
-
-        # 遍历每个时间戳
-        for i, timestamp in enumerate(self.timestamps):
-            # 设置时间
-            # 如果是相对时间戳，使用相对时间
-            # 如果是绝对时间戳，转换为相对时间
-            if self.use_relative_timestamps:
-                relative_time = timestamp
-            else:
-                relative_time = timestamp - self.start_timestamp
-
-            rr.set_time("timestamp", timestamp=relative_time)
-            rr.set_time("frame", sequence=i)
-
-            # 记录传感器图像
-            self._log_sensor_images(i, timestamp)
+        # 记录ArUco数据（整条时间序列一次发送）
+        if self.has_aruco:
+            self._log_aruco_data()
 
-            # 记录ArUco数据
-            if self.has_aruco:
-                self._log_aruco_data(i)
+        print(f"\n开始可视化...")
 
-            # 进度显示
-            if (i + 1) % 20 == 0 or i == len(self.timestamps) - 1:
-                print(f"  进度: {i+1}/{len(self.timestamps)} ({(i+1)/len(self.timestamps)*100:.1f}%)")
+        # 图像读取线程池（每个传感器一个线程，各传感器的解码并行），
+        # 预取线程提前读取后续时间戳的图像，主线程只负责记录
+        executor = ThreadPoolExecutor(max_workers=max(1, len(self._sensor_frames)))
+        image_q = queue.Queue(maxsize=self.PREFETCH_FRAMES)
+        stop_event = threading.Event()
+        reader = threading.Thread(target=self._prefetch_sensor_images,
+                                  args=(executor, image_q, stop_event), daemon=True)
+        reader.start()
+
+        try:
+            # 遍历每个时间戳（tqdm按固定间隔刷新，不随循环速度频繁写stdout）
+            relative_times = self._ts_relative.tolist()
+            if HAS_TQDM:
+                relative_times = tqdm(relative_times, desc="可视化进度", mininterval=0.5)
+
+            for i, relative_time in enumerate(relative_times):
+                images = image_q.get()
+                if isinstance(images, Exception):
+                    raise images  # 预取线程读取失败，在主线程重新抛出
+                if images is None:
+                    break  # 预取线程已结束
+
+                # 设置时间（统一使用相对时间）
+                rr.set_time("timestamp", timestamp=relative_time)
+                rr.set_time("frame", sequence=i)
+
+                # 记录传感器图像
+                self._log_sensor_images(images)
+
+                # 简单进度显示（无tqdm时）
+                if not HAS_TQDM and ((i + 1) % 20 == 0 or i == len(self.timestamps) - 1):
+                    print(f"  进度: {i+1}/{len(self.timestamps)} ({(i+1)/len(self.timestamps)*100:.1f}%)")
+
+        finally:
+            # 停止预取线程（排空队列以便它放入结束标记）
+            stop_event.set()
+            while reader.is_alive():
+                try:
+                    image_q.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            reader.join()
+            executor.shutdown()
 
         print("\n✓ 可视化完成！")
         print("\n使用方法:")
@@ -203,13 +315,13 @@ class SessionVisualizerWithAruco:
         info_text += f"## 传感器\n\n"
         for sensor_id, sensor_info in self.sensors.items():
             sensor_name = sensor_info.get('sensor_name', sensor_id)
-            frame_count = len(self.sensor_metadata.get(sensor_id, {}).get('frames', []))
+            frame_count = len(self.sensor_filenames.get(sensor_id, []))
             info_text += f"- **{sensor_id}** ({sensor_name}): {frame_count} 帧\n"
 
         if self.has_aruco:
             info_text += f"\n## ArUco检测\n\n"
-            dist_abs = self.aruco_data.get('distance_absolute', [])
-            valid_count = np.sum(~np.isnan(dist_abs))
+            dist_abs = self._dist_abs
+            valid_count = self._valid_dist_count
             info_text += f"- 有效检测: {valid_count}/{len(dist_abs)} ({valid_count/len(dist_abs)*100:.1f}%)  \n"
 
             if valid_count > 0:
@@ -218,91 +330,135 @@ class SessionVisualizerWithAruco:
 
         rr.log("session_info", rr.TextDocument(info_text, media_type=rr.MediaType.MARKDOWN))
 
-    def _log_sensor_images(self, frame_idx, timestamp):
-        """记录传感器图像"""
-        # 时间戳转换
-        if self.use_relative_timestamps:
-            absolute_timestamp = timestamp + self.start_timestamp
-        else:
-            absolute_timestamp = timestamp
-
-        for sensor_id, sensor_info in self.sensors.items():
-            frames_dir = sensor_info.get('frames_dir', sensor_id)
-            sensor_dir = self.session_dir / frames_dir
-
-            sensor_meta = self.sensor_metadata.get(sensor_id, {})
-            frames = sensor_meta.get('frames', [])
-
-            if not frames:
-                continue
+    def _match_sensor_frames(self, tolerance=0.1):
+        """
+        为每个时间戳预先匹配各传感器最接近的帧
 
-            # 找到最接近的帧
-            frame_info = self._find_closest_frame(frames, absolute_timestamp)
+        对每个传感器的帧时间戳排序后用searchsorted一次匹配全部时间戳，
+        超出容差的记为-1。结果存入 self._sensor_frames，每个传感器一项
+        (entity_path, indices, paths)，indices为Python list，逐帧循环中只做list索引。
+        """
+        targets = self._ts_absolute
 
-            if frame_info is None:
-                rr.log(f"sensors/{sensor_id}/image", rr.Clear(recursive=False))
+        self._sensor_frames = []
+        for sensor_id, sensor_info in self.sensors.items():
+            filenames = self.sensor_filenames.get(sensor_id, [])
+            if not filenames:
                 continue
 
-            # 读取图像
-            image_path = sensor_dir / frame_info['filename']
+            ts = self.sensor_timestamps[sensor_id]
+            order = np.argsort(ts, kind='stable')
+            ts = ts[order]
+
+            sensor_dir = str(self.session_dir / sensor_info.get('frames_dir', sensor_id)) + os.sep
+            paths = [sensor_dir + filenames[j] for j in order]
+            self._sensor_frames.append((f"sensors/{sensor_id}/image",
+                                        self._closest_indices(ts, targets, tolerance).tolist(),
+                                        paths))
+
+    @staticmethod
+    def _closest_indices(ts, targets, tolerance):
+        """在有序时间戳ts中查找每个target最接近的下标（距离相同取较早的帧），超出容差为-1"""
+        right = np.searchsorted(ts, targets)
+        left = np.clip(right - 1, 0, len(ts) - 1)
+        right = np.clip(right, 0, len(ts) - 1)
+
+        d_left = np.abs(targets - ts[left])
+        d_right = np.abs(ts[right] - targets)
+        closest = np.where(d_right < d_left, right, left)
+        return np.where(np.minimum(d_left, d_right) <= tolerance, closest, -1)
+
+    def _read_sensor_images(self, frame_idx, executor):
+        """
+        读取第frame_idx个时间戳各传感器的图像（在线程池中并行解码并构建rr.Image）
 
-            if not image_path.exists():
+        Returns:
+            {entity_path: rr.Image}；无匹配帧的传感器值为None，读取失败的传感器不出现
+        """
+        images = {}
+        pending = []
+        for entity_path, indices, paths in self._sensor_frames:
+            j = indices[frame_idx]
+            if j < 0:
+                images[entity_path] = None
                 continue
-
-            image = cv2.imread(str(image_path))
+            pending.append((entity_path, executor.submit(_load_image, paths[j])))
+
+        for entity_path, future in pending:
+            image = future.result()
+            if image is not None:
+                images[entity_path] = image
+        return images
+
+    def _prefetch_sensor_images(self, executor, image_q, stop_event):
+        """预取线程：按时间戳顺序读取图像放入image_q，结束时放入None；读取出错时改为放入异常对象"""
+        end_marker = None
+        try:
+            for i in range(len(self.timestamps)):
+                images = self._read_sensor_images(i, executor)
+                while not stop_event.is_set():
+                    try:
+                        image_q.put(images, timeout=0.1)
+                        break
+                    except queue.Full:
+                        continue
+                if stop_event.is_set():
+                    break
+        except Exception as e:
+            end_marker = e
+        finally:
+            image_q.put(end_marker)
+
+    def _log_sensor_images(self, images):
+        """记录传感器图像"""
+        for entity_path, image in images.items():
             if image is None:
-                continue
-
-            # BGR转RGB
-            image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+                rr.log(entity_path, rr.Clear(recursive=False))
+            else:
+                rr.log(entity_path, image)
 
-            # 记录图像
-            rr.log(f"sensors/{sensor_id}/image", rr.Image(image_rgb))
+    def _log_aruco_data(self):
+        """按列批量记录ArUco距离曲线和检测状态（跳过检测失败的数据，曲线会断开）"""
+        dist_abs = self._dist_abs
+        dist_h = self._dist_h
+        left_detected = self._left_det
+        right_detected = self._right_det
 
-    def _log_aruco_data(self, frame_idx):
-        """记录ArUco距离数据（跳过检测失败的数据）"""
-        if not self.has_aruco or frame_idx >= len(self.aruco_data.get('distance_absolute', [])):
+        n = min(len(self.timestamps), len(dist_abs))
+        if n == 0:
             return
 
-        # 获取距离数据
-        dist_abs = self.aruco_data.get('distance_absolute', [])[frame_idx]
-        dist_h = self.aruco_data.get('distance_horizontal', [])[frame_idx]
-
-        # 只记录有效数据（非NaN）
-        if not np.isnan(dist_abs):
-            rr.log("aruco/distance_absolute", rr.Scalars(dist_abs))
-        else:
-            # 跳过无效数据，不记录（曲线会断开）
-            pass
-
-        if dist_h is not None and not np.isnan(dist_h):
-            rr.log("aruco/distance_horizontal", rr.Scalars(dist_h))
-
-        # 检测状态
-        left_detected = self.aruco_data.get('left_detected', [])[frame_idx] if frame_idx < len(self.aruco_data.get('left_detected', [])) else False
-        right_detected = self.aruco_data.get('right_detected', [])[frame_idx] if frame_idx < len(self.aruco_data.get('right_detected', [])) else False
-
-        status = "✓✓" if (left_detected and right_detected) else "✓✗" if left_detected else "✗✓" if right_detected else "✗✗"
-        rr.log("aruco/status", rr.TextLog(f"L{status[0]} R{status[1]}"))
-
-    def _find_closest_frame(self, frames, target_timestamp, tolerance=0.1):
-        """找到最接近目标时间戳的帧"""
-        if not frames:
-            return None
-
-        min_diff = float('inf')
-        closest_frame = None
-
-        for frame in frames:
-            diff = abs(frame['timestamp'] - target_timestamp)
-            if diff < min_diff:
-                min_diff = diff
-                closest_frame = frame
-
-        if min_diff <= tolerance:
-            return closest_frame
+        times = self._ts_relative[:n]
+        frames = np.arange(n)
+
+        def send_scalars(entity_path, values):
+            # 只记录有效数据（非NaN）
+            valid = ~np.isnan(values[:n])
+            if not np.any(valid):
+                return
+            rr.send_columns(
+                entity_path,
+                indexes=[rr.TimeColumn("timestamp", timestamp=times[valid]),
+                         rr.TimeColumn("frame", sequence=frames[valid])],
+                columns=rr.Scalars.columns(scalars=values[:n][valid]),
+            )
 
-        return None
+        send_scalars("aruco/distance_absolute", dist_abs)
+        if len(dist_h) >= n:
+            send_scalars("aruco/distance_horizontal", dist_h)
+
+        # 检测状态（缺失的检测标记视为未检测）
+        left = np.zeros(n, dtype=bool)
+        right = np.zeros(n, dtype=bool)
+        left[:min(n, len(left_detected))] = left_detected[:n]
+        right[:min(n, len(right_detected))] = right_detected[:n]
+        status = np.char.add(np.where(left, "L✓ ", "L✗ "), np.where(right, "R✓", "R✗"))
+        rr.send_columns(
+            "aruco/status",
+            indexes=[rr.TimeColumn("timestamp", timestamp=times),
+                     rr.TimeColumn("frame", sequence=frames)],
+            columns=rr.TextLog.columns(text=status.tolist()),
+        )
 
 
 def main():
@@ -3,6 +3,7 @@ PKL data saver with timestamp alignment for PoTac system
 Saves synchronized multi-modal data with metadata
 """
 
+import io
 import pickle
 import time
 import numpy as np
@@ -12,6 +13,20 @@ from collections import defaultdict
 from kivy.logger import Logger
 import threading
 
+# Optional: sessions re-saved by the offline Tools may be Zstandard-compressed
+try:
+    import zstandard as zstd
+    HAS_ZSTD = True
+except ImportError:
+    HAS_ZSTD = False
+
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+
+# Storage dtype for ArUco float arrays; recorded as metadata['aruco']['dtype_version']
+# (files without the field store float64)
+ARUCO_FLOAT_DTYPE = np.float32
+ARUCO_DTYPE_VERSION = 2
+
 
 class TimestampAlignedDataSaver:
     """
@@ -33,7 +48,8 @@ class TimestampAlignedDataSaver:
                 'enabled': bool,
                 'marker_ids': [left_id, right_id],
                 'marker_size': float,
-                'calibrated': bool
+                'calibrated': bool,
+                'dtype_version': int  # 2: float32 arrays below
             }
         },
         'data': {
@@ -47,10 +63,10 @@ class TimestampAlignedDataSaver:
             'aruco': {
                 'left_detected': np.array([bool, ...]),
                 'right_detected': np.array([bool, ...]),
-                'distance_absolute': np.array([float, ...]),  # 3D distance in mm
-                'distance_horizontal': np.array([float, ...]), # XY distance in mm
-                'distance_pixel': np.array([float, ...]),     # Pixel distance
-                'left_positions': np.array([[x,y,z], ...]),   # 3D positions
+                'distance_absolute': np.array([float32, ...]),  # 3D distance in mm
+                'distance_horizontal': np.array([float32, ...]), # XY distance in mm
+                'distance_pixel': np.array([float32, ...]),     # Pixel distance
+                'left_positions': np.array([[x,y,z], ...]),     # 3D positions (float32)
                 'right_positions': np.array([[x,y,z], ...])
             },
             'vt_sensor_1': {
@@ -239,12 +255,13 @@ class TimestampAlignedDataSaver:
                         data['data']['aruco'] = {
                             'left_detected': np.array(self.aruco_data['left_detected']),
                             'right_detected': np.array(self.aruco_data['right_detected']),
-                            'distance_absolute': np.array(self.aruco_data['distance_absolute']),
-                            'distance_horizontal': np.array(self.aruco_data['distance_horizontal']),
-                            'distance_pixel': np.array(self.aruco_data['distance_pixel']),
-                            'left_positions': np.array(self.aruco_data['left_positions']),
-                            'right_positions': np.array(self.aruco_data['right_positions'])
+                            'distance_absolute': np.array(self.aruco_data['distance_absolute'], dtype=ARUCO_FLOAT_DTYPE),
+                            'distance_horizontal': np.array(self.aruco_data['distance_horizontal'], dtype=ARUCO_FLOAT_DTYPE),
+                            'distance_pixel': np.array(self.aruco_data['distance_pixel'], dtype=ARUCO_FLOAT_DTYPE),
+                            'left_positions': np.array(self.aruco_data['left_positions'], dtype=ARUCO_FLOAT_DTYPE),
+                            'right_positions': np.array(self.aruco_data['right_positions'], dtype=ARUCO_FLOAT_DTYPE)
                         }
+                        self.metadata['aruco']['dtype_version'] = ARUCO_DTYPE_VERSION
 
                         # Calculate statistics
                         valid_abs = ~np.isnan(data['data']['aruco']['distance_absolute'])
@@ -349,6 +366,9 @@ def load_pkl_session(pkl_path):
     """
     Load a saved PKL session
 
+    Zstandard-compressed files (see Tools/pkl_io.py) are detected by their
+    magic number and decompressed while unpickling.
+
     Args:
         pkl_path: Path to PKL file
 
@@ -357,7 +377,15 @@ def load_pkl_session(pkl_path):
     """
     try:
         with open(pkl_path, 'rb') as f:
-            data = pickle.load(f)
+            compressed = f.read(len(ZSTD_MAGIC)) == ZSTD_MAGIC
+            f.seek(0)
+            if not compressed:
+                data = pickle.load(f)
+            elif not HAS_ZSTD:
+                raise RuntimeError("file is Zstandard-compressed, install zstandard to load it")
+            else:
+                with zstd.ZstdDecompressor().stream_reader(f) as reader:
+                    data = pickle.load(io.BufferedReader(reader))
 
         Logger.info(f"PKLSaver: Loaded session from {pkl_path}")
         Logger.info(f"PKLSaver: Duration: {data['metadata']['duration']:.1f}s")
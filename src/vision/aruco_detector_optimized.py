@@ -194,21 +194,29 @@ class ArUcoDetectorOptimized:
         except Exception as e:
             Logger.error(f"ArUcoDetectorOptimized: Failed to initialize detector: {e}")
 
+    def _get_clahe(self):
+        """Return a CLAHE object for the current config, reused across frames"""
+        params = (self.config['enhancement']['clahe_clip_limit'],
+                  tuple(self.config['enhancement']['clahe_tile_size']))
+        if getattr(self, '_clahe_params', None) != params:
+            self._clahe = cv2.createCLAHE(clipLimit=params[0], tileGridSize=params[1])
+            self._clahe_params = params
+        return self._clahe
+
     def _enhance_frame(self, frame):
         """Minimal preprocessing optimized for performance (AprilTag approach)"""
         try:
-            # Convert to grayscale efficiently
-            if len(frame.shape) == 3:
+            # Convert to grayscale efficiently (grayscale input is used as-is, detection does not modify it)
+            if isinstance(frame, cv2.UMat):
+                gray = frame  # UMat inputs are expected to be grayscale already
+            elif len(frame.shape) == 3:
                 gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
             else:
-                gray = frame.copy()
+                gray = frame
 
             # Only apply CLAHE if enabled - simple enhancement similar to AprilTag approach
             if self.config['enhancement']['enabled'] and self.config['enhancement']['clahe_enabled']:
-                clip_limit = self.config['enhancement']['clahe_clip_limit']
-                tile_size = tuple(self.config['enhancement']['clahe_tile_size'])
-                clahe = cv2.createCLAHE(clipLimit=clip_limit, tileGridSize=tile_size)
-                enhanced = clahe.apply(gray)
+                enhanced = self._get_clahe().apply(gray)
                 return enhanced
 
             return gray
@@ -270,18 +278,32 @@ class ArUcoDetectorOptimized:
         if self._filtered_ids:
             self._filtered_ids = np.array(self._filtered_ids)
 
-    def detect_markers(self, frame):
-        """Detect ArUco markers in frame with optimized processing"""
+    def detect_markers(self, frame, gray=None):
+        """Detect ArUco markers in frame with optimized processing
+
+        Args:
+            frame: BGR or grayscale frame (annotated copy is drawn on it)
+            gray: Optional grayscale version of frame (ndarray or cv2.UMat); when given,
+                  detection uses it directly and the internal BGR->gray conversion is skipped.
+                  A UMat runs thresholding/contours through OpenCL when enabled
+        """
         if not self.config.get('enabled', True):
             return frame, {}
 
         try:
             # Enhance frame for detection
-            enhanced_frame = self._enhance_frame(frame)
+            enhanced_frame = self._enhance_frame(frame if gray is None else gray)
 
             # Detect markers
             corners, ids, rejected = self.detector.detectMarkers(enhanced_frame)
 
+            # UMat input yields UMat outputs; download the (small) results to host arrays
+            if isinstance(enhanced_frame, cv2.UMat):
+                corners = tuple(c.get() if isinstance(c, cv2.UMat) else c for c in corners)
+                rejected = tuple(c.get() if isinstance(c, cv2.UMat) else c for c in rejected)
+                if isinstance(ids, cv2.UMat):
+                    ids = ids.get()
+
             # Filter for target IDs only and update results
             self._update_detection_results(corners, ids, rejected)
 